@@ -0,0 +1,156 @@
+"""
+Passage à l'échelle de la simulation complète sur des plans synthétiques 10×, 100×, 1000× default_example.
+
+    python benchmarks/bench_echelle.py [--echelles 10 100 1000 --moteurs objet tableaux --delai 600]
+    python benchmarks/bench_echelle.py --comparer benchmarks/references/echelle.json [--tolerance 1.5]
+
+À l'échelle k, le plan compte 8k produits de 4 tâches, 5k machines et 4·⌈√k⌉ opérateurs
+(default_example: 8 produits, 29 tâches, 4 opérateurs). Chaque mesure tourne dans un
+processus neuf pour que le pic de mémoire lui soit propre, et relève:
+- la durée de construction du contexte (construire_contexte) et de la simulation;
+- le pic de mémoire résidente du processus (ru_maxrss);
+- le nombre d'événements traités et de tâches candidates évaluées.
+
+Sans --comparer, les résultats sont écrits dans --sortie (référence JSON). Avec --comparer,
+ils sont confrontés à la référence: une durée ou une mémoire au-delà de --tolerance fois la
+référence, ou un compteur différent, est une régression et le script se termine avec le code 1.
+"""
+import argparse
+import json
+import logging
+import math
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'gestion_production.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from planification.logique.generateur import generer_plan_synthetique  # noqa: E402
+from planification.logique.principal_prog import (  # noqa: E402
+    construire_contexte, executer_simulation, executer_simulation_tableaux,
+)
+
+POIDS = {'poids_cout': 0.2, 'poids_equite': 0.2, 'poids_makespan': 0.2,
+         'poids_performance': 0.2, 'poids_penalite_attente': 0.2}
+MOTEURS = {'objet': executer_simulation, 'tableaux': executer_simulation_tableaux}
+COMPTEURS = ('taches', 'machines', 'operateurs', 'evenements_traites', 'scores_evalues', 'makespan')
+SORTIE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'references', 'echelle.json')
+
+
+def dimensions(echelle):
+    """Arguments de generer_plan_synthetique à l'échelle donnée"""
+    return {'nombre_produits': 8 * echelle, 'taches_par_produit': 4, 'nombre_machines': 5 * echelle,
+            'nombre_operateurs': 4 * math.ceil(math.sqrt(echelle))}
+
+
+def mesurer(echelle, moteur):
+    """Une mesure dans le processus courant (appelé par le processus enfant)"""
+    logging.disable(logging.INFO)
+    plan = generer_plan_synthetique(**dimensions(echelle), graine=0)
+    debut = time.perf_counter()
+    contexte = construire_contexte(*plan, POIDS)
+    duree_construction = time.perf_counter() - debut
+    debut = time.perf_counter()
+    data = MOTEURS[moteur](contexte)
+    duree_simulation = time.perf_counter() - debut
+    return {
+        'statut': 'ok',
+        'construction_s': round(duree_construction, 4),
+        'simulation_s': round(duree_simulation, 4),
+        'memoire_pic_ko': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,  # Ko sous Linux
+        'taches': len(contexte.taches),
+        'machines': len(contexte.machines),
+        'operateurs': len(contexte.operateurs),
+        'evenements_traites': contexte.simulation.evenements_traites,
+        'scores_evalues': contexte.ordonnanceur.scores_evalues,
+        'makespan': data['performances']['makespan'],
+    }
+
+
+def lancer(echelle, moteur, delai):
+    """Mesure dans un processus neuf; statut 'delai_depasse' au-delà de delai secondes"""
+    commande = [sys.executable, os.path.abspath(__file__), '--mesurer', str(echelle), moteur]
+    try:
+        sortie = subprocess.run(commande, capture_output=True, text=True, timeout=delai, check=True).stdout
+    except subprocess.TimeoutExpired:
+        return {'statut': 'delai_depasse', 'delai_s': delai}
+    return json.loads(sortie.splitlines()[-1])
+
+
+def comparer(resultats, reference, tolerance):
+    """Écarts de resultats par rapport à reference (liste de messages, vide si aucune régression)"""
+    regressions = []
+    for cle, mesure in resultats.items():
+        attendu = reference.get(cle)
+        if attendu is None or attendu['statut'] != 'ok':
+            continue
+        if mesure['statut'] != 'ok':
+            regressions.append(f"{cle}: {mesure['statut']} (référence {attendu['simulation_s']} s)")
+            continue
+        for champ in ('construction_s', 'simulation_s', 'memoire_pic_ko'):
+            # Plancher de 0,1 s ou 1 Mo: en dessous, le bruit de mesure domine
+            plancher = 1024 if champ == 'memoire_pic_ko' else 0.1
+            if mesure[champ] > tolerance * max(attendu[champ], plancher):
+                regressions.append(f"{cle}: {champ} {mesure[champ]} > {tolerance} × {attendu[champ]}")
+        for champ in COMPTEURS:
+            if mesure[champ] != attendu[champ]:
+                regressions.append(f"{cle}: {champ} {mesure[champ]} ≠ {attendu[champ]}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--echelles', type=int, nargs='+', default=[10, 100, 1000])
+    parser.add_argument('--moteurs', nargs='+', choices=sorted(MOTEURS), default=['objet', 'tableaux'])
+    parser.add_argument('--delai', type=float, default=600, help="secondes par mesure")
+    parser.add_argument('--sortie', default=SORTIE)
+    parser.add_argument('--comparer', metavar='REFERENCE')
+    parser.add_argument('--tolerance', type=float, default=1.5)
+    parser.add_argument('--mesurer', nargs=2, metavar=('ECHELLE', 'MOTEUR'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mesurer:
+        print(json.dumps(mesurer(int(args.mesurer[0]), args.mesurer[1])))
+        return
+
+    resultats = {}
+    for echelle in args.echelles:
+        for moteur in args.moteurs:
+            cle = f"{echelle}x-{moteur}"
+            resultats[cle] = mesure = lancer(echelle, moteur, args.delai)
+            if mesure['statut'] == 'ok':
+                print(f"{cle}: {mesure['taches']} tâches, construction {mesure['construction_s']:.2f} s, "
+                      f"simulation {mesure['simulation_s']:.2f} s, pic {mesure['memoire_pic_ko'] / 1024:.0f} Mo, "
+                      f"{mesure['evenements_traites']} événements, {mesure['scores_evalues']} scores")
+            else:
+                print(f"{cle}: délai de {args.delai:.0f} s dépassé")
+
+    if args.comparer:
+        with open(args.comparer, encoding='utf-8') as fichier:
+            reference = json.load(fichier)['resultats']
+        regressions = comparer(resultats, reference, args.tolerance)
+        for regression in regressions:
+            print(f"RÉGRESSION {regression}")
+        sys.exit(1 if regressions else 0)
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.sortie)), exist_ok=True)
+    with open(args.sortie, 'w', encoding='utf-8') as fichier:
+        json.dump({
+            'meta': {'python': platform.python_version(), 'machine': platform.machine(),
+                     'date': time.strftime('%Y-%m-%d'), 'delai_s': args.delai},
+            'resultats': resultats,
+        }, fichier, indent=2, ensure_ascii=False)
+        fichier.write('\n')
+    print(f"Référence écrite dans {args.sortie}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""
+Mémoire et débit des structures de simulation sur un plan synthétique de 10 000 tâches.
+
+    python benchmarks/bench_slots.py [--produits 2000 --taches 5 --machines 50 --operateurs 20]
+
+Mesure:
+- la mémoire allouée pour construire le contexte (tracemalloc);
+- la taille d'une instance de Task, Operator, Machine et d'une entrée de la file d'événements (tuple);
+- le débit de la file d'événements: 2 événements par tâche ajoutés puis dépilés.
+"""
+import argparse
+import heapq
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'gestion_production.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from planification.logique.generateur import generer_plan_synthetique  # noqa: E402
+from planification.logique.principal_prog import construire_contexte  # noqa: E402
+from planification.logique.Structured_data import DEBUT_TACHE, FIN_TACHE  # noqa: E402
+
+def taille_instance(objet):
+    """Taille de l'objet et de son __dict__ éventuel (les objets référencés ne sont pas comptés)"""
+    taille = sys.getsizeof(objet)
+    if hasattr(objet, '__dict__'):
+        taille += sys.getsizeof(objet.__dict__)
+    return taille
+
+
+POIDS = {'poids_cout': 0.2, 'poids_equite': 0.2, 'poids_makespan': 0.2,
+         'poids_performance': 0.2, 'poids_penalite_attente': 0.2}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--produits', type=int, default=2000)
+    parser.add_argument('--taches', type=int, default=5)
+    parser.add_argument('--machines', type=int, default=50)
+    parser.add_argument('--operateurs', type=int, default=20)
+    args = parser.parse_args()
+
+    donnees = generer_plan_synthetique(args.produits, args.taches, args.machines, args.operateurs, graine=1)
+
+    tracemalloc.start()
+    avant = tracemalloc.take_snapshot()
+    debut = time.perf_counter()
+    contexte = construire_contexte(*donnees, POIDS)
+    duree_construction = time.perf_counter() - debut
+    apres = tracemalloc.take_snapshot()
+    memoire = sum(stat.size_diff for stat in apres.compare_to(avant, 'filename'))
+    tracemalloc.stop()
+
+    simulation = contexte.simulation
+    operateurs = contexte.operateurs
+    tache = contexte.taches[0]
+    tailles = {
+        'Task': taille_instance(tache),
+        'Operator': taille_instance(operateurs[0]),
+        'Machine': taille_instance(contexte.machines[0]),
+    }
+    simulation.ajouter_evenement(0, FIN_TACHE, tache, operateurs[0])
+    entree_file = heapq.heappop(simulation.evenements)
+    debut = time.perf_counter()
+    for i, tache in enumerate(contexte.taches):
+        operateur = operateurs[i % len(operateurs)]
+        temps = float(i % 500)  # beaucoup d'égalités de temps
+        simulation.ajouter_evenement(temps, DEBUT_TACHE, tache, operateur)
+        simulation.ajouter_evenement(temps + 10, FIN_TACHE, tache, operateur)
+    nombre = 0
+    while simulation.obtenir_prochain_evenement() is not None:
+        nombre += 1
+    duree_file = time.perf_counter() - debut
+
+    print(f"tâches: {len(contexte.taches)}  opérateurs: {len(operateurs)}  machines: {len(contexte.machines)}")
+    print(f"construction du contexte: {duree_construction:.3f} s, {memoire / 1e6:.1f} Mo alloués")
+    print("taille par instance: " + ", ".join(f"{nom} {taille} o" for nom, taille in tailles.items())
+          + f", entrée de file {taille_instance(entree_file)} o")
+    print(f"file d'événements: {nombre} événements en {duree_file:.3f} s ({nombre / duree_file:,.0f} évts/s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -145,6 +145,46 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Journalisation du moteur de simulation.
+# En production (DEBUG vide) seuls les avertissements sont écrits: mode silencieux.
+# PLANIFICATION_LOG_LEVEL=DEBUG donne le détail de chaque décision de l'ordonnanceur.
+PLANIFICATION_LOG_LEVEL = os.environ.get('PLANIFICATION_LOG_LEVEL', 'INFO' if DEBUG else 'WARNING')
+
+# Dossier où écrire une trace binaire de chaque simulation (débogage), désactivé si vide
+PLANIFICATION_TRACE_DIR = os.environ.get('PLANIFICATION_TRACE_DIR')
+
+# Moteur de simulation: 'objet' (référence) ou 'tableaux' (état en tableaux NumPy, plus rapide sur les gros plans)
+PLANIFICATION_MOTEUR = os.environ.get('PLANIFICATION_MOTEUR', 'objet')
+
+# Dossier partagé par les workers gunicorn pour agréger les métriques exposées sur /metriques/
+# (un fichier par processus, à vider au redéploiement). Vide: métriques du seul processus qui répond.
+PLANIFICATION_METRIQUES_DIR = os.environ.get('PLANIFICATION_METRIQUES_DIR')
+
+# Dossier des fichiers pstats produits par la vue de profilage (personnel uniquement). Vide: dossier temporaire.
+# Rétention, appliquée avant chaque nouveau profil: les fichiers de plus de PLANIFICATION_PROFILS_DUREE_JOURS
+# jours sont supprimés et seuls les PLANIFICATION_PROFILS_MAX plus récents sont gardés.
+PLANIFICATION_PROFILS_DIR = os.environ.get('PLANIFICATION_PROFILS_DIR')
+PLANIFICATION_PROFILS_MAX = int(os.environ.get('PLANIFICATION_PROFILS_MAX', 20))
+PLANIFICATION_PROFILS_DUREE_JOURS = float(os.environ.get('PLANIFICATION_PROFILS_DUREE_JOURS', 7))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'simple': {'format': '%(asctime)s %(levelname)s %(name)s: %(message)s'},
+    },
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler', 'formatter': 'simple'},
+    },
+    'loggers': {
+        'planification.logique': {
+            'handlers': ['console'],
+            'level': PLANIFICATION_LOG_LEVEL,
+            'propagate': False,
+        },
+    },
+}
+
 LOGIN_URL = 'login'
 LOGIN_REDIRECT_URL = 'home'  
 LOGOUT_REDIRECT_URL = 'login'  
\ No newline at end of file
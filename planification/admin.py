@@ -2,8 +2,9 @@ from django.contrib import admin
 
 # Register your models here.
 from django.contrib import admin
-from .models import Produit, Tache, Operateur, PerformanceOperateur
+from .models import Machine, Produit, Tache, Operateur, PerformanceOperateur
 
+admin.site.register(Machine)
 admin.site.register(Produit)
 admin.site.register(Tache)
 admin.site.register(Operateur)
@@ -1,8 +1,9 @@
 from django import forms
-from .models import Produit, Tache, Operateur, PerformanceOperateur
+from .models import Machine, Produit, Tache, Operateur, PerformanceOperateur
 from django.forms import modelformset_factory
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth import get_user_model
+from .logique.principal_prog import MOTEURS
 
 User = get_user_model()
 
@@ -27,9 +28,17 @@ class ProduitForm(forms.ModelForm):
             field.widget.attrs.update({'class': 'form-control'})
 
 class TacheForm(forms.ModelForm):
+    # Saisie inchangée (liste séparée par des virgules), enregistrée dans Tache.machines
+    machine = forms.CharField(label="Machine", widget=forms.Textarea(attrs={
+        'rows': 2,
+        'class': 'form-control',
+        'placeholder': 'Entrez les identifiants des machines séparés par des virgules (ex: M01, M02, M07)'
+    }))
+    field_order = ['produit', 'id_tache', 'description', 'machine', 'temps_standard', 'ordre']
+
     class Meta:
         model = Tache
-        fields = ['produit', 'id_tache', 'description', 'machine', 'temps_standard', 'ordre']
+        fields = ['produit', 'id_tache', 'description', 'temps_standard', 'ordre']
         widgets = {
             'ordre': forms.NumberInput(attrs={
                 'min': 1,
@@ -42,11 +51,6 @@ class TacheForm(forms.ModelForm):
                 'class': 'form-control',
                 'placeholder': 'Décrivez brièvement cette tâche'
             }),
-            'machine': forms.Textarea(attrs={
-                'rows': 2,
-                'class': 'form-control',
-                'placeholder': 'Entrez les identifiants des machines séparés par des virgules (ex: M01, M02, M07)'
-            }),
             'temps_standard': forms.NumberInput(attrs={
                 'class': 'form-control',
                 'style': 'width: 120px;',
@@ -61,6 +65,39 @@ class TacheForm(forms.ModelForm):
         super().__init__(*args, **kwargs)
         for field in self.fields.values():
             field.widget.attrs.setdefault('class', 'form-control')
+        if self.instance.pk:
+            self.initial.setdefault('machine', ", ".join(m.id_machine for m in self.instance.machines.all()))
+
+    def clean_machine(self):
+        identifiants = Machine.identifiants(self.cleaned_data['machine'])
+        if not identifiants:
+            raise forms.ValidationError("Indiquez au moins une machine.")
+        return identifiants
+
+    def save(self, commit=True):
+        """Enregistre aussi les machines: tout de suite, ou avec save_m2m() si commit=False"""
+        tache = super().save(commit=commit)
+        if commit:
+            self._enregistrer_machines()
+        else:
+            save_m2m = self.save_m2m
+
+            def save_m2m_et_machines():
+                save_m2m()
+                self._enregistrer_machines()
+            self.save_m2m = save_m2m_et_machines
+        return tache
+
+    def _enregistrer_machines(self):
+        """Machines de la tâche, créées au besoin pour l'utilisateur du produit (une requête de lecture)"""
+        user = self.instance.produit.user
+        identifiants = self.cleaned_data['machine']
+        existantes = {machine.id_machine: machine
+                      for machine in Machine.objects.filter(user=user, id_machine__in=identifiants)}
+        nouvelles = Machine.objects.bulk_create(
+            [Machine(user=user, id_machine=identifiant) for identifiant in identifiants if identifiant not in existantes])
+        existantes.update((machine.id_machine, machine) for machine in nouvelles)
+        self.instance.machines.set([existantes[identifiant] for identifiant in identifiants])
 
 
 class OperateurForm(forms.ModelForm):
@@ -87,4 +124,33 @@ PerformanceFormSet = modelformset_factory(
     PerformanceOperateur,
     form=PerformanceForm,  
     extra=0
-)
\ No newline at end of file
+)
+
+class ProfilageForm(forms.Form):
+    """Simulation à profiler: données d'un utilisateur (ou exemple), poids en %, moteur, options"""
+    utilisateur = forms.ModelChoiceField(queryset=User.objects.order_by('username'), required=False,
+                                         empty_label="Données d'exemple")
+    poids_cout = forms.IntegerField(min_value=0, max_value=100, initial=20)
+    poids_equite = forms.IntegerField(min_value=0, max_value=100, initial=20)
+    poids_makespan = forms.IntegerField(min_value=0, max_value=100, initial=20)
+    poids_performance = forms.IntegerField(min_value=0, max_value=100, initial=20)
+    poids_penalite_attente = forms.IntegerField(min_value=0, max_value=100, initial=20)
+    moteur = forms.ChoiceField(choices=[(moteur, moteur) for moteur in MOTEURS], initial='objet')
+    avec_tracemalloc = forms.BooleanField(required=False, label="Allocations (tracemalloc, plus lent)")
+    top = forms.IntegerField(min_value=5, max_value=200, initial=30, label="Nombre de lignes")
+
+    CHAMPS_POIDS = ['poids_cout', 'poids_equite', 'poids_makespan', 'poids_performance', 'poids_penalite_attente']
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        for nom, field in self.fields.items():
+            field.widget.attrs.update({'class': 'form-check-input' if nom == 'avec_tracemalloc' else 'form-control'})
+
+    def clean(self):
+        donnees = super().clean()
+        if all(nom in donnees for nom in self.CHAMPS_POIDS) and sum(donnees[nom] for nom in self.CHAMPS_POIDS) != 100:
+            raise forms.ValidationError("La somme des poids doit être exactement 100%.")
+        return donnees
+
+    def poids(self):
+        return {nom: self.cleaned_data[nom] / 100 for nom in self.CHAMPS_POIDS}
@@ -1,66 +1,199 @@
 import math
+import hashlib
 import heapq
+from array import array
 import numpy as np
-import itertools
+import logging
 import random
+import time
+
+logger = logging.getLogger(__name__)
 
 
 # 1. Structures de données
 
+class HistoriquePerformance:
+    """
+    Historique des performances d'un opérateur, stocké en colonnes typées.
+
+    - taches: index de la tâche (int32), performances: float32, temps: float64
+    - seules les valeurs qui changent sont enregistrées
+    - la moyenne de toutes les valeurs passées est tenue à jour par tâche (O(1))
+    - capacite_max: au-delà, l'historique est réduit selon la politique
+      'sous_echantillonner' (un point sur deux) ou 'fenetre' (les plus récents)
+    """
+    POLITIQUES = ('sous_echantillonner', 'fenetre')
+
+    def __init__(self, ids_taches, capacite_max=None, politique='sous_echantillonner'):
+        if politique not in self.POLITIQUES:
+            raise ValueError(f"Politique d'historique inconnue: {politique}")
+        self.ids_taches = ids_taches
+        self.index_taches = {tache_id: i for i, tache_id in enumerate(ids_taches)}
+        self.capacite_max = capacite_max
+        self.politique = politique
+        self.taches = array('i')
+        self.performances = array('f')
+        self.temps = array('d')
+        self.sommes = np.zeros(len(ids_taches))
+        self.nombre = 0  # Nombre de mises à jour (une valeur par tâche à chaque fois)
+        self._dernieres = np.full(len(ids_taches), np.nan)
+
+    def enregistrer(self, performances, temps):
+        """Ajoute le vecteur de performances (indexé comme ids_taches) observé à l'instant temps"""
+        self.sommes += performances
+        self.nombre += 1
+        modifiees = np.flatnonzero(performances != self._dernieres)
+        if modifiees.size:
+            self.taches.frombytes(modifiees.astype(np.intc).tobytes())
+            self.performances.frombytes(performances[modifiees].astype(np.float32).tobytes())
+            self.temps.frombytes(np.full(modifiees.size, temps, dtype=np.float64).tobytes())
+            self._dernieres[modifiees] = performances[modifiees]
+            if self.capacite_max is not None and len(self.taches) > self.capacite_max:
+                self._reduire()
+
+    def _reduire(self):
+        if self.politique == 'fenetre':
+            debut = len(self.taches) - self.capacite_max
+            garder = slice(debut, None)
+        else:
+            garder = slice(None, None, 2)
+        self.taches = array('i', self.taches[garder])
+        self.performances = array('f', self.performances[garder])
+        self.temps = array('d', self.temps[garder])
+
+    def moyenne(self, tache_id):
+        """Moyenne de toutes les performances passées sur la tâche, None si aucune"""
+        i = self.index_taches.get(tache_id)
+        if i is None or not self.nombre:
+            return None
+        return self.sommes[i] / self.nombre
+
+    def par_tache(self, taches_retenues=None):
+        """{tache_id: {'temps': [...], 'perf': [...]}} pour le suivi et les graphiques"""
+        evolution = {}
+        for i, perf, temps in zip(self.taches, self.performances, self.temps):
+            tache_id = self.ids_taches[i]
+            if taches_retenues is not None and tache_id not in taches_retenues:
+                continue
+            donnees = evolution.setdefault(tache_id, {'temps': [], 'perf': []})
+            donnees['temps'].append(temps)
+            donnees['perf'].append(round(perf, 6))
+        return evolution
+
+    def __iter__(self):
+        """(tache_id, performance, temps) comme l'ancienne liste de tuples"""
+        for i, perf, temps in zip(self.taches, self.performances, self.temps):
+            yield self.ids_taches[i], perf, temps
+
+    def __len__(self):
+        return len(self.taches)
+
 class Operator:
-    instances = []
+    __slots__ = (
+        'id', 'index', 'learning_params', 'performancess', 'taches_affectees', 'machine_actuelle',
+        'tache_actuellee', 'tache_actuelle', 'historique_performance', 'historique_travail',
+        'temps_travail', 'derniere_execution', 'ids_taches', 'index_taches', 'vecteur_performance',
+        'vecteur_derniere_execution', 'vecteur_derniere_performance',
+    )
+    P_MAX = 1.15  # Performance maximale théorique
+    P_MIN = 0.3   # Performance minimale théorique
     
-    def __init__(self, op_id, learning_params, initial_performance):
+    def __init__(self, op_id, learning_params, initial_performance, capacite_historique=None,
+                 politique_historique='sous_echantillonner'):
         self.id = op_id
+        self.index = None  # Position dans la liste des opérateurs du contexte
         self.learning_params = learning_params  # {'LC': float, 'FC': float}
         self.performancess   = initial_performance  # Dict: {tache_id: performance}
         self.taches_affectees = {}  # {ordre: tache_id}
         self.machine_actuelle = None
         self.tache_actuellee=None
-        self.historique_performance = []  #  Suivi temporel [[(tache,per,temps)...x24taches]....xnombre de taches assignees)]
+        self.tache_actuelle = None
         self.historique_travail = []      #  [(tache_id, début, fin)]
         self.temps_travail=0           #  Pour l'équité
         self.derniere_execution = {}      #  {tache_id: timestamp}
-        Operator.instances.append(self)
+        # Vecteurs indexés par position de tâche (ordre de performancess)
+        self.ids_taches = list(initial_performance)
+        self.index_taches = {tache_id: i for i, tache_id in enumerate(self.ids_taches)}
+        self.vecteur_performance = np.array(list(initial_performance.values()), dtype=float)
+        self.vecteur_derniere_execution = np.full(len(self.ids_taches), np.nan)  # temps, nan si jamais exécutée
+        self.vecteur_derniere_performance = np.full(len(self.ids_taches), self.P_MIN)
+        self.historique_performance = HistoriquePerformance(
+            self.ids_taches, capacite_historique, politique_historique)  # Suivi temporel
     
     def mettre_a_jour_performance(self, tache_d,temps,simulation):
-        # Paramètres fixes
-        P_max = 1.15  # Performance maximale théorique
-        P_min = 0.3   # Performance minimale théorique
-        # Applique effet d'apprentissage/oubli
-        for tache_id in self.performancess  :
-            performance_actuelle=self.performancess[tache_id]
-            performance_actuellee=1
-            # 1. Enregistrement dans l'historique avant modification
-            self.historique_performance.append((tache_id, performance_actuelle,simulation.temps_actuel))
-             
-            # 2. Calcul des indicateurs clés
-            X = self.compter_repetitions(tache_id)  # Nombre de répétitions
-            Y = self.calculer_interruption(tache_id,simulation)  # Temps d'inactivité (jours)
-            # 3. Application sélective des effets
-            
-             # Sécurité pour les calculs exponentiels
-            def safe_exp(x, max_val=700):
-                return math.exp(max(min(x, max_val), -max_val))
-            # Effet d'APPRENTISSAGE (équation 3)
-            if X > 0:
-                T_learned = min(self.temps_total_passe(tache_id), 10000)  # Temps cumulé sur la tâche
-                Md = T_learned/2
-                s = self.learning_params['LC']  # Taux d'apprentissage
-                performance_actuellee  =self.calculate_learning_effect(X, performance_actuelle , P_max,s, T_learned, Md)
-                performance_actuelleee  = max(P_min, min(P_max, performance_actuellee  ))
-                self.performancess[tache_id] = performance_actuelleee
-            # Effet d'OUBLI (équation 4) si inactif > 1 jour
-            elif Y>0:
-                    F = self.learning_params['FC']  # Taux d'oubli
-                    Sd = 0.1
-                    P_last = self.derniere_execution.get(tache_id, {}).get('performance', P_min)
-                    performance_actuellee   =self.calculate_forgetting_effect(Y, P_last, P_min, F, Sd)
-                    # 4. Contraintes de performance
-                    performance_actuelleee  = max(P_min, min(P_max, performance_actuellee  ))
-                    self.performancess[tache_id] = performance_actuelleee
-            if tache_id==tache_d:
-                self.derniere_execution[tache_id] = {'temps': temps, 'performance': performance_actuelle}
+        """
+        Applique les effets d'apprentissage (équation 3) et d'oubli (équation 4)
+        à toutes les tâches de l'opérateur en un seul passage sur les vecteurs.
+        Retourne True si au moins une performance a changé.
+        """
+        P_max = self.P_MAX
+        P_min = self.P_MIN
+        performance_actuelle = self.vecteur_performance
+        simulation.mises_a_jour_apprentissage += 1
+        # 1. Enregistrement dans l'historique avant modification
+        self.historique_performance.enregistrer(performance_actuelle, simulation.temps_actuel)
+
+        # 2. Calcul des indicateurs clés
+        courante = self.index_taches.get(self.tache_actuellee.id)
+        X = np.zeros(len(self.ids_taches))  # Nombre de répétitions
+        if courante is not None:
+            X[courante] = self.tache_actuellee.nembre_repition
+        Y = self.calculer_interruptions(courante, simulation)  # Temps d'inactivité (jours)
+
+        # 3. Application sélective des effets
+        nouvelle_performance = performance_actuelle.copy()
+        # Effet d'APPRENTISSAGE (équation 3)
+        apprentissage = X > 0
+        if apprentissage.any():
+            nouvelle_performance[apprentissage] = self.calculer_effet_apprentissage_vectoriel(
+                performance_actuelle[apprentissage], P_max)
+        # Effet d'OUBLI (équation 4) si inactif > 1 jour
+        oubli = ~apprentissage & (Y > 0)
+        if oubli.any():
+            nouvelle_performance[oubli] = self.calculer_effet_oubli_vectoriel(
+                Y[oubli], self.vecteur_derniere_performance[oubli], P_min, self.learning_params['FC'], 0.1)
+        # 4. Contraintes de performance
+        np.clip(nouvelle_performance, P_min, P_max, out=nouvelle_performance, where=apprentissage | oubli)
+
+        indice_d = self.index_taches.get(tache_d)
+        if indice_d is not None:
+            self.derniere_execution[tache_d] = {'temps': temps, 'performance': float(performance_actuelle[indice_d])}
+            self.vecteur_derniere_execution[indice_d] = temps
+            self.vecteur_derniere_performance[indice_d] = performance_actuelle[indice_d]
+
+        # 5. Synchronisation du dictionnaire pour les seules valeurs modifiées
+        modifiees = np.flatnonzero(nouvelle_performance != performance_actuelle)
+        for i in modifiees.tolist():
+            self.performancess[self.ids_taches[i]] = float(nouvelle_performance[i])
+        self.vecteur_performance = nouvelle_performance
+        return modifiees.size > 0
+
+    def calculer_effet_apprentissage_vectoriel(self, P_previous, P_max=1.15):
+        """
+        Version vectorielle de calculate_learning_effect: après répétition,
+        la performance est portée à son maximum (1.15).
+        """
+        return np.full_like(P_previous, 1.15)
+
+    def calculer_effet_oubli_vectoriel(self, t, P_last, P_min, F=0.1, Sd=1.0):
+        """Version vectorielle de calculate_forgetting_effect (mêmes paramètres, tableaux t et P_last)"""
+        denominator = 1 - np.exp(F * (t - Sd))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            P_t = np.where(denominator == 0, P_min, P_min + (P_last - P_min) / denominator)
+        return np.clip(P_t, P_min, 1.15)
+
+    def calculer_interruptions(self, courante, simulation):
+        """Version vectorielle de calculer_interruption pour toutes les tâches de l'opérateur"""
+        derniere = self.vecteur_derniere_execution
+        duree_jours = np.where(
+            np.isnan(derniere),
+            simulation.temps_actuel / (60 * 8),
+            (simulation.temps_actuel - derniere) / (60 * 8)
+        )
+        if courante is not None:
+            duree_jours[courante] = 0
+        # L'oubli ne s'active qu'après 1 jour complet
+        return np.maximum(0, duree_jours - 1)
 
     def calculate_learning_effect( self,  n, P_previous, P_max=1.15, S=0.1, T_learned=1, Md=0.5):
         """
@@ -90,7 +223,7 @@ class Operator:
             
         except:
             # En cas d'erreur inattendue, retourner une valeur par défaut
-            print('Erreur de calcule')
+            logger.warning('Erreur de calcul de l\'effet d\'apprentissage')
             return P_previous
     
     def calculate_forgetting_effect(self, t, P_last, P_min, F=0.1, Sd=1.0):
@@ -132,16 +265,16 @@ class Operator:
                         'Fin': fin,
                         'Machine': self.machine_actuelle
                     })
-                else: print(debut,fin)
+                else: logger.debug('Plage non terminée: %s %s', debut, fin)
             
             return data
 
-    def temps_total_passe(self, tache_id):
+    def temps_total_passe(self, tache_id, registre):
         """Calcule le temps cumulé passé sur une tâche"""
-        for tache in Task.instances:
-            if tache.id==tache_id:
-                return tache.temps_reel
-        return 0
+        tache = registre.tache(tache_id)
+        if tache is None:
+            return 0
+        return tache.temps_reel
 
     def demarrer_tache(self, tache, temps_debut):
         self.historique_travail.append((tache.id, temps_debut, None))
@@ -175,8 +308,6 @@ class Operator:
         return max(0, duree_jours - 1)
 
 class Product:
-    instances = []
-    
     def __init__(self, pid, tasks, std_times, quantity, cr, machines_requises):
         self.id = pid
         self.tasks = tasks  # Liste des tâches [T1, T2, ...]
@@ -186,23 +317,28 @@ class Product:
         self.nembre_repition=quantity
         self.machines_requises = machines_requises  # NEW: {tache_id: machine_id}
         self.quantite_restante = quantity  # NEW: Suivi par tâche
-        Product.instances.append(self)
         if quantity <= 0:
             raise ValueError("La quantité doit être positive.")
     def __str__(self):
         return f"{self.id}"  # <-- Si cette méthode existe, modifiez-la    
 
 class Task:
-    instances = []
-    
+    __slots__ = (
+        'id', 'index', 'product', 'phase', 'precedence', 'temps_standard', 'machines_compatibles',
+        'machine_requise', 'operateur_affecte', 'temps_debut', 'temps_fin', 'temps_restant', 'quantite',
+        'nembre_repition', 'next_tasks', 'temps_reel', 'temps_attente', 'cr', 'quantite_restante',
+        'est_en_cours', 'facteur_duree', 'groupe_machines',
+    )
     def __init__(self, tid, product, phase, precedence=None):
         self.id = tid
+        self.index = None  # Position dans le Registre
         self.product = product
         self.phase = phase
         self.precedence = precedence  # Task précédente (si phase > 1)
         self.temps_standard = product.std_times[tid]
         self.machines_compatibles= product.machines_requises[tid]
-        self.machine_requise = self.determiner_machine()
+        self.groupe_machines = None  # GroupeMachines, renseigné par le Registre
+        self.machine_requise = self.machines_compatibles[0]
         self.operateur_affecte = None
         self.temps_debut = None
         self.temps_fin = 0
@@ -214,8 +350,8 @@ class Task:
         self.temps_attente=0
         self.cr=product.cr
         self.quantite_restante=product.quantity
-        Task.instances.append(self)
         self.est_en_cours=False
+        self.facteur_duree = 1.0  # Aléa appliqué à la durée (mode stochastique)
     def ajouter_next_task(self, task):
         self.next_tasks.append(task)
     def __eq__(self, other):
@@ -233,24 +369,19 @@ class Task:
         return f"Task(id={self.id}, product={self.product.id}, phase={self.phase})"
 
     def determiner_machine(self):
-        machine = self.machines_compatibles[0]
-
-        if len(self.machines_compatibles) > 1 and Simulation.instances:
-            for machine_ in self.machines_compatibles:
-                if self.calculer_temps_restant(machine_) < self.calculer_temps_restant(machine):
-                    machine = machine_
-        return machine
-
-    def calculer_temps_restant(self, machine):
-        temps_restant = 0
-        if machine.tache_actuelle and Simulation.instances:
-            temps_actuel = Simulation.instances[0].temps_actuel
-            temps_restant = max(0, machine.tache_actuelle.temps_fin - temps_actuel)
-        return temps_restant
+        """
+        Route la tâche vers la machine compatible qui se libère le plus tôt (O(log M),
+        voir GroupeMachines) et la retient comme machine_requise
+        """
+        if self.groupe_machines is not None:
+            self.machine_requise = self.groupe_machines.plus_tot_libre()
+        return self.machine_requise
       
 class Machine:
-    instances = []
-    
+    __slots__ = (
+        'id', 'taches_compatibles', 'tache_en_attente', 'tache_actuelle', 'historique', 'temps_setup',
+        'indisponible_jusqua', 'libre_a', 'groupes',
+    )
     def __init__(self, mid, taches_compatibles):
         self.id = mid
         self.taches_compatibles = taches_compatibles  # Liste des tâches pouvant être exécutées
@@ -258,12 +389,20 @@ class Machine:
         self.tache_actuelle = None
         self.historique = []  # [(tache_id, op_id, début, fin)]
         self.temps_setup = 0  # Temps de changement de tâche
-        Machine.instances.append(self)
+        self.indisponible_jusqua = 0  # Fin de panne (replanification), 0 si en service
+        self.libre_a = 0  # Fin de la dernière tâche affectée (ou de la panne)
+        self.groupes = []  # [(GroupeMachines, rang)] des groupes de plusieurs machines qui la contiennent
     
     def demarrer_tache(self, tache):
         if self.tache_actuelle:
             self.temps_setup = 5  # Ex: 5 min de setup
         self.tache_actuelle = tache
+    def definir_libre_a(self, temps):
+        """Nouvel instant où la machine se libère, signalé aux groupes dont elle fait partie"""
+        self.libre_a = temps
+        for groupe, rang in self.groupes:
+            groupe.signaler(rang)
+
     def determiner_tache(self):
         tache=None
         if self.tache_en_attente:
@@ -281,8 +420,108 @@ class Machine:
             })
         return data
     
+class GroupeMachines:
+    """
+    Machines compatibles d'une tâche (toutes les tâches qui ont les mêmes partagent le groupe).
+
+    Un tas de (libre_a, rang) donne la machine qui se libère le plus tôt en O(log M).
+    Chaque changement de libre_a ajoute une entrée (Machine.definir_libre_a); les
+    entrées périmées sont écartées quand elles arrivent en tête.
+    """
+    __slots__ = ('machines', 'tas')
+
+    def __init__(self, machines):
+        self.machines = list(machines)
+        self.tas = []
+        if len(self.machines) > 1:
+            for rang, machine in enumerate(self.machines):
+                machine.groupes.append((self, rang))
+            self._reconstruire()
+
+    def _reconstruire(self):
+        self.tas = [(machine.libre_a, rang) for rang, machine in enumerate(self.machines)]
+        heapq.heapify(self.tas)
+
+    def signaler(self, rang):
+        heapq.heappush(self.tas, (self.machines[rang].libre_a, rang))
+        if len(self.tas) > 4 * len(self.machines):
+            self._reconstruire()  # Borne la place prise par les entrées périmées
+
+    def plus_tot_libre(self):
+        """Machine qui se libère le plus tôt (à égalité, la première de la liste)"""
+        if len(self.machines) == 1:
+            return self.machines[0]
+        tas = self.tas
+        while tas[0][0] != self.machines[tas[0][1]].libre_a:
+            heapq.heappop(tas)
+        return self.machines[tas[0][1]]
+
+class Registre:
+    """
+    Index des tâches d'une simulation pour éviter les parcours de toutes les tâches.
+
+    - taches: {tache_id: Task}
+    - par_produit: {produit_id: [Task, ...]}
+    - par_machine: {machine_id: [Task, ...]} (toutes les machines compatibles)
+    - groupes: {(machine_id, ...): GroupeMachines} partagés par les tâches aux mêmes machines
+    - successeurs: {tache_id: [Task, ...]}
+    - rang: {tache_id: position} (ordre de création, pour garder un ordre stable)
+    """
+    def __init__(self, taches=()):
+        self.taches = {}
+        self.rang = {}
+        self.liste = []  # Tâches dans l'ordre des rangs
+        self.par_produit = {}
+        self.par_machine = {}
+        self.successeurs = {}
+        self.groupes = {}
+        for tache in taches:
+            self.ajouter(tache)
+
+    def ajouter(self, tache):
+        self.taches[tache.id] = tache
+        self.rang[tache.id] = len(self.rang)
+        tache.index = len(self.liste)
+        self.liste.append(tache)
+        self.par_produit.setdefault(tache.product.id, []).append(tache)
+        for machine in tache.machines_compatibles:
+            self.par_machine.setdefault(machine.id, []).append(tache)
+        cle = tuple(machine.id for machine in tache.machines_compatibles)
+        if cle not in self.groupes:
+            self.groupes[cle] = GroupeMachines(tache.machines_compatibles)
+        tache.groupe_machines = self.groupes[cle]
+        self.successeurs.setdefault(tache.id, [])
+
+    def lier_precedences(self):
+        """Remplace les id de précédence par les objets Task et remplit les successeurs"""
+        for tache in self.taches.values():
+            if tache.precedence is None or isinstance(tache.precedence, Task):
+                continue
+            precedente = self.taches.get(tache.precedence)
+            if precedente is not None:
+                tache.precedence = precedente
+                self.successeurs[precedente.id].append(tache)
+                precedente.ajouter_next_task(tache)
+
+    def tache(self, tache_id):
+        return self.taches.get(tache_id)
+
+    def taches_du_produit(self, produit_id):
+        return self.par_produit.get(produit_id, [])
+
+    def taches_de_machine(self, machine_id):
+        return self.par_machine.get(machine_id, [])
+
+    def successeurs_de(self, tache):
+        return self.successeurs.get(tache.id, [])
+
 class Ordonnanceur:
-    def __init__(self, poids_cout=0.4, poids_equite=0.2, poids_makespan=0.2, poids_performance=0.2,poids_penalite_attente=0.5):
+    MODES_SCORE = ('scalaire', 'vectoriel')
+
+    def __init__(self, poids_cout=0.4, poids_equite=0.2, poids_makespan=0.2, poids_performance=0.2,poids_penalite_attente=0.5, registre=None, mode_score='scalaire'):
+        if mode_score not in self.MODES_SCORE:
+            raise ValueError(f"Mode de score inconnu: {mode_score}")
+        self.mode_score = mode_score  # 'scalaire': un appel par tâche, 'vectoriel': un passage NumPy
         self.poids = {
             "cout": poids_cout,
             "equite": poids_equite,
@@ -290,21 +529,75 @@ class Ordonnanceur:
             "performance": poids_performance,
             "penalite_attente":poids_penalite_attente
         }
+        self.registre = registre
+        # Bornes de normalisation du makespan, calculées une fois par simulation
+        self.bornes_makespan = None
+        self._produits_bornes = []
+        self._temps_total_taches = 0
+        self._temps_par_operateur = {}  # {op_id: temps estimé au pire cas}
+        # Accumulateurs de charge (temps_travail) pour l'équité en O(1)
+        self._operateurs_charge = []
+        self._somme_travail = 0.0
+        self._somme_carres_travail = 0.0
+        # Index par groupe de machines {GroupeMachines: {Task, ...}} des tâches non affectées:
+        # - taches_restantes: toutes (quantité restante)
+        # - taches_pretes: celles dont la précédence est levée
+        # - attente_precedence: celles dont la précédence est affectée mais pas terminée
+        # Tenus à jour à l'affectation et à la fin des tâches; taches_non_disponibles s'en sert
+        # au lieu de parcourir toutes les tâches.
+        self.taches_restantes = {}
+        self.taches_pretes = {}
+        self.attente_precedence = {}
+        self.scores_evalues = 0  # Nombre de tâches candidates évaluées (suivi des performances)
+        self.decisions = None  # Liste de (durée en s, candidates) par décision si on la fournit (métriques)
+        if registre is not None:
+            for tache in registre.taches.values():
+                if tache.quantite_restante > 0:
+                    self._indexer(self.taches_restantes, tache)
+                    if tache.precedence is None:
+                        self.ajouter_tache_prete(tache)
 #methodes de selection       
     def choisir_tache(self, operateur, simulation,tache_finie):
-        scores = []
+        if self.decisions is None:
+            return self._choisir_tache(operateur, simulation)
+        debut, evalues = time.perf_counter(), self.scores_evalues
+        tache = self._choisir_tache(operateur, simulation)
+        self.decisions.append((time.perf_counter() - debut, self.scores_evalues - evalues))
+        return tache
+
+    def _choisir_tache(self, operateur, simulation):
         taches_disponibles=self.taches_disponibles_pour_operateur(operateur, simulation)
-        # 1. Évaluer les tâches disponibles classiques
         for tache in taches_disponibles:
             tache.temps_attente=0
-            score = self._calculer_score(operateur, tache, simulation, temps_attente=0)
+        taches_no_disponibles=self.taches_non_disponibles(simulation)
+        self.scores_evalues += len(taches_disponibles) + len(taches_no_disponibles)
+
+        if self.mode_score == 'vectoriel':
+            meilleure_op = self._choisir_par_lot(operateur, simulation, taches_disponibles, taches_no_disponibles)
+        else:
+            meilleure_op = self._choisir_par_tache(operateur, simulation, taches_disponibles, taches_no_disponibles)
+        if meilleure_op is None:
+            return None
+        for dic in taches_no_disponibles:
+            if meilleure_op.id==dic['tache'].id:
+                meilleure_op.temps_attente=dic['temps_restant']
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug('taches en cours %s', [tache.id for tache in self.registre.taches.values() if tache.est_en_cours])
+        return meilleure_op 
+
+    def _choisir_par_tache(self, operateur, simulation, taches_disponibles, taches_no_disponibles):
+        scores = []
+        # L'équité ne dépend pas de la tâche: un seul calcul par décision
+        score_equite = self._normaliser_equite(self._calculer_equite())
+        # 1. Évaluer les tâches disponibles classiques
+        for tache in taches_disponibles:
+            score = self._calculer_score(operateur, tache, simulation, temps_attente=0, score_equite=score_equite)
             scores.append((score, tache))
-       
             
         # 2. Évaluer les tâches non disponibles (avec temps d'attente estimé)
-        taches_no_disponibles=self.taches_non_disponibles(simulation)
         for dic in taches_no_disponibles:
-            score = self._calculer_score(operateur, dic['tache'], simulation, temps_attente=dic['temps_restant'])
+            score = self._calculer_score(operateur, dic['tache'], simulation, temps_attente=dic['temps_restant'],
+                                         score_equite=score_equite)
             scores.append((score, dic['tache'], dic['temps_restant']))
 
         # 3. Sélectionner la meilleure option
@@ -312,16 +605,22 @@ class Ordonnanceur:
             return None
         # Priorité aux tâches disponibles (temps_attente=0) si score similaire
         meilleure_option = max(scores, key=lambda x: (x[0], -x[2] if len(x) > 2 else 0))
-        '''existe = any(tache.id == next_task.id for (score, tache,x) in scores)
-        if existe:
-            return next_task'''
-        meilleure_op=meilleure_option[1]
-        for dic in taches_no_disponibles:
-            if meilleure_op.id==dic['tache'].id:
-                meilleure_op.temps_attente=dic['temps_restant']
-        print('taches en cours',list(tache.id for tache in Task.instances if tache.est_en_cours))
-        return meilleure_op 
-    
+        return meilleure_option[1]
+
+    def _choisir_par_lot(self, operateur, simulation, taches_disponibles, taches_no_disponibles):
+        """Même choix que _choisir_par_tache, avec tous les scores calculés en un passage NumPy"""
+        taches = taches_disponibles + [dic['tache'] for dic in taches_no_disponibles]
+        if not taches:
+            return None
+        temps_attente = np.zeros(len(taches))
+        temps_attente[len(taches_disponibles):] = [dic['temps_restant'] for dic in taches_no_disponibles]
+        scores = self._calculer_scores_lot(operateur, taches, simulation, temps_attente)
+
+        # Meilleur score, puis attente la plus courte, puis premier rencontré (comme max())
+        meilleurs = np.flatnonzero(scores == scores.max())
+        meilleur = meilleurs[np.argmax(-temps_attente[meilleurs])]
+        return taches[meilleur]
+
     def affecter_tache(self, operateur, tache, simulation):
         """
         - Le séquençage des tâches
@@ -335,11 +634,13 @@ class Ordonnanceur:
         # 2. Calcul du temps pour toute la quantité
         quantite = tache.quantite
         temps_unitaire = tache.temps_standard + tache.temps_standard*(1- operateur.performancess [tache.id])
-        temps_real = temps_unitaire * quantite 
-        print('le temps d attente ',tache.temps_attente)
+        tache.facteur_duree = simulation.tirer_facteur_duree()
+        temps_real = temps_unitaire * quantite * tache.facteur_duree
+        logger.debug('le temps d attente %s', tache.temps_attente)
         # 3. Marquage comme complètement réservée
         tache.est_en_cours = True
         tache.quantite_restante = 0  # Épuise immédiatement la quantité
+        self.marquer_affectee(tache)
 
         # 4. Mise à jour des états
         temps_debut=simulation.temps_actuel+tache.temps_attente
@@ -353,32 +654,22 @@ class Ordonnanceur:
         tache.temps_debut = simulation.temps_actuel
         tache.temps_fin = temps_debut + temps_real
         tache.temps_reel=temps_real
+        self.ajouter_temps_travail(operateur, temps_real)
         temps_fin=tache.temps_fin
         operateur.historique_travail.append((tache.id,temps_debut,temps_fin))
         machine =tache.machine_requise
         machine.historique.append((tache.id,operateur.id,temps_debut,temps_fin))
+        machine.definir_libre_a(max(machine.libre_a, temps_fin))
         operateur.machine_actuelle=machine.id
 
         # 5. Création des événements
-        simulation.ajouter_evenement(Evenement(
-            temps=temps_debut,
-            type="DEBUT_TACHE",
-            tache=tache,
-            operateur=operateur,
-            machine=tache.machine_requise
-        ))
-
-        simulation.ajouter_evenement(Evenement(
-            temps=temps_fin,
-            type="FIN_TACHE",
-            tache=tache,
-            operateur=operateur,
-            machine=tache.machine_requise
-        ))
-
-        print(f"[AFFECTATION] {operateur.id} → {tache.id} ({tache.product.id}) "
-            f"Quantité:{quantite} | Temps:{temps_real:.1f}min | "
-            f"Fin à t={tache.temps_fin:.1f}")
+        simulation.ajouter_evenement(temps_debut, DEBUT_TACHE, tache, operateur)
+        simulation.ajouter_evenement(temps_fin, FIN_TACHE, tache, operateur)
+
+        if simulation.trace is not None:
+            simulation.trace.enregistrer('AFFECTATION', simulation.temps_actuel, tache, operateur)
+        logger.debug("[AFFECTATION] %s → %s (%s) Quantité:%s | Temps:%.1fmin | Fin à t=%.1f",
+                     operateur.id, tache.id, tache.product.id, quantite, temps_real, tache.temps_fin)
         
         return True
 
@@ -391,7 +682,13 @@ class Ordonnanceur:
         tache.operateur_affecte.tache_actuelle = None
         tache.est_en_cours = False
         simulation.termines.add(tache)
-        print('les taches terminees',list(tache.id for tache in simulation.termines))
+        # 2. Libération des tâches suivantes du workflow
+        for suivante in self.registre.successeurs_de(tache):
+            self._desindexer(self.attente_precedence, suivante)
+            if suivante.quantite_restante > 0:
+                self.ajouter_tache_prete(suivante)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug('les taches terminees %s', [tache.id for tache in simulation.termines])
 
         '''# 2. Trouver la tâche suivante dans le workflow
         next_task = self._trouver_tache_suivante(tache)
@@ -412,7 +709,7 @@ class Ordonnanceur:
         
         if current_index + 1 < len(product.tasks):
             next_task_id = product.tasks[current_index + 1]
-            return next(t for t in Task.instances if t.id == next_task_id)
+            return self.registre.tache(next_task_id)
         return None
 
     def _preparer_affectation(self, operateur, next_task, simulation):
@@ -423,17 +720,17 @@ class Ordonnanceur:
             self.affecter_tache(operateur, next_task, simulation)    
 
 #methodes de calcules
-    def _calculer_score(self,operateur, tache, simulation, temps_attente):
+    def _calculer_score(self,operateur, tache, simulation, temps_attente, score_equite=None):
         score = 0
         # Calcul des scores bruts
         cout_brut = self._calculer_cout(operateur, tache)         
         perf_brut = self._calculer_performance(operateur, tache)  
-        equite_brut = self._calculer_equite(operateurs=Operator.instances)
         makespan_brut = self._calculer_makespan(operateur,simulation, tache)
         # Normalisation des scores bruts
         score_cout = self._normaliser_cout(cout_brut)              
         score_perf = self._normaliser_performance(perf_brut)       
-        score_equite=self._normaliser_equite(equite_brut)
+        if score_equite is None:
+            score_equite=self._normaliser_equite(self._calculer_equite())
         score_makespan = self._normaliser_makespan(makespan_brut)
         
         # Combinaison pondérée
@@ -447,39 +744,103 @@ class Ordonnanceur:
         score=score_total
         return score
 
+    def _calculer_scores_lot(self, operateur, taches, simulation, temps_attente):
+        """
+        Version vectorielle de _calculer_score pour une liste de tâches.
+        Les opérations sont faites dans le même ordre pour obtenir les mêmes valeurs.
+        """
+        temps_standard = np.array([tache.temps_standard for tache in taches], dtype=float)
+        performance = np.array([operateur.performancess[tache.id] for tache in taches], dtype=float)
+        cr = np.array([tache.product.cr for tache in taches], dtype=float)
+        perf_brut = np.array([self._calculer_performance(operateur, tache) for tache in taches], dtype=float)
+
+        # Coût (voir _calculer_cout et _normaliser_cout)
+        cout = (temps_standard / performance - temps_standard) * cr
+        cout_brut = np.clip(1 - (cout / 1000), 0.0, 1.0)
+        score_cout = 1 - (cout_brut - 0) / (1000 - 0)
+        # Performance
+        score_perf = perf_brut / 1.15
+        # Équité: identique pour toutes les tâches
+        score_equite = self._normaliser_equite(self._calculer_equite())
+        # Makespan (voir _calculer_makespan et _normaliser_makespan)
+        impact = simulation.temps_actuel + (temps_standard / performance) - simulation.makespan_actuel
+        makespan_brut = np.clip(1 - (impact / 240), 0.0, 1.0)
+        min_m, max_m = self.bornes_makespan
+        score_makespan = np.clip(1 - (makespan_brut - min_m) / (max_m - min_m + 1e-6), 0, 1)
+
+        return (
+            self.poids["cout"] * score_cout +
+            self.poids["performance"] * score_perf+
+            self.poids["equite"] * score_equite +
+            self.poids["makespan"] * score_makespan-
+            self.poids["penalite_attente"] * (temps_attente / simulation.temps_max)
+        )
+
     def _calculer_performance(self, operateur, tache):
         """
         Score basé sur la performance passée de l'opérateur sur cette tâche.
         Plus la performance est élevée, meilleur est le score.
         """
-        # Récupère la performance moyenne historique (ex: moyenne des 5 dernières exécutions)
-        performances = [hist[1] for hist in operateur.historique_performance 
-                       if hist[0] == tache.id]
-        perf_moyenne = sum(performances) / len(performances) if performances else operateur.performancess.get(tache.id, 0.1)
+        # Récupère la performance moyenne historique (tenue à jour par HistoriquePerformance)
+        perf_moyenne = operateur.historique_performance.moyenne(tache.id)
+        if perf_moyenne is None:
+            perf_moyenne = operateur.performancess.get(tache.id, 0.1)
         
         return perf_moyenne 
 
-    def _calculer_equite(self, operateurs):
+    def _calculer_equite(self):
         """
         Calcule un score d'équité basé sur l'écart de charge entre opérateurs.
         Retourne un score normalisé entre 0 (inéquité max) et 1 (équité parfaite).
         """
-        # 1. Récupérer les temps de travail de chaque opérateur
-        temps_travail = [op.temps_travail for op in operateurs]
-        
-        if not temps_travail:
+        if not self._operateurs_charge:
             return 1.0  # Cas par défaut si aucun opérateur
         
-        # 2. Calculer l'écart-type (mesure d'inéquité)
-        ecart_type = np.std(temps_travail)
+        # 1. Écart-type des temps de travail (mesure d'inéquité), tenu à jour en O(1)
+        ecart_type = self._ecart_type_travail()
         
-        # 3. Normalisation inverse (1 - valeur normalisée)
-        max_ecart = max(temps_travail) - min(temps_travail) if len(temps_travail) > 1 else 0
+        # 2. Normalisation inverse (1 - valeur normalisée)
         max_theorique = 500  # Exemple: valeur maximale estimée pour votre simulation
         score = 1 - (ecart_type / max_theorique)
         
-        # 4. Bornage entre 0 et 1
+        # 3. Bornage entre 0 et 1
         return max(0.0, min(1.0, score))
+
+    def initialiser_charge(self, operateurs):
+        """Initialise les accumulateurs de charge à partir des temps_travail des opérateurs"""
+        self._operateurs_charge = list(operateurs)
+        self._somme_travail = float(sum(op.temps_travail for op in self._operateurs_charge))
+        self._somme_carres_travail = float(sum(op.temps_travail ** 2 for op in self._operateurs_charge))
+
+    def ajouter_temps_travail(self, operateur, duree):
+        """Ajoute du travail à un opérateur et met à jour les accumulateurs d'équité"""
+        ancien = operateur.temps_travail
+        operateur.temps_travail = ancien + duree
+        self._somme_travail += duree
+        self._somme_carres_travail += operateur.temps_travail ** 2 - ancien ** 2
+
+    def _ecart_type_travail(self):
+        n = len(self._operateurs_charge)
+        moyenne = self._somme_travail / n
+        variance = self._somme_carres_travail / n - moyenne ** 2
+        return math.sqrt(max(0.0, variance))  # max: arrondis flottants
+
+    def dispersion_charge(self):
+        """
+        Dispersion courante de la charge entre opérateurs (suivi).
+
+        Returns:
+            dict: {'moyenne', 'ecart_type', 'min', 'max'} en minutes
+        """
+        if not self._operateurs_charge:
+            return {'moyenne': 0.0, 'ecart_type': 0.0, 'min': 0.0, 'max': 0.0}
+        temps_travail = [op.temps_travail for op in self._operateurs_charge]
+        return {
+            'moyenne': self._somme_travail / len(temps_travail),
+            'ecart_type': self._ecart_type_travail(),
+            'min': min(temps_travail),
+            'max': max(temps_travail)
+        }
     
     def _calculer_cout(self, operateur, tache):
         """
@@ -518,38 +879,21 @@ class Ordonnanceur:
         score = 1 - (impact / impact_max)
         return max(0.0, min(1.0, score))
     #ajouter temps de reglage 
-    def _estimer_temps_attente(self, tache, simulation,Machine):
-        """Calcule le temps avant qu'une tâche non disponible soit libérée"""
-        if self._machine_disponible( tache):
-            if tache.precedence and tache.precedence not in simulation.termines:
-                # Cas 1: Attente due à une tâche de précédence non terminée
-                if tache.precedence.operateur_affecte != None:
-                    return tache.precedence.temps_fin-simulation.temps_actuel+1
-                return 0
-        else:
-            # Cas 2: Attente due à une machine occupée
-            machine=tache.machine_requise
-            if machine.tache_actuelle:
-                if not  machine.tache_en_attente:
-                    if (not tache.precedence) or (tache.precedence and tache.precedence in simulation.termines):
-                        machine = tache.machine_requise
-                        return machine.tache_actuelle.temps_fin- simulation.temps_actuel+1
-                else: 
-                    return machine.tache_en_attente[-1].temps_fin - simulation.temps_actuel + 1
-            elif machine.tache_en_attente:
-                return machine.tache_en_attente[-1].temps_fin - simulation.temps_actuel + 1
-            else:
-                print('probleeeeeeeeeeeemmmmmmmmmmm')
-        return 0 # Si l'attente est indeterminée
+    def _fin_occupation(self, machine):
+        """
+        Instant où une machine non libre se libère: fin de la dernière tâche de sa file,
+        sinon de la tâche en cours, sinon de la panne. Lecture en O(1).
+        """
+        if machine.tache_en_attente:
+            return machine.tache_en_attente[-1].temps_fin
+        if machine.tache_actuelle:
+            return machine.tache_actuelle.temps_fin
+        return machine.indisponible_jusqua
 
     def mise_a_jour_qntt_prod(self,tache):
-        tem=0
-        for tache_id in tache.product.tasks:
-            for task in Task.instances:
-                if tache_id == task.id:
-                    tem+=task.quantite
+        tem=sum(task.quantite for task in self.registre.taches_du_produit(tache.product.id))
         if tem==0:
-            tache.produit.quantity=0
+            tache.product.quantity=0
         return True
     
 #methode de normalisation 
@@ -570,7 +914,7 @@ class Ordonnanceur:
         Returns:
             float: Score normalisé
         """
-        min_m, max_m = self._calculer_bornes_makespan(Product.instances,Operator.instances)
+        min_m, max_m = self.bornes_makespan
         
         # Formule de normalisation
         score = 1 - (makespan_brut - min_m) / (max_m - min_m + 1e-6)  # +1e-6 évite division par zéro
@@ -578,6 +922,52 @@ class Ordonnanceur:
         # Bornage entre 0 et 1
         return max(0, min(1, score))
 
+    def initialiser_bornes_makespan(self, produits, operateurs):
+        """Calcule les bornes du makespan au lancement de la simulation"""
+        self._produits_bornes = list(produits)
+        self._temps_total_taches = sum(
+            sum(tache.temps_standard for tache in self.registre.taches_du_produit(prod.id))
+            for prod in self._produits_bornes
+        )
+        self._temps_par_operateur = {
+            op.id: self._temps_operateur(op, self._produits_bornes) for op in operateurs
+        }
+        self._actualiser_bornes_makespan()
+        return self.bornes_makespan
+
+    def mettre_a_jour_bornes_makespan(self, operateur):
+        """Recalcule la contribution d'un opérateur après un changement de ses performances"""
+        self._temps_par_operateur[operateur.id] = self._temps_operateur(operateur, self._produits_bornes)
+        self._actualiser_bornes_makespan()
+        return self.bornes_makespan
+
+    def _actualiser_bornes_makespan(self):
+        if not self._temps_par_operateur:
+            self.bornes_makespan = None
+            return
+        self.bornes_makespan = self._ajuster_bornes_makespan(
+            self._temps_total_taches / len(self._temps_par_operateur),
+            max(self._temps_par_operateur.values())
+        )
+
+    def _temps_operateur(self, op, produits):
+        """Temps total (pire cas) si l'opérateur réalisait seul toutes les tâches qu'il connaît"""
+        return sum(
+            tache.temps_standard / op.performancess.get(tache.id, 0.35)  # 0.35 = perf minimale
+            for prod in produits
+            for tache in self.registre.taches_du_produit(prod.id)
+            if tache.id in op.performancess
+        )
+
+    def _ajuster_bornes_makespan(self, makespan_min_theorique, temps_max_operateur):
+        makespan_max_estime = temps_max_operateur * 1.5  # Marge de sécurité
+        
+        # Ajustement des bornes
+        makespan_min_theorique = max(1, makespan_min_theorique)  # Éviter division par zéro
+        makespan_max_estime = max(makespan_min_theorique * 2, makespan_max_estime)
+        
+        return makespan_min_theorique, makespan_max_estime
+
     def _calculer_bornes_makespan(self, produits, operateurs):
         """
         Calcule les bornes min/max théoriques du makespan
@@ -591,29 +981,16 @@ class Ordonnanceur:
         """
         # 1. Calcul du makespan minimal théorique (meilleur cas possible)
         temps_total_taches = sum(
-            sum(tache.temps_standard for tache in Task.instances if tache.product == prod)
+            sum(tache.temps_standard for tache in self.registre.taches_du_produit(prod.id))
             for prod in produits
         )
         makespan_min_theorique = temps_total_taches / len(operateurs)
         
         # 2. Estimation du makespan maximal (pire cas réaliste)
-        temps_par_operateur = []
-        for op in operateurs:
-            temps_op = sum(
-                tache.temps_standard / op.performancess.get(tache.id, 0.35)  # 0.35 = perf minimale
-                for prod in produits 
-                for tache in Task.instances 
-                if tache.product == prod and tache.id in op.performancess
-            )
-            temps_par_operateur.append(temps_op)
-        
-        makespan_max_estime = max(temps_par_operateur) * 1.5  # Marge de sécurité
+        temps_par_operateur = [self._temps_operateur(op, produits) for op in operateurs]
         
         # 3. Ajustement des bornes
-        makespan_min_theorique = max(1, makespan_min_theorique)  # Éviter division par zéro
-        makespan_max_estime = max(makespan_min_theorique * 2, makespan_max_estime)
-        
-        return makespan_min_theorique, makespan_max_estime
+        return self._ajuster_bornes_makespan(makespan_min_theorique, max(temps_par_operateur))
 
     def _normaliser_performance(self, perf_brute):
         """Performance est déjà dans [0, 1.15] -> on la ramène à [0, 1]"""
@@ -634,17 +1011,66 @@ class Ordonnanceur:
 
 #methodes de disponibilite
     def taches_disponibles_pour_operateur(self, operateur, simulation):
-        
-        liste= [
-            tache for tache in Task.instances
-            if self._tache_eligible(operateur, tache)
-            and self._est_prochaine_tache_logique(tache, simulation)
-            and self._machine_disponible(tache)
-            and tache.quantite_restante > 0
-        ]
-        print('tache disponible',list(tache.id for tache in liste))
+        """
+        Tâches prêtes dont la machine est libre et que l'opérateur sait faire.
+        Ne parcourt que l'ensemble des tâches prêtes, tenu à jour par
+        affecter_tache et terminer_tache. Pour une tâche à plusieurs machines
+        compatibles, c'est la première de son groupe à se libérer qui est testée
+        et retenue comme machine_requise.
+        """
+        liste = []
+        for groupe, taches in self.taches_pretes.items():
+            machine = groupe.plus_tot_libre()
+            if not self._machine_libre(machine, simulation):
+                continue
+            for tache in taches:
+                if self._tache_eligible(operateur, tache):
+                    tache.machine_requise = machine
+                    liste.append(tache)
+        liste.sort(key=lambda tache: self.registre.rang[tache.id])
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug('tache disponible %s', [tache.id for tache in liste])
         return liste
 
+    def ajouter_tache_prete(self, tache):
+        """Ajoute une tâche à l'ensemble des tâches prêtes (précédence levée ou tâche libérée)"""
+        self._indexer(self.taches_pretes, tache)
+
+    def retirer_tache_prete(self, tache):
+        """Retire une tâche de l'ensemble des tâches prêtes"""
+        self._desindexer(self.taches_pretes, tache)
+
+    def marquer_affectee(self, tache):
+        """Met les index à jour après l'affectation d'une tâche (affecter_tache, affectation initiale)"""
+        self._desindexer(self.taches_restantes, tache)
+        self._desindexer(self.taches_pretes, tache)
+        self._desindexer(self.attente_precedence, tache)
+        for suivante in self.registre.successeurs_de(tache):
+            if suivante.quantite_restante > 0:
+                self._indexer(self.attente_precedence, suivante)
+
+    def remettre_en_jeu(self, tache, simulation):
+        """Inverse de marquer_affectee, pour une tâche dont l'affectation est annulée (replanification)"""
+        self._indexer(self.taches_restantes, tache)
+        if tache.precedence is None or tache.precedence in simulation.termines:
+            self.ajouter_tache_prete(tache)
+        elif tache.precedence.operateur_affecte is not None:
+            self._indexer(self.attente_precedence, tache)
+        for suivante in self.registre.successeurs_de(tache):
+            self._desindexer(self.attente_precedence, suivante)
+
+    @staticmethod
+    def _indexer(index, tache):
+        index.setdefault(tache.groupe_machines, set()).add(tache)
+
+    @staticmethod
+    def _desindexer(index, tache):
+        taches = index.get(tache.groupe_machines)
+        if taches is not None:
+            taches.discard(tache)
+            if not taches:
+                del index[tache.groupe_machines]
+
     def _est_prochaine_tache_logique(self, tache, simulation):
         """
         Vérifie si c'est la prochaine tâche à faire dans le workflow du produit
@@ -664,48 +1090,91 @@ class Ordonnanceur:
             and operateur.performancess  [tache.id] >= 0.2  # Performance minimale requise
         )
    
-    def _machine_disponible(self, tache):
-        machine=tache.machine_requise
+    def _machine_disponible(self, tache, simulation=None):
+        return self._machine_libre(tache.machine_requise, simulation)
+
+    def _machine_libre(self, machine, simulation=None):
         if not machine.tache_en_attente and not machine.tache_actuelle:
-                return True
+                # Une machine en panne n'est pas libre (voir PanneMachine)
+                return simulation is None or machine.indisponible_jusqua <= simulation.temps_actuel
         return False  # Si aucune machine n'est compatible
 
     def taches_non_disponibles(self, simulation):
-        taches_bloquees = []
-        for tache in Task.instances:
-            if tache.quantite_restante>0:
-                # Trouver la machine compatible
-                machine = tache.machine_requise
-                if not machine:
-                        print('aucune machine compatible') 
-                # Calcul du temps restant si simulation est disponible
-                temps_restant = self._estimer_temps_attente( tache, simulation,Machine)
-                if temps_restant>0:
-                            taches_bloquees.append({
-                                'tache': tache,
-                                'temps_restant': temps_restant
-                            })
-        print('tache non disponible',list(dic['tache'].id for dic in taches_bloquees))
+        """
+        Tâches non affectées qui devront attendre, avec leur temps d'attente:
+        - machine libre: celles dont la précédence est affectée mais pas terminée (jusqu'à sa fin)
+        - machine avec une file: toutes celles du groupe (jusqu'à la fin de la file)
+        - machine occupée ou en panne, sans file: celles dont la précédence est levée
+
+        Lu dans les index par groupe de machines au lieu d'une estimation par tâche restante:
+        O(groupes + tâches prêtes ou en attente de précédence) pour les groupes sans file.
+        Un groupe dont la machine a une file rend toutes ses tâches restantes, même celles
+        dont la précédence n'est pas encore affectée, comme l'estimation d'origine: le moteur
+        compte sur ces candidates pour occuper les opérateurs (sans elles, default_example
+        s'arrête avec 20 tâches terminées sur 29 au lieu de 27). Avec des files, le coût d'une
+        décision reste donc en O(tâches restantes), et non en O(tâches prêtes).
+        """
+        temps = simulation.temps_actuel
+        bloquees = []
+        for groupe, restantes in self.taches_restantes.items():
+            # Machine compatible qui se libère le plus tôt (voir Task.determiner_machine)
+            machine = groupe.plus_tot_libre()
+            if self._machine_libre(machine, simulation):
+                for tache in self.attente_precedence.get(groupe, ()):
+                    tache.machine_requise = machine
+                    bloquees.append((tache, tache.precedence.temps_fin - temps + 1))
+                continue
+            attente = self._fin_occupation(machine) - temps + 1
+            # Machine avec une file: tout le groupe, y compris les tâches dont la précédence n'est pas affectée
+            for tache in restantes if machine.tache_en_attente else self.taches_pretes.get(groupe, ()):
+                tache.machine_requise = machine
+                bloquees.append((tache, attente))
+        rang = self.registre.rang
+        bloquees.sort(key=lambda bloquee: rang[bloquee[0].id])  # Ordre des tâches, pour départager les scores
+        taches_bloquees = [
+            {'tache': tache, 'temps_restant': temps_restant}
+            for tache, temps_restant in bloquees if temps_restant > 0
+        ]
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug('tache non disponible %s', [dic['tache'].id for dic in taches_bloquees])
         return taches_bloquees
 
 class Simulation:
-    instances=[]
-    def __init__(self):
+    def __init__(self, registre=None, operateurs=()):
         self.temps_actuel = 1  # Temps écoulé depuis le début (en minutes)
-        self.evenements = []    # File d'événements triés par temps (min-heap)
+        # File d'événements (min-heap) de tuples (temps, sequence, type, index tâche, index opérateur):
+        # la séquence départage les égalités de temps sans comparer d'objets Python
+        self.evenements = []
+        self._sequence = 0
         self.makespan_actuel = 1  # Durée totale estimée du planning
         self.termines = set()   # Tâches terminées (pour vérifier les précédences)
         self.historique = []    # Journal des événements pour analyse
         self.temps_max=1440
-        Simulation.instances.append(self)
-    def ajouter_evenement(self, evenement):
-        """Ajoute un événement à la file de priorité."""
-        heapq.heappush(self.evenements, (evenement.temps, evenement))
+        self.registre = registre  # Index des tâches (Registre)
+        self.operateurs = list(operateurs)  # Index opérateur -> Operator
+        self.trace = None  # TraceBinaire optionnelle (débogage)
+        self.evenements_traites = 0
+        self.mises_a_jour_apprentissage = 0
+        self.taille_file_max = 0  # Plus grande file d'événements vue au moment de dépiler
+        # Mode stochastique: durées multipliées par un facteur lognormal de moyenne 1
+        self.alea = None         # numpy.random.Generator propre à la réplication
+        self.bruit_durees = 0.0  # Écart-type (sigma) du logarithme du facteur
+    def ajouter_evenement(self, temps, code, tache, operateur):
+        """Ajoute un événement (code DEBUT_TACHE ou FIN_TACHE) à la file de priorité."""
+        self._sequence += 1  # Départage des ex aequo en temps: ordre d'insertion (FIFO), figé par les tests
+        heapq.heappush(self.evenements, (temps, self._sequence, code, tache.index, operateur.index))
+
+    def tirer_facteur_duree(self):
+        """Facteur appliqué à la durée d'une tâche: 1.0 en mode déterministe"""
+        if self.alea is None or not self.bruit_durees:
+            return 1.0
+        sigma = self.bruit_durees
+        return float(self.alea.lognormal(-sigma * sigma / 2, sigma))
 
     def obtenir_prochain_evenement(self):
-        """Récupère l'événement le plus imminent."""
+        """Récupère l'événement le plus imminent: tuple (temps, sequence, code, index tâche, index opérateur)."""
         if self.evenements:
-            return heapq.heappop(self.evenements)[1]  # (temps, Evenement)
+            return heapq.heappop(self.evenements)
         return None
   
     def est_terminee(self, tache):
@@ -713,20 +1182,33 @@ class Simulation:
         return tache in self.termines
     
     def _traiter_evenement(self, evenement):
-        if evenement.type == "FIN_TACHE":
+        if evenement[2] == FIN_TACHE:
             self.makespan_actuel = max(self.makespan_actuel, self.temps_actuel)
     
-class Evenement:
-    def __init__(self, temps, type, tache=None, operateur=None, machine=None):
-        self.temps = temps      # Date d'exécution (en minutes)
-        self.type = type        # "DEBUT_TACHE", "FIN_TACHE", "PAUSE", etc.
-        self.tache = tache      # Objet Task concerné
-        self.operateur = operateur  # Objet Operator impliqué
-        self.machine = machine  # Objet Machine concernée (optionnel)
-
-    def __lt__(self, other):
-        """Permet la comparaison pour la file de priorité."""
-        return self.temps < other.temps
+# Codes des événements de la file (Simulation.evenements), communs aux deux moteurs et à la replanification
+DEBUT_TACHE = 0
+FIN_TACHE = 1
+TYPES_EVENEMENT = ("DEBUT_TACHE", "FIN_TACHE")  # Noms, indexés par code (trace, journaux)
+
+class ContexteSimulation:
+    """
+    État complet d'une exécution de simulation.
+
+    Chaque appel à demarrer_simulation construit son propre contexte: aucune
+    donnée n'est partagée entre deux simulations lancées en parallèle.
+    """
+    def __init__(self):
+        self.machines = []
+        self.operateurs = []
+        self.produits = []
+        self.taches = []
+        self.taches_initiales = []   # id des tâches sans précédence
+        self.registre = None
+        self.simulation = None
+        self.ordonnanceur = None
+        self.cout = None
+        self.operateurs_absents = set()  # id des opérateurs retirés par une replanification
+        self.mesures = None  # Mesures optionnelles (durées par phase, voir instrumentation.py)
 
 class Cout:
         def __init__(self):
@@ -773,22 +1255,108 @@ class Cout:
                 "par_tache": self.par_tache
             }
 
+class FiltreBloom:
+    """Ensemble approché d'entiers: pas de faux négatif, faux positifs au taux demandé"""
+
+    def __init__(self, capacite, taux_faux_positifs=0.001):
+        self.taille = max(8, int(-capacite * math.log(taux_faux_positifs) / math.log(2) ** 2))
+        self.nombre_hachages = max(1, round(self.taille / capacite * math.log(2)))
+        self.bits = bytearray((self.taille + 7) // 8)
+
+    def _positions(self, valeur):
+        empreinte = hashlib.blake2b(str(valeur).encode(), digest_size=16).digest()
+        h1, h2 = int.from_bytes(empreinte[:8], 'little'), int.from_bytes(empreinte[8:], 'little') | 1
+        return ((h1 + i * h2) % self.taille for i in range(self.nombre_hachages))
+
+    def ajouter(self, valeur):
+        for position in self._positions(valeur):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, valeur):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(valeur))
+
+
 class CombinationGenerator:
-    def __init__(self, operators):
-        self.operators = operators
-        self.all_combinations = list(itertools.permutations(operators))
-        random.shuffle(self.all_combinations)  # Mélange aléatoire
-        self.index = 0
-    
+    """
+    Ordres d'opérateurs tirés uniformément, sans répétition, sans stocker les permutations.
+
+    Une permutation est tirée par son rang dans [0, n!) puis décodée (code de Lehmer).
+    Les rangs déjà rendus sont mémorisés dans un ensemble exact jusqu'à SEUIL_EXACT
+    permutations possibles: l'itération rend alors les n! permutations.
+
+    Au-delà, ils le sont dans un FiltreBloom dimensionné pour capacite tirages. Un faux
+    positif rejette une permutation jamais vue, qui ne sera jamais rendue, et le taux de
+    faux positifs croît avec le remplissage: l'itération s'arrête après capacite
+    permutations, ou plus tôt si ESSAIS_MAX tirages de suite tombent sur des rangs
+    (supposés) déjà vus. Il n'y a donc aucune garantie de rendre les n! permutations.
+    """
+    SEUIL_EXACT = 100_000
+    ESSAIS_MAX = 1000  # Tirages successifs rejetés par le filtre de Bloom avant d'abandonner
+
+    def __init__(self, operators, graine=None, capacite=1_000_000, taux_faux_positifs=0.001):
+        self.operators = list(operators)
+        self.total = math.factorial(len(self.operators))
+        self.capacite = capacite
+        self.taux_faux_positifs = taux_faux_positifs
+        self.alea = random.Random(graine)
+        self.reset()
+
+    @property
+    def limite(self):
+        """Nombre maximal de permutations rendues: n!, borné par capacite avec le filtre de Bloom"""
+        return self.total if isinstance(self.vus, set) else min(self.total, self.capacite)
+
     def get_unique_combination(self):
-        if self.index >= len(self.all_combinations):
+        """Permutation jamais rendue; StopIteration quand la limite est atteinte ou le filtre saturé"""
+        if self.index >= self.limite:
             raise StopIteration("Toutes les combinaisons ont été épuisées")
-        
-        combination = self.all_combinations[self.index]
+        rang = self.alea.randrange(self.total)
+        if isinstance(self.vus, set):
+            while rang in self.vus:
+                rang = self.alea.randrange(self.total)
+            self.vus.add(rang)
+        else:
+            essais = 1
+            while rang in self.vus:
+                if essais >= self.ESSAIS_MAX:
+                    raise StopIteration(f"Filtre de Bloom saturé après {self.index} combinaisons")
+                rang = self.alea.randrange(self.total)
+                essais += 1
+            self.vus.ajouter(rang)
         self.index += 1
-        return combination
+        return self.permutation_de_rang(rang)
+
+    def __iter__(self):
+        while True:
+            try:
+                combinaison = self.get_unique_combination()
+            except StopIteration:
+                return
+            yield combinaison
+
+    def permutation_de_rang(self, rang):
+        """Permutation de self.operators de rang donné (ordre lexicographique des positions)"""
+        restants = list(self.operators)
+        permutation = []
+        for i in range(len(restants), 0, -1):
+            position, rang = divmod(rang, math.factorial(i - 1))
+            permutation.append(restants.pop(position))
+        return tuple(permutation)
+
+    def rang_de_permutation(self, permutation):
+        """Inverse de permutation_de_rang"""
+        restants = list(self.operators)
+        rang = 0
+        for element in permutation:
+            position = restants.index(element)
+            rang += position * math.factorial(len(restants) - 1)
+            restants.pop(position)
+        return rang
 
     def reset(self):
         """Réinitialise le générateur"""
-        random.shuffle(self.all_combinations)
+        if self.total <= self.SEUIL_EXACT:
+            self.vus = set()
+        else:
+            self.vus = FiltreBloom(self.capacite, self.taux_faux_positifs)
         self.index = 0
@@ -0,0 +1,427 @@
+import itertools
+import logging
+import math
+import os
+import time
+from statistics import NormalDist
+from concurrent.futures import ProcessPoolExecutor, TimeoutError, as_completed
+
+import numpy as np
+
+from .principal_prog import charger_donnees, construire_contexte, executer_simulation, executer_simulation_tableaux
+from .Structured_data import CombinationGenerator
+
+logger = logging.getLogger(__name__)
+
+# Exploration des poids de l'Ordonnanceur: balayage parallèle et front de Pareto,
+# réplications Monte Carlo d'un jeu de poids avec des durées aléatoires, et
+# optimisation automatique des poids (CMA-ES) sous budget de temps, recherche
+# multi-départs sur l'ordre des opérateurs de l'affectation initiale.
+#
+# Les données (saisies ou exemple) sont chargées une seule fois dans le processus
+# principal puis transmises à chaque worker par l'initialiseur du pool: chaque
+# simulation ne fait que construire son contexte et l'exécuter.
+
+POIDS_CLES = ('poids_cout', 'poids_equite', 'poids_makespan', 'poids_performance', 'poids_penalite_attente')
+
+# Critères du front de Pareto et sens d'optimisation (+1: à minimiser, -1: à maximiser).
+# cout_total cumule les sous-performances, comptées négativement: plus il est haut, mieux c'est.
+CRITERES = {'makespan': 1, 'cout_total': -1, 'equite': 1}
+
+_donnees_worker = None
+_options_worker = {}
+
+
+def grille_poids(pas=0.25):
+    """Tous les vecteurs de poids multiples de pas dont la somme vaut 1"""
+    n = round(1 / pas)
+    if not np.isclose(n * pas, 1):
+        raise ValueError(f"Le pas doit diviser 1: {pas}")
+    grille = []
+    # Répartition de n parts entre les 5 poids (séparateurs placés parmi n + 4 positions)
+    for separateurs in itertools.combinations(range(n + len(POIDS_CLES) - 1), len(POIDS_CLES) - 1):
+        bornes = (-1,) + separateurs + (n + len(POIDS_CLES) - 1,)
+        parts = [bornes[i + 1] - bornes[i] - 1 for i in range(len(POIDS_CLES))]
+        grille.append({cle: part / n for cle, part in zip(POIDS_CLES, parts)})
+    return grille
+
+
+def echantillon_poids(nombre, graine=0):
+    """Vecteurs de poids tirés uniformément sur le simplexe (somme 1)"""
+    rng = np.random.default_rng(graine)
+    return [dict(zip(POIDS_CLES, vecteur.tolist())) for vecteur in rng.dirichlet(np.ones(len(POIDS_CLES)), nombre)]
+
+
+def evaluer_poids(donnees, poids, mode_score='scalaire', moteur='objet', ordre_operateurs=None):
+    """
+    Lance une simulation sur des données déjà chargées (voir charger_donnees).
+
+    Returns:
+        dict: {'poids', 'ordre', 'makespan', 'cout_total', 'equite'}, equite étant l'écart-type
+        des temps de travail (dispersion_charge); None si rien n'a pu être affecté
+    """
+    contexte = construire_contexte(*donnees, poids, mode_score)
+    data = _executer(contexte, moteur, ordre_operateurs)
+    if data is None:
+        return None
+    return {
+        'poids': dict(poids),
+        'ordre': list(ordre_operateurs) if ordre_operateurs is not None else None,
+        'makespan': data['performances']['makespan'],
+        'cout_total': data['performances']['cout_total'],
+        'equite': contexte.ordonnanceur.dispersion_charge()['ecart_type'],
+    }
+
+
+def evaluer_replication(donnees, poids, graine, bruit_durees, mode_score='scalaire', moteur='objet'):
+    """Une réplication stochastique: {'makespan', 'cout_total'}, None si rien n'a pu être affecté"""
+    contexte = construire_contexte(*donnees, poids, mode_score)
+    contexte.simulation.alea = np.random.default_rng(graine)
+    contexte.simulation.bruit_durees = bruit_durees
+    data = _executer(contexte, moteur)
+    if data is None:
+        return None
+    return {'makespan': data['performances']['makespan'], 'cout_total': data['performances']['cout_total']}
+
+
+def _executer(contexte, moteur, ordre_operateurs=None):
+    executer = executer_simulation if moteur == 'objet' else executer_simulation_tableaux
+    return executer(contexte, ordre_operateurs)
+
+
+def _initialiser_worker(donnees, options):
+    global _donnees_worker, _options_worker
+    import django
+    from django.apps import apps
+    if not apps.ready:  # Démarrage 'spawn': Django n'est pas hérité du parent
+        django.setup()
+    _donnees_worker = donnees
+    _options_worker = options
+
+
+def _evaluer_dans_worker(poids):
+    return evaluer_poids(_donnees_worker, poids, **_options_worker)
+
+
+def _evaluer_ordre_dans_worker(arguments):
+    poids, ordre = arguments
+    return evaluer_poids(_donnees_worker, poids, ordre_operateurs=ordre, **_options_worker)
+
+
+def _repliquer_dans_worker(arguments):
+    poids, graine, bruit_durees = arguments
+    return evaluer_replication(_donnees_worker, poids, graine, bruit_durees, **_options_worker)
+
+
+def balayer_poids(poids_liste, validation, user, max_workers=None, mode_score='scalaire', moteur='objet'):
+    """
+    Simule chaque vecteur de poids dans un pool de processus.
+
+    Générateur: les résultats (voir evaluer_poids) sont rendus au fur et à mesure
+    que les simulations se terminent, donc dans un ordre quelconque.
+    max_workers=1 exécute tout dans le processus courant; None: un processus par cœur.
+    """
+    donnees = charger_donnees(validation, user)
+    options = {'mode_score': mode_score, 'moteur': moteur}
+    if max_workers == 1:
+        for poids in poids_liste:
+            resultat = evaluer_poids(donnees, poids, **options)
+            if resultat is not None:
+                yield resultat
+        return
+    max_workers = max_workers or os.cpu_count()
+    pool = ProcessPoolExecutor(max_workers=max_workers, initializer=_initialiser_worker, initargs=(donnees, options))
+    try:
+        futures = [pool.submit(_evaluer_dans_worker, poids) for poids in poids_liste]
+        for future in as_completed(futures):
+            resultat = future.result()
+            if resultat is None:
+                logger.warning("Simulation sans affectation, résultat ignoré")
+                continue
+            yield resultat
+    finally:
+        # Générateur fermé avant la fin (client déconnecté): ne pas attendre les simulations restantes
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def front_pareto(resultats, criteres=CRITERES):
+    """Résultats non dominés sur les critères donnés ({nom: +1 à minimiser, -1 à maximiser})"""
+    resultats = list(resultats)
+    if not resultats:
+        return []
+    valeurs = np.array([[sens * r[nom] for nom, sens in criteres.items()] for r in resultats], dtype=float)
+    # i est dominé si un j fait au moins aussi bien partout et strictement mieux quelque part
+    au_moins_aussi_bon = (valeurs[:, None, :] <= valeurs[None, :, :]).all(axis=2)
+    strictement_meilleur = (valeurs[:, None, :] < valeurs[None, :, :]).any(axis=2)
+    domine = (au_moins_aussi_bon & strictement_meilleur).any(axis=0)
+    return [r for r, d in zip(resultats, domine) if not d]
+
+
+def repliquer(poids, validation, user, bruit_durees=0.1, replications_max=200, replications_min=10,
+              largeur_cible=None, niveau=0.95, graine=0, max_workers=None, mode_score='scalaire', moteur='objet'):
+    """
+    Réplications Monte Carlo d'un même jeu de poids, durées bruitées (Simulation.bruit_durees).
+
+    Chaque réplication a son propre flux aléatoire (SeedSequence(graine).spawn): le
+    résultat ne dépend ni du nombre de workers ni de l'ordre d'exécution.
+    Les réplications sont lancées par lots de max_workers; après chaque lot, on
+    s'arrête si la largeur relative de l'intervalle de confiance (largeur / |moyenne|)
+    du makespan et du coût est passée sous largeur_cible.
+
+    Returns:
+        dict: {'replications', 'arret_anticipe', 'makespan': {...}, 'cout_total': {...}}
+        avec pour chaque indicateur moyenne, p5, p95, ic_bas, ic_haut et largeur_relative
+    """
+    donnees = charger_donnees(validation, user)
+    options = {'mode_score': mode_score, 'moteur': moteur}
+    graines = np.random.SeedSequence(graine).spawn(replications_max)
+    arguments = [(poids, graine_replication, bruit_durees) for graine_replication in graines]
+    z = NormalDist().inv_cdf(0.5 + niveau / 2)
+    max_workers = max_workers or os.cpu_count()
+    resultats = []
+    arret_anticipe = False
+
+    pool = None
+    if max_workers > 1:
+        pool = ProcessPoolExecutor(max_workers=max_workers, initializer=_initialiser_worker,
+                                   initargs=(donnees, options))
+    try:
+        for debut in range(0, replications_max, max_workers):
+            lot = arguments[debut:debut + max_workers]
+            if pool is None:
+                obtenus = [evaluer_replication(donnees, *args, **options) for args in lot]
+            else:
+                obtenus = pool.map(_repliquer_dans_worker, lot)
+            resultats.extend(r for r in obtenus if r is not None)
+            if (largeur_cible is not None and len(resultats) >= replications_min
+                    and debut + len(lot) < replications_max
+                    and all(_statistiques([r[nom] for r in resultats], z)['largeur_relative'] <= largeur_cible
+                            for nom in ('makespan', 'cout_total'))):
+                arret_anticipe = True
+                break
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    return {
+        'replications': len(resultats),
+        'arret_anticipe': arret_anticipe,
+        'makespan': _statistiques([r['makespan'] for r in resultats], z),
+        'cout_total': _statistiques([r['cout_total'] for r in resultats], z),
+    }
+
+
+def _statistiques(valeurs, z):
+    valeurs = np.asarray(valeurs, dtype=float)
+    if not valeurs.size:
+        return None
+    moyenne = float(valeurs.mean())
+    demi_largeur = float(z * valeurs.std(ddof=1) / math.sqrt(valeurs.size)) if valeurs.size > 1 else math.inf
+    return {
+        'moyenne': moyenne,
+        'p5': float(np.percentile(valeurs, 5)),
+        'p95': float(np.percentile(valeurs, 95)),
+        'ic_bas': moyenne - demi_largeur,
+        'ic_haut': moyenne + demi_largeur,
+        'largeur_relative': 2 * demi_largeur / abs(moyenne) if moyenne else math.inf,
+    }
+
+
+def optimiser_poids(validation, user, objectif='makespan', budget_secondes=60.0, population=None,
+                    generations_max=100, sigma_initial=1.0, graine=0, max_workers=None,
+                    mode_score='scalaire', moteur='objet'):
+    """
+    Cherche les poids qui minimisent un objectif, le simulateur étant une boîte noire.
+
+    Stratégie d'évolution de type CMA-ES sur z (R^5), les poids étant softmax(z)
+    arrondis au millième: deux candidats qui tombent sur les mêmes poids ne sont
+    simulés qu'une fois (mémoïsation). Les candidats d'une génération sont évalués
+    en parallèle. Quand budget_secondes est écoulé, la recherche s'arrête et rend
+    le meilleur jeu de poids trouvé.
+
+    objectif: nom d'un critère de CRITERES (son sens est respecté) ou fonction
+        resultat -> valeur à minimiser (resultat comme evaluer_poids)
+
+    Returns:
+        dict: {'poids', 'valeur', 'resultat', 'evaluations', 'generations',
+               'historique' (meilleure valeur par génération), 'budget_epuise'}
+    """
+    debut = time.monotonic()
+    echeance = debut + budget_secondes
+    if callable(objectif):
+        valeur_objectif = objectif
+    elif objectif in CRITERES:
+        def valeur_objectif(resultat, nom=objectif, sens=CRITERES[objectif]):
+            return sens * resultat[nom]
+    else:
+        raise ValueError(f"Objectif inconnu: {objectif}")
+
+    donnees = charger_donnees(validation, user)
+    options = {'mode_score': mode_score, 'moteur': moteur}
+    max_workers = max_workers or os.cpu_count()
+    rng = np.random.default_rng(graine)
+    cmaes = _StrategieCMA(len(POIDS_CLES), sigma_initial, population or max(4 + int(3 * math.log(len(POIDS_CLES))), max_workers))
+    memoire = {}  # {poids arrondis (tuple): resultat ou None}
+    meilleur = {'poids': None, 'valeur': math.inf, 'resultat': None}
+    historique = []
+    budget_epuise = False
+
+    def noter(cle, resultat):
+        memoire[cle] = resultat
+        valeur = valeur_objectif(resultat) if resultat is not None else math.inf
+        if valeur < meilleur['valeur']:
+            meilleur.update(poids=dict(zip(POIDS_CLES, cle)), valeur=valeur, resultat=resultat)
+
+    pool = None
+    if max_workers > 1:
+        pool = ProcessPoolExecutor(max_workers=max_workers, initializer=_initialiser_worker,
+                                   initargs=(donnees, options))
+    try:
+        generation = 0
+        while generation < generations_max and not budget_epuise:
+            candidats = cmaes.echantillonner(rng)
+            cles = [_arrondir_poids(_softmax(z)) for z in candidats]
+            a_evaluer = list(dict.fromkeys(cle for cle in cles if cle not in memoire))
+            if pool is None:
+                for cle in a_evaluer:
+                    if time.monotonic() >= echeance:
+                        budget_epuise = True
+                        break
+                    noter(cle, evaluer_poids(donnees, dict(zip(POIDS_CLES, cle)), **options))
+            else:
+                futures = {pool.submit(_evaluer_dans_worker, dict(zip(POIDS_CLES, cle))): cle for cle in a_evaluer}
+                try:
+                    for future in as_completed(futures, timeout=max(0.0, echeance - time.monotonic())):
+                        noter(futures[future], future.result())
+                except TimeoutError:
+                    budget_epuise = True
+                    for future in futures:
+                        future.cancel()
+            if budget_epuise:
+                break
+            valeurs = [valeur_objectif(memoire[cle]) if memoire[cle] is not None else math.inf for cle in cles]
+            cmaes.mettre_a_jour(candidats, np.array(valeurs))
+            generation += 1
+            historique.append(meilleur['valeur'])
+            if time.monotonic() >= echeance:
+                budget_epuise = True
+    finally:
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    return {
+        **meilleur,
+        'evaluations': len(memoire),
+        'generations': generation,
+        'historique': historique,
+        'budget_epuise': budget_epuise,
+    }
+
+
+def _softmax(z):
+    e = np.exp(z - z.max())
+    return e / e.sum()
+
+
+def _arrondir_poids(poids, decimales=3):
+    """Poids arrondis dont la somme vaut exactement 1 (l'écart est reporté sur le plus grand)"""
+    unite = 10 ** decimales
+    parts = np.round(np.asarray(poids) * unite).astype(int)
+    parts[np.argmax(parts)] += unite - parts.sum()
+    return tuple(part / unite for part in parts.tolist())
+
+
+class _StrategieCMA:
+    """CMA-ES (mu/mu_w, lambda) minimal, d'après le tutoriel de N. Hansen"""
+
+    def __init__(self, dimension, sigma, population):
+        n = dimension
+        self.n = n
+        self.population = population
+        self.mu = population // 2
+        poids = math.log(self.mu + 0.5) - np.log(np.arange(1, self.mu + 1))
+        self.poids = poids / poids.sum()
+        self.mueff = 1 / np.sum(self.poids ** 2)
+        self.cc = (4 + self.mueff / n) / (n + 4 + 2 * self.mueff / n)
+        self.cs = (self.mueff + 2) / (n + self.mueff + 5)
+        self.c1 = 2 / ((n + 1.3) ** 2 + self.mueff)
+        self.cmu = min(1 - self.c1, 2 * (self.mueff - 2 + 1 / self.mueff) / ((n + 2) ** 2 + self.mueff))
+        self.damps = 1 + 2 * max(0.0, math.sqrt((self.mueff - 1) / (n + 1)) - 1) + self.cs
+        self.chi_n = math.sqrt(n) * (1 - 1 / (4 * n) + 1 / (21 * n ** 2))
+        self.moyenne = np.zeros(n)
+        self.sigma = sigma
+        self.C = np.eye(n)
+        self.B = np.eye(n)
+        self.D = np.ones(n)
+        self.pc = np.zeros(n)
+        self.ps = np.zeros(n)
+        self.iteration = 0
+
+    def echantillonner(self, rng):
+        z = rng.standard_normal((self.population, self.n))
+        return self.moyenne + self.sigma * (z * self.D) @ self.B.T
+
+    def mettre_a_jour(self, candidats, valeurs):
+        n = self.n
+        ordre = np.argsort(valeurs, kind='stable')[:self.mu]
+        ancienne = self.moyenne
+        self.moyenne = self.poids @ candidats[ordre]
+        y = (self.moyenne - ancienne) / self.sigma
+        c_moins_demi = self.B @ np.diag(1 / self.D) @ self.B.T
+        self.ps = (1 - self.cs) * self.ps + math.sqrt(self.cs * (2 - self.cs) * self.mueff) * c_moins_demi @ y
+        self.iteration += 1
+        hsig = (np.linalg.norm(self.ps) / math.sqrt(1 - (1 - self.cs) ** (2 * self.iteration)) / self.chi_n
+                < 1.4 + 2 / (n + 1))
+        self.pc = (1 - self.cc) * self.pc + hsig * math.sqrt(self.cc * (2 - self.cc) * self.mueff) * y
+        artmp = (candidats[ordre] - ancienne) / self.sigma
+        self.C = ((1 - self.c1 - self.cmu) * self.C
+                  + self.c1 * (np.outer(self.pc, self.pc) + (1 - hsig) * self.cc * (2 - self.cc) * self.C)
+                  + self.cmu * (artmp.T * self.poids) @ artmp)
+        self.sigma *= math.exp((self.cs / self.damps) * (np.linalg.norm(self.ps) / self.chi_n - 1))
+        self.C = np.triu(self.C) + np.triu(self.C, 1).T
+        valeurs_propres, self.B = np.linalg.eigh(self.C)
+        self.D = np.sqrt(np.maximum(valeurs_propres, 1e-20))
+
+
+def rechercher_ordre_operateurs(poids, validation, user, essais=100, objectif='makespan', graine=0,
+                                max_workers=None, mode_score='scalaire', moteur='objet'):
+    """
+    Recherche multi-départs sur l'ordre des opérateurs de l'affectation initiale.
+
+    Les ordres sont tirés sans répétition par CombinationGenerator (jamais
+    matérialisés), simulés en parallèle, et le meilleur selon l'objectif est gardé.
+    L'ordre par défaut (performance globale décroissante) sert de référence.
+
+    Returns:
+        dict: {'ordre', 'valeur', 'resultat', 'essais', 'reference'}
+    """
+    if objectif not in CRITERES:
+        raise ValueError(f"Objectif inconnu: {objectif}")
+    sens = CRITERES[objectif]
+    donnees = charger_donnees(validation, user)
+    options = {'mode_score': mode_score, 'moteur': moteur}
+    generateur = CombinationGenerator(list(donnees[1]), graine=graine)
+    ordres = [list(ordre) for _, ordre in zip(range(essais), generateur)]
+    arguments = [(poids, None)] + [(poids, ordre) for ordre in ordres]
+
+    max_workers = max_workers or os.cpu_count()
+    if max_workers == 1:
+        resultats = [evaluer_poids(donnees, p, ordre_operateurs=o, **options) for p, o in arguments]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_initialiser_worker,
+                                 initargs=(donnees, options)) as pool:
+            resultats = list(pool.map(_evaluer_ordre_dans_worker, arguments,
+                                      chunksize=max(1, len(arguments) // (4 * max_workers))))
+
+    reference, essais_resultats = resultats[0], resultats[1:]
+    meilleur = reference
+    for resultat in essais_resultats:
+        if resultat is not None and (meilleur is None or sens * resultat[objectif] < sens * meilleur[objectif]):
+            meilleur = resultat
+    return {
+        'ordre': meilleur['ordre'] if meilleur is not None else None,
+        'valeur': meilleur[objectif] if meilleur is not None else None,
+        'resultat': meilleur,
+        'essais': len(ordres),
+        'reference': reference[objectif] if reference is not None else None,
+    }
@@ -1,61 +1,85 @@
-import heapq
 import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
 from datetime import datetime, timedelta
 import numpy as np
-from .Structured_data import Operator, Product, Task, Machine
 from collections import defaultdict
+import logging
 import pandas as pd
 
-def boucle_principale(simulation, ordonnanceur,cout_global):
-    """Exécute la simulation jusqu'à ce que toutes les tâches soient terminées ou que temps_max soit atteint."""
-    nombre_de_taches=len(list(tache.id for tache in Task.instances))
+from .Structured_data import DEBUT_TACHE, FIN_TACHE, TYPES_EVENEMENT
+
+logger = logging.getLogger(__name__)
+
+def boucle_principale(contexte, temps_arret=None):
+    """
+    Exécute la simulation jusqu'à ce que toutes les tâches soient terminées ou que temps_max soit atteint.
+
+    temps_arret: si donné, s'arrête avant le premier événement postérieur à cet instant
+        (la simulation peut reprendre plus tard, voir replanification.py)
+    """
+    simulation = contexte.simulation
+    registre = simulation.registre
+    ordonnanceur = contexte.ordonnanceur
+    cout_global = contexte.cout
+    nombre_de_taches=len(contexte.taches)
     while len(simulation.termines)<nombre_de_taches:
         # 1. Vérifier si toutes les tâches sont terminées
-        if all(prod.quantite_restante == 0 for prod in Product.instances):
-            print("Toutes les tâches sont terminées !")
+        if all(prod.quantite_restante == 0 for prod in contexte.produits):
+            logger.info("Toutes les tâches sont terminées !")
             break
 
         # 2. Récupérer le prochain événement à traiter
         if not simulation.evenements:
-            print("Aucun événement à traiter.")
+            logger.debug("Aucun événement à traiter.")
+            break
+
+        if temps_arret is not None and simulation.evenements[0][0] > temps_arret:
+            simulation.temps_actuel = max(simulation.temps_actuel, temps_arret)
             break
 
-        temps_evenement, evenement = heapq.heappop(simulation.evenements)
+        if len(simulation.evenements) > simulation.taille_file_max:
+            simulation.taille_file_max = len(simulation.evenements)
+        temps_evenement, _, code, tache_index, op_index = simulation.obtenir_prochain_evenement()
+        simulation.evenements_traites += 1
         simulation.temps_actuel = temps_evenement
+        tache = registre.liste[tache_index]
+        operateur = simulation.operateurs[op_index]
+        if simulation.trace is not None:
+            simulation.trace.enregistrer(TYPES_EVENEMENT[code], temps_evenement, tache, operateur)
 
         # 3. Traiter l'événement
-        if evenement.type == "FIN_TACHE":
-            ordonnanceur.terminer_tache(evenement.tache, simulation)
+        if code == FIN_TACHE:
+            ordonnanceur.terminer_tache(tache, simulation)
             #metre à jour les performances
-            temps_reel = evenement.tache.temps_standard +evenement.tache.temps_standard*(1-evenement.operateur.performancess [evenement.tache.id])
+            temps_reel = (tache.temps_standard +tache.temps_standard*(1-operateur.performancess [tache.id])) * tache.facteur_duree
             # 2. Sous-performance (écart entre réel et standard)
-            sous_performance =(-temps_reel + evenement.tache.temps_standard)*evenement.tache.quantite
-            temps=evenement.temps
-            evenement.operateur.mettre_a_jour_performance(evenement.tache.id,temps,simulation)
-            cout_global.ajouter_cout(simulation, sous_performance, evenement.tache.cr, operateur=None, tache=None)
-            print('le temps actuelle',  simulation.temps_actuel)
+            sous_performance =(-temps_reel + tache.temps_standard)*tache.quantite
+            temps=temps_evenement
+            if operateur.mettre_a_jour_performance(tache.id,temps,simulation):
+                ordonnanceur.mettre_a_jour_bornes_makespan(operateur)
+            cout_global.ajouter_cout(simulation, sous_performance, tache.cr, operateur=None, tache=None)
+            logger.debug('le temps actuel %s', simulation.temps_actuel)
             # Chercher une nouvelle tâche pour l'opérateur
             tache_suivante = ordonnanceur.choisir_tache(
-                operateur=evenement.operateur,
+                operateur=operateur,
                 simulation=simulation,
-                tache_finie=evenement.tache
+                tache_finie=tache
             )
             
             if tache_suivante:
                 success = ordonnanceur.affecter_tache(
-                    operateur=evenement.operateur,
+                    operateur=operateur,
                     tache=tache_suivante,
                     simulation=simulation
                 )
                 if not success:
-                    print(f"Échec d'affectation pour {evenement.operateur.id}")
+                    logger.warning("Échec d'affectation pour %s", operateur.id)
 
-        elif evenement.type == "DEBUT_TACHE":
+        elif code == DEBUT_TACHE:
 
-            print(f"Début de tâche {evenement.tache.id} à t={simulation.temps_actuel} ")
+            logger.debug("Début de tâche %s à t=%s", tache.id, simulation.temps_actuel)
 
-def export_gantt_to_excel(simulation, filename="gantt_data.xlsx"):
+def export_gantt_to_excel(contexte, filename="gantt_data.xlsx"):
     """Exporte les données du diagramme Gantt vers un fichier Excel en utilisant des heures"""
     from datetime import datetime, timedelta
     import pandas as pd
@@ -68,7 +92,7 @@ def export_gantt_to_excel(simulation, filename="gantt_data.xlsx"):
     
     # Pour les opérateurs
     operator_data = []
-    for op in Operator.instances:
+    for op in contexte.operateurs:
         records = op.get_gantt_data()
         print(f"Opérateur {op.id}: {len(records)} tâches")
         for record in records:
@@ -85,7 +109,7 @@ def export_gantt_to_excel(simulation, filename="gantt_data.xlsx"):
     
     # Pour les machines
     machine_data = []
-    for mach in Machine.instances:
+    for mach in contexte.machines:
         records = mach.get_gantt_data()
         print(f"Machine {mach.id}: {len(records)} tâches")
         for record in records:
@@ -241,7 +265,13 @@ def export_individual_performance_to_excel(operators, dossier="performance_excel
         df.to_excel(nom_fichier, index=False)
         print(f"✅ Données exportées pour opérateur {op.id} : {nom_fichier}")
 
-def get_data(operateurs,simulation,cout_global):
+def get_data(contexte, operateurs=None):
+    """Données de résultat (Gantt, performances, makespan, coût) d'un contexte simulé"""
+    if operateurs is None:
+        operateurs = contexte.operateurs
+    simulation = contexte.simulation
+    cout_global = contexte.cout
+    ordonnanceur = contexte.ordonnanceur
     evolution_par_tache_par_op={}
     operator_data = []
     for op in operateurs:
@@ -249,13 +279,8 @@ def get_data(operateurs,simulation,cout_global):
             continue
         #print(op.id,op.derniere_execution)
        
-       # Regrouper les performances par tâche
-        evolution_par_tache = defaultdict(lambda: {'temps': [], 'perf': []})
-        for tache_id, perf, temps in op.historique_performance:
-            if tache_id in op.derniere_execution:
-                evolution_par_tache[tache_id]['temps'].append(temps)
-                evolution_par_tache[tache_id]['perf'].append(perf)
-        evolution_par_tache_par_op[op.id]=evolution_par_tache
+        # Performances par tâche, lues directement dans l'historique en colonnes
+        evolution_par_tache_par_op[op.id]=op.historique_performance.par_tache(op.derniere_execution)
         
         records = op.get_gantt_data()
         for record in records:
@@ -272,9 +297,9 @@ def get_data(operateurs,simulation,cout_global):
     
     # Pour les machines
     machine_data = []
-    for mach in Machine.instances:
+    for mach in contexte.machines:
         records = mach.get_gantt_data()
-        print(f"Machine {mach.id}: {len(records)} tâches")
+        logger.debug("Machine %s: %d tâches", mach.id, len(records))
         for record in records:
             if record['Début'] is not None and record['Fin'] is not None:
                 machine_data.append({
@@ -298,5 +323,11 @@ def get_data(operateurs,simulation,cout_global):
             'cout_total': cout_global.total_sous_performance
         }
     }
+    if ordonnanceur is not None and ordonnanceur.bornes_makespan:
+        min_m, max_m = ordonnanceur.bornes_makespan
+        data['performances']['bornes_makespan'] = {
+            'min': min_m / 480,  # même unité que le makespan
+            'max': max_m / 480
+        }
 
     return data
\ No newline at end of file
@@ -0,0 +1,51 @@
+import random
+
+
+def generer_plan_synthetique(nombre_produits=8, taches_par_produit=4, nombre_machines=5, nombre_operateurs=4, graine=0,
+                             taux_multi_machines=0.0):
+    """
+    Génère un plan de production aléatoire (reproductible avec la graine).
+
+    taux_multi_machines: proportion des tâches réalisables aussi sur une deuxième machine
+
+    Retourne les mêmes structures que default_example:
+    (machines, operateurs_data, produits_data, precedences)
+    """
+    rng = random.Random(graine)
+    machines = {f"M{m + 1}": [] for m in range(nombre_machines)}
+    ids_machines = list(machines)
+    produits_data = []
+    precedences = [{} for _ in range(max(0, taches_par_produit - 1))]
+    toutes_les_taches = []
+
+    for p in range(nombre_produits):
+        taches = [f"T{p + 1}_{k + 1}" for k in range(taches_par_produit)]
+        machines_produit = {}
+        for tache_id in taches:
+            machine_id = rng.choice(ids_machines)
+            machines[machine_id].append(tache_id)
+            machines_produit[tache_id] = machine_id
+            if taux_multi_machines and nombre_machines > 1 and rng.random() < taux_multi_machines:
+                autre = rng.choice([m for m in ids_machines if m != machine_id])
+                machines[autre].append(tache_id)
+                machines_produit[tache_id] = f"{machine_id},{autre}"  # Même format que Tache.machine
+        for k in range(taches_par_produit - 1):
+            precedences[k][taches[k]] = taches[k + 1]
+        produits_data.append({
+            "ID": f"P{p + 1}",
+            "Tâches": taches,
+            "Temps_standard": {tache_id: rng.choice([5, 10, 15, 20, 25, 30]) for tache_id in taches},
+            "Quantité": rng.randint(10, 25),
+            "Cr": rng.choice([15, 16, 18, 25, 27, 27.5]),
+            "Machines": machines_produit
+        })
+        toutes_les_taches.extend(taches)
+
+    operateurs_data = {}
+    for o in range(nombre_operateurs):
+        operateurs_data[f"O{o + 1}"] = {
+            "LC": round(rng.uniform(0.7, 0.9), 2),
+            "FC": round(rng.uniform(0.1, 0.5), 2),
+            "Performance": {tache_id: round(rng.uniform(0.2, 1.0), 2) for tache_id in toutes_les_taches}
+        }
+    return machines, operateurs_data, produits_data, precedences
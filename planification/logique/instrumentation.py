@@ -0,0 +1,73 @@
+import logging
+import time
+from contextlib import contextmanager, nullcontext
+
+logger = logging.getLogger(__name__)
+
+# Mesures d'une simulation: durées par phase et compteurs de travail.
+#
+# demarrer_simulation chronomètre le chargement des données (ORM), la construction
+# du contexte, l'affectation initiale, la boucle d'événements et l'extraction des
+# résultats; la vue y ajoute l'encodage JSON. Chaque phase a une durée murale
+# (perf_counter) et une durée CPU du processus (process_time): un écart important
+# signale une attente (base de données, entrées/sorties) plutôt que du calcul.
+#
+# Les compteurs sont relevés sur le contexte à la fin de la simulation:
+#   evenements_traites          événements dépilés par la boucle
+#   scores_evalues              tâches candidates évaluées par l'ordonnanceur
+#   mises_a_jour_apprentissage  appels à la mise à jour apprentissage/oubli
+#   taille_file_max             taille maximale de la file d'événements
+
+COMPTEURS_SIMULATION = ('evenements_traites', 'mises_a_jour_apprentissage', 'taille_file_max')
+
+
+class Mesures:
+    """Durées murale et CPU par phase, dans l'ordre d'exécution, et compteurs d'une simulation"""
+
+    def __init__(self):
+        self.phases = {}     # {nom: {'mur_s': float, 'cpu_s': float}}
+        self.compteurs = {}
+        self.decisions = []  # (durée en s, candidates) par décision, rempli par l'ordonnanceur (métriques)
+
+    @contextmanager
+    def phase(self, nom):
+        """Chronomètre le bloc; les durées d'une phase répétée s'additionnent"""
+        mur, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            duree = self.phases.setdefault(nom, {'mur_s': 0.0, 'cpu_s': 0.0})
+            duree['mur_s'] += time.perf_counter() - mur
+            duree['cpu_s'] += time.process_time() - cpu
+
+    def relever(self, contexte):
+        """Copie les compteurs de la simulation et de l'ordonnanceur du contexte"""
+        simulation = contexte.simulation
+        self.compteurs = {nom: getattr(simulation, nom) for nom in COMPTEURS_SIMULATION}
+        self.compteurs['scores_evalues'] = contexte.ordonnanceur.scores_evalues
+
+    def rapport(self):
+        """Dictionnaire sérialisable en JSON (data['mesures'])"""
+        return {
+            'phases': [
+                {'nom': nom, 'mur_s': round(duree['mur_s'], 6), 'cpu_s': round(duree['cpu_s'], 6)}
+                for nom, duree in self.phases.items()
+            ],
+            'total_mur_s': round(sum(duree['mur_s'] for duree in self.phases.values()), 6),
+            'total_cpu_s': round(sum(duree['cpu_s'] for duree in self.phases.values()), 6),
+            'compteurs': dict(self.compteurs),
+        }
+
+    def journaliser(self, niveau=logging.INFO):
+        """Une ligne de journal: durées par phase puis compteurs"""
+        logger.log(niveau, "Mesures de la simulation: %s; %s",
+                   ", ".join(f"{nom} {duree['mur_s']:.3f} s (CPU {duree['cpu_s']:.3f} s)"
+                             for nom, duree in self.phases.items()),
+                   ", ".join(f"{nom} {valeur}" for nom, valeur in self.compteurs.items()))
+
+
+def chronometrer(contexte, nom):
+    """Phase nom des mesures du contexte; sans effet si le contexte n'en a pas"""
+    if contexte.mesures is None:
+        return nullcontext()
+    return contexte.mesures.phase(nom)
@@ -0,0 +1,161 @@
+import bisect
+import glob
+import json
+import os
+import tempfile
+import threading
+import uuid
+
+# Métriques des simulations au format texte de Prometheus, sans dépendance externe.
+#
+# Chaque processus (worker gunicorn) cumule ses compteurs et histogrammes en mémoire
+# et, si un dossier est configuré (settings.PLANIFICATION_METRIQUES_DIR), les réécrit
+# après chaque simulation dans son propre fichier JSON metriques_<pid>_<jeton>.json.
+# L'exposition additionne les fichiers de tous les processus, y compris ceux des
+# workers arrêtés: les totaux ne reculent pas quand gunicorn recycle un worker. Le
+# jeton aléatoire évite qu'un nouveau processus réutilisant un pid écrase un ancien
+# fichier; le dossier est à vider au redéploiement, comme celui de prometheus_client.
+#
+# Sans dossier, l'exposition ne couvre que le processus qui répond.
+
+BORNES_SIMULATION = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+BORNES_DECISION = (1e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 2.5e-3, 5e-3, 1e-2, 5e-2, 0.1)
+BORNES_CANDIDATS = (0, 1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000)
+BORNES_EVENEMENTS = (10, 50, 100, 500, 1000, 5000, 10000, 50000, 100000)
+BORNES_CHARGEMENT = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 5)
+
+
+class Compteur:
+    type = 'counter'
+
+    def __init__(self, nom, aide):
+        self.nom = nom
+        self.aide = aide
+        self.valeur = 0
+
+    def incrementer(self, n=1):
+        self.valeur += n
+
+    def etat(self):
+        return {'valeur': self.valeur}
+
+    @staticmethod
+    def fusionner(etats):
+        return {'valeur': sum(etat['valeur'] for etat in etats)}
+
+    def lignes(self, etat):
+        return [f"{self.nom} {etat['valeur']}"]
+
+
+class Histogramme:
+    """Histogramme à bornes fixes: comptes par intervalle (non cumulés), somme et nombre"""
+    type = 'histogram'
+
+    def __init__(self, nom, aide, bornes):
+        self.nom = nom
+        self.aide = aide
+        self.bornes = tuple(bornes)
+        self.comptes = [0] * (len(self.bornes) + 1)  # Dernier intervalle: au-delà de la plus grande borne
+        self.somme = 0.0
+
+    def observer(self, valeur):
+        self.comptes[bisect.bisect_left(self.bornes, valeur)] += 1
+        self.somme += valeur
+
+    def etat(self):
+        return {'comptes': list(self.comptes), 'somme': self.somme}
+
+    @staticmethod
+    def fusionner(etats):
+        etats = list(etats)
+        comptes = [sum(colonne) for colonne in zip(*(etat['comptes'] for etat in etats))]
+        return {'comptes': comptes, 'somme': sum(etat['somme'] for etat in etats)}
+
+    def lignes(self, etat):
+        lignes = []
+        cumul = 0
+        for borne, compte in zip(self.bornes + ('+Inf',), etat['comptes']):
+            cumul += compte
+            lignes.append(f'{self.nom}_bucket{{le="{borne}"}} {cumul}')
+        lignes.append(f"{self.nom}_sum {etat['somme']}")
+        lignes.append(f"{self.nom}_count {cumul}")
+        return lignes
+
+
+class Metriques:
+    """Métriques d'un processus; les mises à jour sont protégées par un verrou (simulations en threads)"""
+
+    def __init__(self):
+        self._verrou = threading.Lock()
+        self._jeton = uuid.uuid4().hex[:8]
+        self.simulations = Compteur('planification_simulations_total', "Simulations terminées")
+        self.duree_simulation = Histogramme(
+            'planification_simulation_duree_secondes', "Durée d'une simulation complète (chargement compris)",
+            BORNES_SIMULATION)
+        self.duree_chargement = Histogramme(
+            'planification_chargement_donnees_secondes', "Durée du chargement des données depuis la base",
+            BORNES_CHARGEMENT)
+        self.duree_decision = Histogramme(
+            'planification_decision_duree_secondes', "Durée d'une décision de l'ordonnanceur (choisir_tache)",
+            BORNES_DECISION)
+        self.candidats_decision = Histogramme(
+            'planification_candidats_par_decision', "Tâches candidates évaluées par décision", BORNES_CANDIDATS)
+        self.evenements_simulation = Histogramme(
+            'planification_evenements_par_simulation', "Événements traités par simulation", BORNES_EVENEMENTS)
+        self.metriques = [self.simulations, self.duree_simulation, self.duree_chargement,
+                          self.duree_decision, self.candidats_decision, self.evenements_simulation]
+
+    def enregistrer_simulation(self, mesures, dossier=None):
+        """Ajoute une simulation terminée (Mesures relevées), puis réécrit le fichier du processus"""
+        chargement = mesures.phases.get('chargement')
+        with self._verrou:
+            self.simulations.incrementer()
+            self.duree_simulation.observer(sum(duree['mur_s'] for duree in mesures.phases.values()))
+            if chargement is not None:
+                self.duree_chargement.observer(chargement['mur_s'])
+            for duree, candidats in mesures.decisions:
+                self.duree_decision.observer(duree)
+                self.candidats_decision.observer(candidats)
+            self.evenements_simulation.observer(mesures.compteurs.get('evenements_traites', 0))
+            if dossier:
+                self._sauvegarder(dossier)
+
+    def etat(self):
+        with self._verrou:
+            return {metrique.nom: metrique.etat() for metrique in self.metriques}
+
+    def _sauvegarder(self, dossier):
+        """Écriture atomique (fichier temporaire puis os.replace): un lecteur ne voit jamais un fichier partiel"""
+        os.makedirs(dossier, exist_ok=True)
+        descripteur, temporaire = tempfile.mkstemp(dir=dossier, suffix='.tmp')
+        with os.fdopen(descripteur, 'w') as fichier:
+            json.dump({metrique.nom: metrique.etat() for metrique in self.metriques}, fichier)
+        os.replace(temporaire, self._chemin(dossier))
+
+    def _chemin(self, dossier):
+        return os.path.join(dossier, f"metriques_{os.getpid()}_{self._jeton}.json")
+
+    def exposition(self, dossier=None):
+        """Texte au format d'exposition Prometheus (version 0.0.4), agrégé sur tous les processus si dossier"""
+        if dossier:
+            etats = []
+            for chemin in sorted(glob.glob(os.path.join(dossier, 'metriques_*.json'))):
+                try:
+                    with open(chemin) as fichier:
+                        etats.append(json.load(fichier))
+                except (OSError, ValueError):
+                    continue  # Fichier supprimé entre-temps
+            if not os.path.exists(self._chemin(dossier)):
+                etats.append(self.etat())  # Processus courant, sans simulation enregistrée sur disque
+        else:
+            etats = [self.etat()]
+        lignes = []
+        for metrique in self.metriques:
+            presents = [etat[metrique.nom] for etat in etats if metrique.nom in etat]
+            lignes.append(f"# HELP {metrique.nom} {metrique.aide}")
+            lignes.append(f"# TYPE {metrique.nom} {metrique.type}")
+            lignes.extend(metrique.lignes(metrique.fusionner(presents) if presents else metrique.etat()))
+        return "\n".join(lignes) + "\n"
+
+
+METRIQUES = Metriques()  # Métriques du processus
@@ -0,0 +1,423 @@
+import heapq
+import logging
+import time
+
+import numpy as np
+
+from .Structured_data import DEBUT_TACHE, FIN_TACHE, TYPES_EVENEMENT, HistoriquePerformance, Operator, Task
+from .fonctions import get_data
+from .instrumentation import chronometrer
+
+logger = logging.getLogger(__name__)
+
+# Moteur de simulation "en tableaux" (struct-of-arrays).
+#
+# Il prend le même ContexteSimulation que executer_simulation et rend les mêmes
+# données (get_data), mais l'état est tenu dans des tableaux NumPy indexés par
+# entiers au lieu du graphe d'objets Task / Machine / Operator:
+#   - tâches: temps standard, cr, quantité, machine, précédence, fin, attente...
+#   - machines: tâche en cours et file d'attente (libre_a et le routage restent
+#     sur les objets Machine / GroupeMachines, consultés une fois par décision)
+#   - opérateurs: matrices de performance (opérateurs x tâches, nan si inconnue)
+# Le moteur objet reste la référence: chaque règle (y compris ses bizarreries,
+# comme la tâche mise en cours sur la machine lors de l'affectation initiale)
+# est reproduite à l'identique, ce que vérifie le test différentiel.
+
+
+class MoteurTableaux:
+    """Exécute la simulation d'un contexte sur des tableaux NumPy (voir executer)"""
+
+    def __init__(self, contexte):
+        self.contexte = contexte
+        self.simulation = contexte.simulation
+        self.ordonnanceur = contexte.ordonnanceur
+        self.taches = contexte.registre.liste
+        self.operateurs = contexte.operateurs
+        self.machines = contexte.machines
+        n_taches, n_operateurs, n_machines = len(self.taches), len(self.operateurs), len(self.machines)
+        index_machines = self.index_machines = {machine: i for i, machine in enumerate(self.machines)}
+
+        # Tâches (l'indice n_taches est une sentinelle pour "aucune tâche")
+        self.temps_standard = np.array([t.temps_standard for t in self.taches], dtype=float)
+        self.cr = np.array([t.cr for t in self.taches], dtype=float)
+        self.quantite = np.array([t.quantite for t in self.taches], dtype=float)
+        self.repetitions = np.array([t.nembre_repition for t in self.taches], dtype=float)
+        self.machine = np.empty(n_taches, dtype=np.intp)
+        self.precedence = np.full(n_taches, n_taches, dtype=np.intp)
+        for i, tache in enumerate(self.taches):
+            if tache.machine_requise not in index_machines:
+                raise ValueError(f"Aucune machine pour la tâche {tache.id}")
+            self.machine[i] = index_machines[tache.machine_requise]
+            if isinstance(tache.precedence, Task):
+                self.precedence[i] = tache.precedence.index
+            elif tache.precedence is not None:
+                raise ValueError(f"Précédence inconnue pour la tâche {tache.id}: {tache.precedence}")
+        # Groupes de plusieurs machines: leurs tâches non affectées sont routées à chaque décision
+        par_groupe = {}
+        for tache in self.taches:
+            if len(tache.groupe_machines.machines) > 1:
+                par_groupe.setdefault(tache.groupe_machines, []).append(tache.index)
+        self.groupes = [(groupe, np.array(indices, dtype=np.intp)) for groupe, indices in par_groupe.items()]
+        self.restante = np.array([t.quantite_restante > 0 for t in self.taches], dtype=bool)
+        self.termine = np.zeros(n_taches + 1, dtype=bool)
+        self.termine[n_taches] = True  # Pas de précédence = précédence terminée
+        self.affectee = np.zeros(n_taches + 1, dtype=bool)
+        self.temps_fin = np.zeros(n_taches + 1)
+        self.temps_attente = np.zeros(n_taches)
+        self.facteur_duree = np.ones(n_taches)  # Aléa de durée (voir Simulation.tirer_facteur_duree)
+        self.nombre_termines = 0
+
+        # Machines: tâche en cours (sentinelle si aucune) et file d'attente
+        self.actuelle = np.full(n_machines, n_taches, dtype=np.intp)
+        self.files = [[] for _ in range(n_machines)]
+        self.queue = np.full(n_machines, n_taches, dtype=np.intp)  # Dernière tâche de la file
+        self.historique_machines = [[] for _ in range(n_machines)]
+
+        # Opérateurs: performances limitées aux tâches du plan
+        self.performance = np.full((n_operateurs, n_taches), np.nan)
+        self.derniere_execution = np.full((n_operateurs, n_taches), np.nan)
+        self.derniere_performance = np.full((n_operateurs, n_taches), Operator.P_MIN)
+        self.position = np.full((n_operateurs, n_taches), -1, dtype=np.intp)  # Indice dans colonnes[o]
+        self.colonnes = []
+        self.historiques = []
+        self.dernieres = []
+        for o, op in enumerate(self.operateurs):
+            colonnes = np.array([t.index for t in self.taches if t.id in op.performancess], dtype=np.intp)
+            self.performance[o, colonnes] = [op.performancess[self.taches[k].id] for k in colonnes]
+            self.position[o, colonnes] = np.arange(colonnes.size)
+            self.colonnes.append(colonnes)
+            self.historiques.append(HistoriquePerformance(
+                [self.taches[k].id for k in colonnes], op.historique_performance.capacite_max,
+                op.historique_performance.politique))
+            self.dernieres.append({})
+        self.courante = np.full(n_operateurs, -1, dtype=np.intp)
+        self.machine_actuelle = [None] * n_operateurs
+        self.historique_travail = [[] for _ in range(n_operateurs)]
+
+        # Bornes du makespan (même somme que Ordonnanceur._temps_operateur)
+        self.temps_par_operateur = [self._temps_operateur(o) for o in range(n_operateurs)]
+        self.bornes_makespan = self.ordonnanceur.bornes_makespan
+
+        self.evenements = []
+        self._sequence = 0
+        self.temps_actuel = self.simulation.temps_actuel
+        self.makespan_actuel = self.simulation.makespan_actuel
+
+    def executer(self, ordre_operateurs=None):
+        """
+        Affectations initiales et boucle d'événements; retourne get_data, ou None si rien n'a été affecté
+
+        ordre_operateurs: voir executer_simulation
+        """
+        if ordre_operateurs is None:
+            ordre = sorted(range(len(self.operateurs)),
+                           key=lambda o: sum(self.operateurs[o].performancess.values()), reverse=True)
+        else:
+            index = {op.id: o for o, op in enumerate(self.operateurs)}
+            if sorted(ordre_operateurs) != sorted(index):
+                raise ValueError(f"Ordre d'opérateurs invalide: {list(ordre_operateurs)}")
+            ordre = [index[op_id] for op_id in ordre_operateurs]
+        with chronometrer(self.contexte, 'affectation_initiale'):
+            affectees = self._affectations_initiales(ordre)
+        if not affectees:
+            logger.warning("Aucune tâche initiale n'a pu être affectée!")
+            return None
+        with chronometrer(self.contexte, 'boucle'):
+            self._boucle()
+        with chronometrer(self.contexte, 'extraction'):
+            self._reporter_resultats()
+            return get_data(self.contexte, [self.operateurs[o] for o in ordre])
+
+    def _affectations_initiales(self, ordre):
+        taches_affectees = set()
+        initiales = [self.contexte.registre.rang[tache_id] for tache_id in self.contexte.taches_initiales]
+        derniere = None  # Dernière tâche examinée: le moteur objet la met en cours sur la machine
+        for o in ordre:
+            meilleure, meilleur_score = None, -1
+            self._router()
+            for k in initiales:
+                if k in taches_affectees:
+                    continue
+                performance = self.performance[o, k]
+                if performance >= 0.35:
+                    derniere = k
+                    if self.actuelle[self.machine[k]] == len(self.taches):
+                        temps_standard = self.temps_standard[k]
+                        cout_estime = (temps_standard / performance - temps_standard) * self.cr[k]
+                        score = performance / (cout_estime + 1e-6)
+                        if score > meilleur_score:
+                            meilleur_score, meilleure = score, k
+            if meilleure is None:
+                self._decider(o)
+                continue
+            temps_reel = self._temps_reel(o, meilleure)
+            temps_debut = self.temps_actuel + float(self.temps_attente[meilleure])
+            temps_fin = temps_debut + temps_reel
+            self._ajouter_evenement(temps_debut, DEBUT_TACHE, meilleure, o)
+            self._ajouter_evenement(temps_fin, FIN_TACHE, meilleure, o)
+            taches_affectees.add(meilleure)
+            self.courante[o] = meilleure
+            self.affectee[meilleure] = True
+            self.restante[meilleure] = False
+            self.temps_fin[meilleure] = temps_fin
+            self.ordonnanceur.ajouter_temps_travail(self.operateurs[o], temps_reel)
+            if self.mettre_a_jour_performance(o, meilleure, temps_fin):
+                self._mettre_a_jour_bornes(o)
+            m = self.machine[meilleure]
+            self.historique_machines[m].append((meilleure, o, temps_debut, temps_fin))
+            self._occuper(m, temps_fin)
+            self.actuelle[m] = derniere
+            self.machine_actuelle[o] = m
+            self.historique_travail[o].append((meilleure, temps_debut, temps_fin))
+            self._tracer('AFFECTATION', self.temps_actuel, meilleure, o)
+        return bool(taches_affectees)
+
+    def _boucle(self):
+        nombre_de_taches = len(self.taches)
+        produits = self.contexte.produits
+        while self.nombre_termines < nombre_de_taches:
+            if all(prod.quantite_restante == 0 for prod in produits):
+                break
+            if not self.evenements:
+                logger.debug("Aucun événement à traiter.")
+                break
+            if len(self.evenements) > self.simulation.taille_file_max:
+                self.simulation.taille_file_max = len(self.evenements)
+            temps, _, type_evenement, k, o = heapq.heappop(self.evenements)
+            self.simulation.evenements_traites += 1
+            self.temps_actuel = temps
+            self._tracer(TYPES_EVENEMENT[type_evenement], temps, k, o)
+            if type_evenement != FIN_TACHE:
+                continue
+            self._terminer(k)
+            # Sous-performance avec la performance courante (avant mise à jour), comme boucle_principale
+            temps_standard = self.temps_standard[k]
+            temps_reel = (temps_standard + temps_standard * (1 - self.performance[o, k])) * self.facteur_duree[k]
+            sous_performance = float((-temps_reel + temps_standard) * self.quantite[k])
+            if self.mettre_a_jour_performance(o, k, temps):
+                self._mettre_a_jour_bornes(o)
+            self.simulation.temps_actuel = temps
+            self.contexte.cout.ajouter_cout(self.simulation, sous_performance, self.taches[k].cr)
+            self._decider(o)
+
+    def _terminer(self, k):
+        self.makespan_actuel = max(self.makespan_actuel, self.temps_actuel)
+        m = self.machine[k]
+        file = self.files[m]
+        self.actuelle[m] = file.pop(0) if file else len(self.taches)
+        if not file:
+            self.queue[m] = len(self.taches)
+        if not self.termine[k]:
+            self.termine[k] = True
+            self.nombre_termines += 1
+
+    def _decider(self, o):
+        """_choisir_et_affecter, chronométré si l'ordonnanceur note ses décisions (voir Ordonnanceur.choisir_tache)"""
+        decisions = self.ordonnanceur.decisions
+        if decisions is None:
+            return self._choisir_et_affecter(o)
+        debut, evalues = time.perf_counter(), self.ordonnanceur.scores_evalues
+        resultat = self._choisir_et_affecter(o)
+        decisions.append((time.perf_counter() - debut, self.ordonnanceur.scores_evalues - evalues))
+        return resultat
+
+    def _choisir_et_affecter(self, o):
+        """Ordonnanceur.choisir_tache puis affecter_tache, en un passage sur les tableaux"""
+        n_taches = len(self.taches)
+        self._router()
+        libre = (self.actuelle == n_taches) & (self.queue == n_taches)
+        libre_tache = libre[self.machine]
+        precedence_faite = self.termine[self.precedence]
+        performance = self.performance[o]
+
+        disponibles = np.flatnonzero(self.restante & precedence_faite & libre_tache & (performance >= 0.2))
+        self.temps_attente[disponibles] = 0
+
+        # Temps d'attente des tâches bloquées (voir Ordonnanceur.taches_non_disponibles)
+        attente = np.zeros(n_taches)
+        cas = libre_tache & ~precedence_faite & self.affectee[self.precedence]
+        attente[cas] = self.temps_fin[self.precedence[cas]] - self.temps_actuel + 1
+        actuelle, queue = self.actuelle[self.machine], self.queue[self.machine]
+        cas = ~libre_tache & (actuelle != n_taches) & (queue == n_taches) & precedence_faite
+        attente[cas] = self.temps_fin[actuelle[cas]] - self.temps_actuel + 1
+        cas = queue != n_taches
+        attente[cas] = self.temps_fin[queue[cas]] - self.temps_actuel + 1
+        bloquees = np.flatnonzero(self.restante & (attente > 0))
+
+        candidates = np.concatenate((disponibles, bloquees))
+        self.ordonnanceur.scores_evalues += candidates.size
+        if not candidates.size:
+            return False
+        temps_attente = np.concatenate((np.zeros(disponibles.size), attente[bloquees]))
+        scores = self._calculer_scores(o, candidates, temps_attente)
+        meilleurs = np.flatnonzero(scores == scores.max())
+        i = meilleurs[np.argmax(-temps_attente[meilleurs])]
+        k = candidates[i]
+        if i >= disponibles.size:
+            self.temps_attente[k] = temps_attente[i]
+        return self._affecter(o, k)
+
+    def _calculer_scores(self, o, candidates, temps_attente):
+        """Même calcul que Ordonnanceur._calculer_scores_lot, opération par opération"""
+        ordonnanceur = self.ordonnanceur
+        temps_standard = self.temps_standard[candidates]
+        performance = self.performance[o, candidates]
+        if np.isnan(performance).any():
+            inconnue = candidates[np.flatnonzero(np.isnan(performance))[0]]
+            raise KeyError(self.taches[inconnue].id)
+        cr = self.cr[candidates]
+        historique = self.historiques[o]
+        if historique.nombre:
+            perf_brut = historique.sommes[self.position[o, candidates]] / historique.nombre
+        else:
+            perf_brut = performance
+
+        cout = (temps_standard / performance - temps_standard) * cr
+        cout_brut = np.clip(1 - (cout / 1000), 0.0, 1.0)
+        score_cout = 1 - (cout_brut - 0) / (1000 - 0)
+        score_perf = perf_brut / 1.15
+        score_equite = ordonnanceur._normaliser_equite(ordonnanceur._calculer_equite())
+        impact = self.temps_actuel + (temps_standard / performance) - self.makespan_actuel
+        makespan_brut = np.clip(1 - (impact / 240), 0.0, 1.0)
+        min_m, max_m = self.bornes_makespan
+        score_makespan = np.clip(1 - (makespan_brut - min_m) / (max_m - min_m + 1e-6), 0, 1)
+
+        poids = ordonnanceur.poids
+        return (
+            poids["cout"] * score_cout +
+            poids["performance"] * score_perf +
+            poids["equite"] * score_equite +
+            poids["makespan"] * score_makespan -
+            poids["penalite_attente"] * (temps_attente / self.simulation.temps_max)
+        )
+
+    def _affecter(self, o, k):
+        if not self.restante[k]:
+            return False
+        temps_reel = self._temps_reel(o, k)
+        self.restante[k] = False
+        temps_debut = self.temps_actuel + float(self.temps_attente[k])
+        self.courante[o] = k
+        m = self.machine[k]
+        if self.temps_attente[k] > 0:
+            self.files[m].append(k)
+            self.queue[m] = k
+        else:
+            self.actuelle[m] = k
+        self.affectee[k] = True
+        temps_fin = temps_debut + temps_reel
+        self.temps_fin[k] = temps_fin
+        self.ordonnanceur.ajouter_temps_travail(self.operateurs[o], temps_reel)
+        self.historique_travail[o].append((k, temps_debut, temps_fin))
+        self.historique_machines[m].append((k, o, temps_debut, temps_fin))
+        self._occuper(m, temps_fin)
+        self.machine_actuelle[o] = m
+        self._ajouter_evenement(temps_debut, DEBUT_TACHE, k, o)
+        self._ajouter_evenement(temps_fin, FIN_TACHE, k, o)
+        self._tracer('AFFECTATION', self.temps_actuel, k, o)
+        return True
+
+    def _router(self):
+        """Task.determiner_machine pour les tâches non affectées des groupes de plusieurs machines"""
+        for groupe, taches in self.groupes:
+            self.machine[taches[self.restante[taches]]] = self.index_machines[groupe.plus_tot_libre()]
+
+    def _occuper(self, m, temps_fin):
+        # libre_a reste tenu sur les objets Machine: leurs GroupeMachines font le routage
+        machine = self.machines[m]
+        machine.definir_libre_a(max(machine.libre_a, temps_fin))
+
+    def _temps_reel(self, o, k):
+        temps_standard = self.temps_standard[k]
+        temps_unitaire = temps_standard + temps_standard * (1 - self.performance[o, k])
+        self.facteur_duree[k] = self.simulation.tirer_facteur_duree()
+        return float(temps_unitaire * self.quantite[k] * self.facteur_duree[k])
+
+    def mettre_a_jour_performance(self, o, k, temps):
+        """Operator.mettre_a_jour_performance sur la ligne o de la matrice; True si une valeur a changé"""
+        operateur = self.operateurs[o]
+        colonnes = self.colonnes[o]
+        self.simulation.mises_a_jour_apprentissage += 1
+        ancienne = self.performance[o, colonnes]
+        self.historiques[o].enregistrer(ancienne, self.temps_actuel)
+
+        courante = self.position[o, self.courante[o]] if self.courante[o] >= 0 else -1
+        derniere = self.derniere_execution[o, colonnes]
+        duree_jours = np.where(
+            np.isnan(derniere),
+            self.temps_actuel / (60 * 8),
+            (self.temps_actuel - derniere) / (60 * 8)
+        )
+        apprentissage = np.zeros(colonnes.size, dtype=bool)
+        if courante >= 0:
+            duree_jours[courante] = 0
+            apprentissage[courante] = self.repetitions[self.courante[o]] > 0
+        interruptions = np.maximum(0, duree_jours - 1)
+
+        nouvelle = ancienne.copy()
+        if apprentissage.any():
+            nouvelle[apprentissage] = operateur.calculer_effet_apprentissage_vectoriel(
+                ancienne[apprentissage], Operator.P_MAX)
+        oubli = ~apprentissage & (interruptions > 0)
+        if oubli.any():
+            nouvelle[oubli] = operateur.calculer_effet_oubli_vectoriel(
+                interruptions[oubli], self.derniere_performance[o, colonnes][oubli], Operator.P_MIN,
+                operateur.learning_params['FC'], 0.1)
+        np.clip(nouvelle, Operator.P_MIN, Operator.P_MAX, out=nouvelle, where=apprentissage | oubli)
+
+        position = self.position[o, k]
+        if position >= 0:
+            self.dernieres[o][self.taches[k].id] = {'temps': temps, 'performance': float(ancienne[position])}
+            self.derniere_execution[o, k] = temps
+            self.derniere_performance[o, k] = ancienne[position]
+        self.performance[o, colonnes] = nouvelle
+        return bool((nouvelle != ancienne).any())
+
+    def _temps_operateur(self, o):
+        colonnes = self.colonnes[o]
+        # sum() sur une liste: même ordre d'addition que le moteur objet
+        return sum((self.temps_standard[colonnes] / self.performance[o, colonnes]).tolist())
+
+    def _mettre_a_jour_bornes(self, o):
+        self.temps_par_operateur[o] = self._temps_operateur(o)
+        self.bornes_makespan = self.ordonnanceur._ajuster_bornes_makespan(
+            self.ordonnanceur._temps_total_taches / len(self.temps_par_operateur),
+            max(self.temps_par_operateur)
+        )
+
+    def _ajouter_evenement(self, temps, type_evenement, k, o):
+        self._sequence += 1
+        heapq.heappush(self.evenements, (temps, self._sequence, type_evenement, k, o))
+
+    def _tracer(self, type_evenement, temps, k, o):
+        if self.simulation.trace is not None:
+            self.simulation.trace.enregistrer(type_evenement, temps, self.taches[k], self.operateurs[o])
+
+    def _reporter_resultats(self):
+        """Recopie l'état final dans les objets du contexte pour get_data et les exports"""
+        taches, operateurs, machines = self.taches, self.operateurs, self.machines
+        n_taches = len(taches)
+        for o, op in enumerate(operateurs):
+            colonnes = self.colonnes[o]
+            for k, valeur in zip(colonnes.tolist(), self.performance[o, colonnes].tolist()):
+                op.performancess[taches[k].id] = valeur
+            op.historique_performance = self.historiques[o]
+            op.derniere_execution = self.dernieres[o]
+            op.historique_travail = [(taches[k].id, debut, fin) for k, debut, fin in self.historique_travail[o]]
+            op.machine_actuelle = machines[self.machine_actuelle[o]].id if self.machine_actuelle[o] is not None else None
+            op.tache_actuellee = taches[self.courante[o]] if self.courante[o] >= 0 else None
+        for m, machine in enumerate(machines):
+            machine.historique = [(taches[k].id, operateurs[o].id, debut, fin)
+                                  for k, o, debut, fin in self.historique_machines[m]]
+            machine.tache_actuelle = taches[self.actuelle[m]] if self.actuelle[m] != n_taches else None
+            machine.tache_en_attente = [taches[k] for k in self.files[m]]
+        for k, tache in enumerate(taches):
+            if not self.restante[k]:
+                tache.quantite_restante = 0
+            tache.temps_fin = float(self.temps_fin[k])
+            tache.machine_requise = machines[self.machine[k]]
+            tache.facteur_duree = float(self.facteur_duree[k])
+        self.simulation.termines = {taches[k] for k in np.flatnonzero(self.termine[:n_taches])}
+        self.simulation.temps_actuel = self.temps_actuel
+        self.simulation.makespan_actuel = self.makespan_actuel
+        self.ordonnanceur.bornes_makespan = self.bornes_makespan
@@ -1,38 +1,30 @@
-from .Structured_data import Operator, Product, Task, Machine, Simulation, Ordonnanceur, Cout, Evenement
+from .Structured_data import Operator, Product, Task, Machine, Simulation, Ordonnanceur, Cout, Registre, DEBUT_TACHE, FIN_TACHE, ContexteSimulation
 from .fonctions import boucle_principale, get_data
+from .instrumentation import Mesures, chronometrer
+from .metriques import METRIQUES
+from .moteur_tableaux import MoteurTableaux
+from .recherche_locale import RechercheLocale
+from .trace import TraceBinaire
 from planification.models import Produit, Tache, Operateur, PerformanceOperateur
 
 import logging
+import os
+import uuid
+from django.conf import settings
 from django.db.models import Prefetch
 
 logger = logging.getLogger(__name__)
 
 def generer_structure_donnees(user):
     try:
-        # 1. Structure pour les machines et leurs tâches
+        # 1. Structure pour les machines et leurs tâches: une seule requête sur la table de liaison,
+        # machines triées par identifiant, tâches dans l'ordre du processus
         machines_structure = {}
-
-        # Récupère les tâches de l'utilisateur uniquement
-        taches_user = Tache.objects.filter(produit__user=user)
-
-        # Extraction des machines
-        machines_brutes = taches_user.values_list('machine', flat=True)
-        liste_machines = []
-
-        for machines in machines_brutes:
-            for machine in machines.split(','):
-                m = machine.strip()
-                if m:
-                    liste_machines.append(m)
-
-        # Suppression des doublons et tri
-        machines_distinctes = sorted(set(liste_machines))
-
-        # Association machine → liste d'id_tache
-        for machine in machines_distinctes:
-            # Filtrer les tâches où le champ `machine` contient ce nom
-            taches_machine = taches_user.filter(machine__icontains=machine).values_list('id_tache', flat=True)
-            machines_structure[machine] = list(taches_machine)
+        liaisons = Tache.machines.through.objects.filter(machine__user=user, tache__produit__user=user).order_by(
+            'machine__id_machine', 'tache__ordre', 'tache__id'
+        ).values_list('machine__id_machine', 'tache__id_tache')
+        for machine, tache_id in liaisons:
+            machines_structure.setdefault(machine, []).append(tache_id)
 
 
         # 2. Structure pour les opérateurs (ici, tous les opérateurs — ou filtrer si liés à l’utilisateur)
@@ -56,7 +48,7 @@ def generer_structure_donnees(user):
 
         # 3. Structure pour les produits de l'utilisateur
         produits_structure = []
-        produits = Produit.objects.filter(user=user).prefetch_related('taches')
+        produits = Produit.objects.filter(user=user).prefetch_related('taches__machines')
 
         for produit in produits:
             taches_produit = produit.taches.all()
@@ -68,7 +60,7 @@ def generer_structure_donnees(user):
                 for tache in taches_produit:
                     taches_liste.append(tache.id_tache)
                     temps_standard_dict[tache.id_tache] = float(tache.temps_standard)
-                    machines_dict[tache.id_tache] = tache.machine
+                    machines_dict[tache.id_tache] = tache.liste_machines
 
                 try:
                     cr_value = float(produit.cr)
@@ -304,42 +296,58 @@ def default_example() :
     precedence=[precedance1, precedance2, precedance3, precedance4]
     return machines, operateurs_data, produits_data, precedence
 
-def initialiser_systeme(validation,poids,user):
-    """Initialise toutes les structures de données à partir des données fournies"""
+def charger_donnees(validation, user):
+    """Données brutes de la simulation: saisies de l'utilisateur (validation=1) ou exemple"""
     if validation==1:
-        machines_data, operateurs_data, produits_data, preced=generer_structure_donnees(user)
-    else:
-        machines_data, operateurs_data, produits_data, preced=default_example()
+        return generer_structure_donnees(user)
+    return default_example()
+
+def construire_contexte(machines_data, operateurs_data, produits_data, preced, poids, mode_score='scalaire', capacite_historique=None,
+                        politique_historique='sous_echantillonner'):
+    """
+    Construit un ContexteSimulation neuf à partir des données brutes
+
+    capacite_historique: nombre maximal de points gardés dans l'historique de performance de chaque opérateur
+    politique_historique: réduction au-delà de la capacité, 'sous_echantillonner' ou 'fenetre' (HistoriquePerformance)
+    """
+    contexte = ContexteSimulation()
     # 1. Création des machines
-    Machine.instances = []
     machines = [Machine(machine_id, list_taches) for machine_id, list_taches in machines_data.items()]
     
     # 2. Création des opérateurs
-    Operator.instances=[]
     operateurs = []
     for op_id, op_data in operateurs_data.items():
-        operateurs.append(Operator(
+        operateur = Operator(
             op_id=op_id,
             learning_params={"LC": op_data["LC"], "FC": op_data["FC"]},
-            initial_performance=dict(op_data["Performance"])  # ✅ ici
-        ))
+            initial_performance=dict(op_data["Performance"]),  # ✅ ici
+            capacite_historique=capacite_historique,
+            politique_historique=politique_historique
+        )
+        operateur.index = len(operateurs)
+        operateurs.append(operateur)
     
     # 3. Création des produits et tâches
     produits = []
-    taches_initiales=[]
-    Product.instances=[]
-    Task.instances=[]
-    taches = {}
+    taches = []
+    # Index inverse des précédences {tache_id: tache_precedente_id}
+    precedentes = {}
+    for precedance in preced:
+        for k, v in precedance.items():
+            precedentes.setdefault(v, k)
+    # Index inverse {tache_id: [Machine, ...]} des machines compatibles, dans l'ordre des machines
+    machines_par_tache = {}
+    for machine in machines:
+        for tache_id in machine.taches_compatibles:
+            compatibles = machines_par_tache.setdefault(tache_id, [])
+            if not compatibles or compatibles[-1] is not machine:
+                compatibles.append(machine)
     for prod_data in produits_data:
         # Création du produit
-        machines_requises = {}
-        for tache_id in prod_data["Tâches"]:
-            # Trouver la machine compatible
-            machines_compatibles=[]
-            for machine in machines:
-                if tache_id in machine.taches_compatibles:
-                    machines_compatibles.append(machine)
-                    machines_requises[tache_id] = machines_compatibles
+        machines_requises = {
+            tache_id: machines_par_tache[tache_id]
+            for tache_id in prod_data["Tâches"] if tache_id in machines_par_tache
+        }
                     
         product = Product(
             pid=prod_data["ID"],
@@ -352,55 +360,168 @@ def initialiser_systeme(validation,poids,user):
         produits.append(product)
         
         # Création des tâches avec précédences
-        for tache_id in prod_data["Tâches"]:
-            precedence = None
-            for precedance in preced:
-                if tache_id in precedance.values():
-                    # Trouver la valeure qui a cette tâche comme clee
-                    for k, v in precedance.items():
-                        if v == tache_id:
-                            precedence = k
-                            break
-
-            task = Task(
+        for phase, tache_id in enumerate(prod_data["Tâches"], start=1):
+            taches.append(Task(
                 tid=tache_id,
                 product=product,
-                phase=prod_data["Tâches"].index(tache_id)+1,
-                precedence=precedence
-            )
-            taches[tache_id] = task
-    for task in Task.instances:
-        if task.precedence:
-            for tasksecond in Task.instances:
-                if task.precedence == tasksecond.id:
-                    task.precedence=tasksecond   
-        else:
-            taches_initiales.append(task.id)
+                phase=phase,
+                precedence=precedentes.get(tache_id)
+            ))
+    registre = Registre(taches)
+    registre.lier_precedences()
     # 4. Initialisation des autres composants
-    Simulation.instances=[]
-    simulation = Simulation()
+    simulation = Simulation(registre=registre, operateurs=operateurs)
     ordonnanceur = Ordonnanceur(
         poids_cout=poids['poids_cout'],
         poids_equite=poids['poids_equite'],
         poids_makespan=poids['poids_makespan'],
         poids_performance=poids['poids_performance'],
-        poids_penalite_attente=poids['poids_penalite_attente']
+        poids_penalite_attente=poids['poids_penalite_attente'],
+        registre=registre,
+        mode_score=mode_score
     )
-    cout_global = Cout()
+    ordonnanceur.initialiser_bornes_makespan(produits, operateurs)
+    ordonnanceur.initialiser_charge(operateurs)
+
+    contexte.machines = machines
+    contexte.operateurs = operateurs
+    contexte.produits = produits
+    contexte.taches = taches
+    contexte.taches_initiales = [task.id for task in taches if not task.precedence]
+    contexte.registre = registre
+    contexte.simulation = simulation
+    contexte.ordonnanceur = ordonnanceur
+    contexte.cout = Cout()
+    return contexte
+
+def initialiser_systeme(validation,poids,user,mode_score='scalaire',mesures=None,capacite_historique=None,
+                        politique_historique='sous_echantillonner'):
+    """
+    Initialise toutes les structures de données à partir des données fournies
+
+    mesures: Mesures qui chronomètre le chargement et la construction, et que le contexte garde
+    capacite_historique, politique_historique: historique de performance des opérateurs (construire_contexte)
+    """
+    historique = {'capacite_historique': capacite_historique, 'politique_historique': politique_historique}
+    if mesures is None:
+        return construire_contexte(*charger_donnees(validation, user), poids, mode_score, **historique)
+    with mesures.phase('chargement'):
+        donnees = charger_donnees(validation, user)
+    with mesures.phase('construction'):
+        contexte = construire_contexte(*donnees, poids, mode_score, **historique)
+    contexte.mesures = mesures
+    contexte.ordonnanceur.decisions = mesures.decisions
+    return contexte
+
+MOTEURS = ('objet', 'tableaux')
 
-    return produits, operateurs, machines, simulation, ordonnanceur, cout_global,taches_initiales
+def demarrer_simulation(validation,poids, user, mode_score='scalaire', chemin_trace=None, moteur='objet',
+                        budget_recherche_locale=None, mesures=None, capacite_historique=None,
+                        politique_historique='sous_echantillonner', enregistrer_metriques=True):
+    """
+    Lance la simulation principale avec gestion optimisée des affectations initiales
 
-def demarrer_simulation(validation,poids, user):
-    """Lance la simulation principale avec gestion optimisée des affectations initiales"""
-    produits, operateurs, machines, simulation, ordonnanceur, cout_global,taches_initiales = initialiser_systeme(validation,poids,user)
+    mode_score: 'scalaire' (une évaluation par tâche) ou 'vectoriel' (toutes les tâches en un passage NumPy)
+    chemin_trace: fichier de trace binaire (voir trace.py). Par défaut, un fichier
+        dans settings.PLANIFICATION_TRACE_DIR si ce réglage est défini.
+    moteur: 'objet' (référence, graphe d'objets) ou 'tableaux' (MoteurTableaux, état en tableaux NumPy)
+    budget_recherche_locale: secondes de recherche locale après le glouton (RechercheLocale), None pour s'en passer
+    mesures: Mesures à compléter (par exemple par la vue, avec l'encodage JSON); une nouvelle par défaut.
+        Les durées par phase et les compteurs sont rendus dans data['mesures'].
+    capacite_historique, politique_historique: borne de l'historique de performance de chaque opérateur
+        et politique de réduction ('sous_echantillonner' ou 'fenetre'); sans borne par défaut
+    enregistrer_metriques: ajouter la simulation aux métriques du processus (METRIQUES); False pour
+        une exécution instrumentée (profilage) dont les durées fausseraient les histogrammes
+    """
+    if moteur not in MOTEURS:
+        raise ValueError(f"Moteur de simulation inconnu: {moteur}")
+    journaliser = mesures is None
+    if mesures is None:
+        mesures = Mesures()
+    contexte = initialiser_systeme(validation,poids,user,mode_score,mesures,capacite_historique,politique_historique)
+    executer = executer_simulation if moteur == 'objet' else executer_simulation_tableaux
+    if budget_recherche_locale is not None:
+        executer = avec_recherche_locale(executer, budget_recherche_locale)
+    dossier_trace = getattr(settings, 'PLANIFICATION_TRACE_DIR', None)
+    if chemin_trace is None and dossier_trace:
+        chemin_trace = os.path.join(dossier_trace, f"simulation_{uuid.uuid4().hex}.trace")
+    if chemin_trace is None:
+        data = executer(contexte)
+    else:
+        with TraceBinaire(chemin_trace, contexte) as trace:
+            contexte.simulation.trace = trace
+            data = executer(contexte)
+    if data is None:
+        return None
+    mesures.relever(contexte)
+    if enregistrer_metriques:
+        METRIQUES.enregistrer_simulation(mesures, getattr(settings, 'PLANIFICATION_METRIQUES_DIR', None))
+    data['mesures'] = mesures.rapport()
+    if journaliser:
+        mesures.journaliser(logging.DEBUG)  # Une ligne par simulation: trop bavard au niveau INFO
+    return data
+
+def executer_simulation_tableaux(contexte, ordre_operateurs=None):
+    """Même rôle que executer_simulation, avec le moteur en tableaux NumPy"""
+    return MoteurTableaux(contexte).executer(ordre_operateurs)
+
+def avec_recherche_locale(executer, budget_secondes, graine=0):
+    """Enveloppe executer pour améliorer le planning glouton par recherche locale"""
+    def executer_puis_ameliorer(contexte, ordre_operateurs=None):
+        recherche = RechercheLocale(contexte)  # Avant l'exécution: performances de départ
+        data = executer(contexte, ordre_operateurs)
+        if data is None:
+            return None
+        with chronometrer(contexte, 'recherche_locale'):
+            return recherche.ameliorer(data, budget_secondes, graine)
+    return executer_puis_ameliorer
+
+def ordonner_operateurs(operateurs, ordre_operateurs):
+    """Opérateurs rangés selon une liste d'ids, qui doit les contenir tous une fois"""
+    par_id = {op.id: op for op in operateurs}
+    if sorted(ordre_operateurs) != sorted(par_id):
+        raise ValueError(f"Ordre d'opérateurs invalide: {list(ordre_operateurs)}")
+    return [par_id[op_id] for op_id in ordre_operateurs]
+
+def executer_simulation(contexte, ordre_operateurs=None):
+    """
+    Affectations initiales, boucle d'événements et extraction des résultats d'un contexte
+
+    ordre_operateurs: ids des opérateurs dans l'ordre de l'affectation initiale
+        (par défaut, performance globale décroissante)
+    """
+    with chronometrer(contexte, 'affectation_initiale'):
+        operateurs = affecter_taches_initiales(contexte, ordre_operateurs)
+    if operateurs is None:
+        return
+    with chronometrer(contexte, 'boucle'):
+        boucle_principale(contexte)
+    with chronometrer(contexte, 'extraction'):
+        return get_data(contexte, operateurs)
+
+def affecter_taches_initiales(contexte, ordre_operateurs=None):
+    """
+    Affectation initiale des opérateurs aux tâches sans précédence
+
+    Retourne les opérateurs dans l'ordre utilisé (celui de get_data),
+    None si aucune tâche initiale n'a pu être affectée.
+    """
+    operateurs = contexte.operateurs
+    simulation = contexte.simulation
+    ordonnanceur = contexte.ordonnanceur
+    taches_initiales = contexte.taches_initiales
     # 1. Préparation des structures de données
     taches_affectees = set()
     operateurs_disponibles = operateurs
     # 2. Tri des opérateurs par performance globale décroissante
-    operateurs = sorted(operateurs_disponibles, 
-                            key=lambda op: sum(op.performancess.values()), 
-                            reverse=True)
-    print(list(op.id for op in operateurs))
+    if ordre_operateurs is None:
+        operateurs = sorted(operateurs_disponibles, 
+                                key=lambda op: sum(op.performancess.values()), 
+                                reverse=True)
+    else:
+        operateurs = ordonner_operateurs(operateurs_disponibles, ordre_operateurs)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug('Ordre des opérateurs %s', [op.id for op in operateurs])
     # 3. Affectation initiale optimisée
     for op in operateurs:
         meilleure_tache = None
@@ -412,11 +533,11 @@ def demarrer_simulation(validation,poids, user):
                 continue
                 
             if tache_id in op.performancess  and op.performancess[tache_id] >= 0.35:
-                tache = next(t for t in Task.instances if t.id == tache_id)
+                tache = simulation.registre.tache(tache_id)
                 
                 # Vérification des contraintes
                 if (tache.product.quantite_restante > 0 and 
-                    tache.machine_requise.tache_actuelle is None):
+                    tache.determiner_machine().tache_actuelle is None):
                     
                     # Calcul du score basé sur la performance et le coût
                     temps_estime = tache.temps_standard / op.performancess  [tache_id]
@@ -430,48 +551,38 @@ def demarrer_simulation(validation,poids, user):
         if meilleure_tache:
             quantite = meilleure_tache.quantite
             temps_unitaire = meilleure_tache.temps_standard + meilleure_tache.temps_standard*(1-op.performancess  [meilleure_tache.id])
-            temps_reel = temps_unitaire * quantite
-            # Création des événements
+            meilleure_tache.facteur_duree = simulation.tirer_facteur_duree()
+            temps_reel = temps_unitaire * quantite * meilleure_tache.facteur_duree
+            # Création et enregistrement des événements
             temps_debut=simulation.temps_actuel+meilleure_tache.temps_attente
             temps_fin=temps_debut+temps_reel
-            debut_event = Evenement(
-                temps=temps_debut,
-                type="DEBUT_TACHE",
-                tache=meilleure_tache,
-                operateur=op,
-                machine=meilleure_tache.machine_requise
-            )
-            
-            fin_event = Evenement(
-                temps=temps_fin,
-                type="FIN_TACHE",
-                tache=meilleure_tache,
-                operateur=op,
-                machine=meilleure_tache.machine_requise
-            )
-            # Enregistrement des événements
-            simulation.ajouter_evenement(debut_event)
-            simulation.ajouter_evenement(fin_event)
+            simulation.ajouter_evenement(temps_debut, DEBUT_TACHE, meilleure_tache, op)
+            simulation.ajouter_evenement(temps_fin, FIN_TACHE, meilleure_tache, op)
             # Mise à jour des états
             taches_affectees.add(meilleure_tache.id)
             op.tache_actuellee= meilleure_tache
             meilleure_tache.operateur_affecte = op
             meilleure_tache.temps_debut = temps_debut
             meilleure_tache.quantite_restante = 0
+            ordonnanceur.marquer_affectee(meilleure_tache)
             meilleure_tache.temps_fin = temps_fin
+            ordonnanceur.ajouter_temps_travail(op, temps_reel)
 
-            op.mettre_a_jour_performance(meilleure_tache.id,temps_fin,simulation)
+            if op.mettre_a_jour_performance(meilleure_tache.id,temps_fin,simulation):
+                ordonnanceur.mettre_a_jour_bornes_makespan(op)
 
             machine = meilleure_tache.machine_requise 
             machine.historique.append((meilleure_tache.id,op.id,temps_debut,temps_fin))
+            machine.definir_libre_a(max(machine.libre_a, temps_fin))
             machine.tache_actuelle=tache
             op.machine_actuelle=machine.id
             op.historique_travail.append((meilleure_tache.id,temps_debut,temps_fin))
             
             #print('historique des taches',op.historique_travail )
-            print(f"Affectation initiale: {op.id} → {meilleure_tache.id} "
-                  f"(Performance: {op.performancess [meilleure_tache.id]:.2f}, "
-                  f"Temps estimé: {temps_reel:.1f} min quantite: {meilleure_tache.quantite})")
+            if simulation.trace is not None:
+                simulation.trace.enregistrer('AFFECTATION', simulation.temps_actuel, meilleure_tache, op)
+            logger.debug("Affectation initiale: %s → %s (Performance: %.2f, Temps estimé: %.1f min quantite: %s)",
+                         op.id, meilleure_tache.id, op.performancess[meilleure_tache.id], temps_reel, meilleure_tache.quantite)
         else:
             # Chercher une nouvelle tâche pour l'opérateur
             tache_suivante = ordonnanceur.choisir_tache(
@@ -487,14 +598,12 @@ def demarrer_simulation(validation,poids, user):
                     simulation=simulation
                 )
                 if not success:
-                    print(f"Échec d'affectation pour {op.id}")
+                    logger.warning("Échec d'affectation pour %s", op.id)
     
     # 4. Vérification des affectations
     if not taches_affectees:
-        print("Avertissement: Aucune tâche initiale n'a pu être affectée!")
-        return
-    # 5. Lancement de la boucle principale
-    boucle_principale(simulation, ordonnanceur,cout_global)
-    return get_data(operateurs,simulation,cout_global)
+        logger.warning("Aucune tâche initiale n'a pu être affectée!")
+        return None
+    return operateurs
 
 
@@ -0,0 +1,118 @@
+import cProfile
+import marshal
+import os
+import pstats
+import time
+import tracemalloc
+
+from .instrumentation import Mesures
+from .principal_prog import demarrer_simulation
+
+# Profilage à la demande d'une simulation (vue réservée au personnel).
+#
+# profiler_simulation relance demarrer_simulation sous cProfile, et en option sous
+# tracemalloc, avec les données d'un utilisateur et des poids donnés. Le résultat
+# contient le fichier pstats (lisible par pstats.Stats ou snakeviz) et les N
+# fonctions de plus grand temps cumulé. Avec tracemalloc, l'instantané des
+# allocations est pris par MesuresProfilage.relever, quand demarrer_simulation relève
+# ses compteurs: le contexte (tâches, opérateurs, file d'événements) est encore en vie.
+# Ralenties par les profileurs, ces simulations ne sont pas ajoutées aux métriques (METRIQUES).
+
+FILTRES_ALLOCATIONS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+    tracemalloc.Filter(False, '<unknown>'),
+)
+
+
+class MesuresProfilage(Mesures):
+    """Mesures qui prennent un instantané tracemalloc au relevé, si demandé, hors du profil cProfile"""
+
+    def __init__(self, profileur, avec_tracemalloc=False):
+        super().__init__()
+        self.profileur = profileur
+        self.avec_tracemalloc = avec_tracemalloc
+        self.instantane = None
+
+    def relever(self, contexte):
+        super().relever(contexte)
+        if self.avec_tracemalloc and tracemalloc.is_tracing():
+            self.profileur.disable()
+            try:
+                self.instantane = tracemalloc.take_snapshot().filter_traces(FILTRES_ALLOCATIONS)
+            finally:
+                self.profileur.enable()
+
+
+class Profil:
+    """Résultat de profiler_simulation"""
+
+    def __init__(self, statistiques, duree, mesures, top, memoire_pic=None):
+        self.duree = duree
+        self.mesures = mesures.rapport()
+        self.memoire_pic = memoire_pic  # Octets, None sans tracemalloc
+        self.pstats = marshal.dumps(statistiques.stats)  # Format de Profile.dump_stats
+        self.fonctions = fonctions_par_temps_cumule(statistiques, top)
+        self.allocations = allocations_par_ligne(mesures.instantane, top) if mesures.instantane is not None else []
+
+
+def profiler_simulation(validation, poids, user, moteur='objet', avec_tracemalloc=False, top=30):
+    """
+    Relance demarrer_simulation sous cProfile (et tracemalloc si demandé) et retourne un Profil
+
+    validation, poids, user, moteur: comme demarrer_simulation (1: données saisies par user, 0: exemple)
+    top: nombre de fonctions et de lignes d'allocation retenues
+    """
+    profileur = cProfile.Profile()
+    mesures = MesuresProfilage(profileur, avec_tracemalloc)
+    memoire_pic = None
+    deja_actif = tracemalloc.is_tracing()  # PYTHONTRACEMALLOC: ne pas l'arrêter à la fin
+    if avec_tracemalloc and not deja_actif:
+        tracemalloc.start()
+    debut = time.perf_counter()
+    try:
+        profileur.enable()
+        try:
+            demarrer_simulation(validation, poids, user, moteur=moteur, mesures=mesures, enregistrer_metriques=False)
+        finally:
+            profileur.disable()
+    finally:
+        duree = time.perf_counter() - debut
+        if avec_tracemalloc:
+            memoire_pic = tracemalloc.get_traced_memory()[1]
+            if not deja_actif:
+                tracemalloc.stop()
+    return Profil(pstats.Stats(profileur), duree, mesures, top, memoire_pic)
+
+
+def fonctions_par_temps_cumule(statistiques, top):
+    """N premières fonctions par temps cumulé: dicts fonction, appels, temps_propre, temps_cumule"""
+    statistiques.sort_stats(pstats.SortKey.CUMULATIVE)
+    lignes = []
+    for fonction in statistiques.fcn_list[:top]:
+        appels_primitifs, appels, temps_propre, temps_cumule, _ = statistiques.stats[fonction]
+        fichier, ligne, nom = fonction
+        lignes.append({
+            'fonction': nom if fichier == '~' else f"{_chemin_court(fichier)}:{ligne}({nom})",
+            'appels': appels if appels == appels_primitifs else f"{appels}/{appels_primitifs}",
+            'temps_propre': temps_propre,
+            'temps_cumule': temps_cumule,
+        })
+    return lignes
+
+
+def allocations_par_ligne(instantane, top):
+    """N lignes de code qui retiennent le plus de mémoire: dicts ligne, taille (octets), nombre"""
+    return [
+        {'ligne': f"{_chemin_court(stat.traceback[0].filename)}:{stat.traceback[0].lineno}",
+         'taille': stat.size, 'nombre': stat.count}
+        for stat in instantane.statistics('lineno')[:top]
+    ]
+
+
+def _chemin_court(chemin):
+    """Chemin relatif au projet quand c'est possible (les chemins des bibliothèques restent complets)"""
+    racine = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    return os.path.relpath(chemin, racine) if chemin.startswith(racine + os.sep) else chemin
+
@@ -0,0 +1,400 @@
+import bisect
+import heapq
+import logging
+import random
+import time
+from collections import deque
+
+import numpy as np
+
+from .Structured_data import Operator
+
+logger = logging.getLogger(__name__)
+
+# Amélioration locale du planning produit par la boucle gloutonne.
+#
+# Le planning est vu comme des séquences: l'ordre des tâches sur chaque machine
+# et l'ordre des tâches de chaque opérateur. Avec les précédences des produits,
+# ces séquences forment un graphe; une tâche commence dès que sa machine, son
+# opérateur et sa tâche précédente sont libres. Sa durée dépend de la performance
+# de l'opérateur à ce moment, rejouée avec les mêmes effets d'apprentissage et
+# d'oubli que Operator.mettre_a_jour_performance (à la fin de chaque tâche).
+#
+# Un mouvement (échange ou insertion sur une machine, échange ou réaffectation
+# d'opérateur) ne réévalue que les tâches situées en aval des tâches modifiées:
+# tout ce qui commence avant le point modifié est conservé tel quel.
+
+MOUVEMENTS = ('echange_machine', 'insertion_machine', 'echange_operateurs', 'reaffectation_operateur')
+
+
+class RechercheLocale:
+    """
+    À créer avant l'exécution du contexte (les performances initiales sont relevées
+    ici), puis ameliorer(data) une fois la simulation terminée.
+    """
+
+    def __init__(self, contexte):
+        self.contexte = contexte
+        self.taches = contexte.registre.liste
+        self.operateurs = contexte.operateurs
+        self.temps_depart = contexte.simulation.temps_actuel
+        self.index_operateurs = {op.id: o for o, op in enumerate(self.operateurs)}
+        self.index_machines = {machine.id: m for m, machine in enumerate(contexte.machines)}
+        self.temps_standard = np.array([t.temps_standard for t in self.taches], dtype=float)
+        self.quantite = np.array([t.quantite for t in self.taches], dtype=float)
+        self.cr = np.array([t.cr for t in self.taches], dtype=float)
+        # Performances de départ, vecteurs locaux de chaque opérateur (ordre de op.ids_taches)
+        self.etats_initiaux = [
+            (op.vecteur_performance.copy(), np.full(len(op.ids_taches), np.nan),
+             np.full(len(op.ids_taches), Operator.P_MIN))
+            for op in self.operateurs
+        ]
+
+    # Construction du planning à partir des historiques des machines
+
+    def _charger(self):
+        rang = self.contexte.registre.rang
+        n = len(self.taches)
+        self.operateur = np.full(n, -1, dtype=np.intp)
+        self.machine = np.full(n, -1, dtype=np.intp)
+        debuts = {}
+        for m, machine in enumerate(self.contexte.machines):
+            for tache_id, op_id, debut, _ in machine.historique:
+                k = rang[tache_id]
+                if k in debuts:
+                    continue  # Tâche affectée deux fois: seule la première affectation compte
+                debuts[k] = debut
+                self.operateur[k] = self.index_operateurs[op_id]
+                self.machine[k] = m
+        self.planifiees = np.array(sorted(debuts), dtype=np.intp)
+        # Précédences limitées aux tâches planifiées
+        self.precedente = np.full(n, -1, dtype=np.intp)
+        self.suivantes = [[] for _ in range(n)]
+        for k in self.planifiees.tolist():
+            precedence = self.taches[k].precedence
+            if precedence is not None and not isinstance(precedence, str) and precedence.index in debuts:
+                self.precedente[k] = precedence.index
+                self.suivantes[precedence.index].append(k)
+        # Ordre global: heure de début du glouton, corrigée pour respecter les précédences
+        # (le glouton peut démarrer une tâche avant la fin de sa précédente)
+        ordre = []
+        prets = [(debuts[k], k) for k in self.planifiees.tolist() if self.precedente[k] < 0]
+        heapq.heapify(prets)
+        while prets:
+            _, k = heapq.heappop(prets)
+            ordre.append(k)
+            for s in self.suivantes[k]:
+                heapq.heappush(prets, (debuts[s], s))
+        self.sequences_machines = [[] for _ in self.contexte.machines]
+        self.sequences_operateurs = [[] for _ in self.operateurs]
+        for k in ordre:
+            self.sequences_machines[self.machine[k]].append(k)
+            self.sequences_operateurs[self.operateur[k]].append(k)
+        self.position_machine = np.zeros(n, dtype=np.intp)
+        self.position_operateur = np.zeros(n, dtype=np.intp)
+        for sequence in self.sequences_machines:
+            self._indexer(sequence, self.position_machine)
+        for sequence in self.sequences_operateurs:
+            self._indexer(sequence, self.position_operateur)
+
+    @staticmethod
+    def _indexer(sequence, positions, depuis=0):
+        for i in range(depuis, len(sequence)):
+            positions[sequence[i]] = i
+
+    # Évaluation (complète ou incrémentale)
+
+    def _evaluer_tout(self):
+        n = len(self.taches)
+        self.debut = np.zeros(n)
+        self.fin = np.zeros(n)
+        self.cout = np.zeros(n)
+        self.etats = [None] * n
+        nouveaux = self._evaluer(self.planifiees.tolist())
+        if nouveaux is None:
+            raise ValueError("Planning initial incohérent (cycle entre machines, opérateurs et précédences)")
+        self._appliquer(nouveaux)
+        self.cout_total = float(self.cout[self.planifiees].sum())
+
+    def _predecesseurs(self, k):
+        m, o = self.machine[k], self.operateur[k]
+        i, j = self.position_machine[k], self.position_operateur[k]
+        return (
+            self.sequences_machines[m][i - 1] if i > 0 else -1,
+            self.sequences_operateurs[o][j - 1] if j > 0 else -1,
+            self.precedente[k],
+        )
+
+    def _successeurs(self, k):
+        m, o = self.machine[k], self.operateur[k]
+        i, j = self.position_machine[k], self.position_operateur[k]
+        if i + 1 < len(self.sequences_machines[m]):
+            yield self.sequences_machines[m][i + 1]
+        if j + 1 < len(self.sequences_operateurs[o]):
+            yield self.sequences_operateurs[o][j + 1]
+        yield from self.suivantes[k]
+
+    def _evaluer(self, modifiees):
+        """
+        Recalcule les tâches modifiées et toutes celles en aval.
+        Retourne {tache: (debut, fin, cout, etat)}, ou None si le graphe a un cycle.
+        """
+        # 1. Tâches en aval des modifications
+        concernees = set(modifiees)
+        a_visiter = deque(modifiees)
+        while a_visiter:
+            for s in self._successeurs(a_visiter.popleft()):
+                if s not in concernees:
+                    concernees.add(s)
+                    a_visiter.append(s)
+        # 2. Ordre topologique restreint aux tâches concernées
+        entrants = {k: 0 for k in concernees}
+        for k in concernees:
+            for s in self._successeurs(k):
+                entrants[s] += 1
+        prets = deque(k for k, d in entrants.items() if d == 0)
+        nouveaux = {}
+        while prets:
+            k = prets.popleft()
+            nouveaux[k] = self._evaluer_tache(k, nouveaux)
+            for s in self._successeurs(k):
+                entrants[s] -= 1
+                if entrants[s] == 0:
+                    prets.append(s)
+        if len(nouveaux) < len(concernees):
+            return None
+        return nouveaux
+
+    def _evaluer_tache(self, k, nouveaux):
+        debut = self.temps_depart
+        precedente_operateur = -1
+        for rang, p in enumerate(self._predecesseurs(k)):
+            if p < 0:
+                continue
+            fin_p = nouveaux[p][1] if p in nouveaux else self.fin[p]
+            debut = max(debut, fin_p)
+            if rang == 1:
+                precedente_operateur = p
+        o = self.operateur[k]
+        if precedente_operateur < 0:
+            etat = self.etats_initiaux[o]
+        else:
+            etat = nouveaux[precedente_operateur][3] if precedente_operateur in nouveaux else self.etats[precedente_operateur]
+        operateur = self.operateurs[o]
+        i = operateur.index_taches[self.taches[k].id]
+        performance = etat[0][i]
+        temps_standard = self.temps_standard[k]
+        temps_unitaire = (temps_standard + temps_standard * (1 - performance)) * self.taches[k].facteur_duree
+        fin = debut + temps_unitaire * self.quantite[k]
+        cout = (-temps_unitaire + temps_standard) * self.quantite[k] * self.cr[k]
+        return debut, fin, cout, self._etat_apres(operateur, etat, i, fin, self.taches[k].nembre_repition)
+
+    @staticmethod
+    def _etat_apres(operateur, etat, i, temps, repetitions):
+        """Même règle que Operator.mettre_a_jour_performance, à la fin de la tâche i (indice local)"""
+        performance, derniere_execution, derniere_performance = etat
+        duree_jours = np.where(np.isnan(derniere_execution), temps / (60 * 8), (temps - derniere_execution) / (60 * 8))
+        duree_jours[i] = 0
+        interruptions = np.maximum(0, duree_jours - 1)
+        nouvelle = performance.copy()
+        apprentissage = np.zeros(performance.size, dtype=bool)
+        apprentissage[i] = repetitions > 0
+        if apprentissage[i]:
+            nouvelle[i] = Operator.P_MAX
+        oubli = ~apprentissage & (interruptions > 0)
+        if oubli.any():
+            nouvelle[oubli] = operateur.calculer_effet_oubli_vectoriel(
+                interruptions[oubli], derniere_performance[oubli], Operator.P_MIN, operateur.learning_params['FC'], 0.1)
+        np.clip(nouvelle, Operator.P_MIN, Operator.P_MAX, out=nouvelle, where=apprentissage | oubli)
+        derniere_execution = derniere_execution.copy()
+        derniere_performance = derniere_performance.copy()
+        derniere_execution[i] = temps
+        derniere_performance[i] = performance[i]
+        return nouvelle, derniere_execution, derniere_performance
+
+    def _objectif(self, nouveaux):
+        """(makespan, -cout_total) si les nouveaux temps étaient appliqués: à minimiser"""
+        fins = self.fin[self.planifiees]
+        taches = np.fromiter(nouveaux, dtype=np.intp, count=len(nouveaux))
+        valeurs = np.array([v[1] for v in nouveaux.values()])
+        masque = np.isin(self.planifiees, taches, assume_unique=True)
+        makespan = max(float(fins[~masque].max()) if (~masque).any() else 0.0, float(valeurs.max()))
+        cout_total = self.cout_total - float(self.cout[taches].sum()) + sum(v[2] for v in nouveaux.values())
+        return makespan, -cout_total
+
+    def _appliquer(self, nouveaux):
+        for k, (debut, fin, cout, etat) in nouveaux.items():
+            self.debut[k], self.fin[k], self.cout[k], self.etats[k] = debut, fin, cout, etat
+
+    # Mouvements: chacun modifie les séquences et retourne (tâches modifiées, annulation)
+
+    def _echange_machine(self, rng):
+        sequences = [s for s in self.sequences_machines if len(s) > 1]
+        if not sequences:
+            return None
+        sequence = rng.choice(sequences)
+        i = rng.randrange(len(sequence) - 1)
+        return self._deplacer_sur_machine(sequence, i, i + 1)
+
+    def _insertion_machine(self, rng):
+        sequences = [s for s in self.sequences_machines if len(s) > 2]
+        if not sequences:
+            return None
+        sequence = rng.choice(sequences)
+        i, j = rng.sample(range(len(sequence)), 2)
+        return self._deplacer_sur_machine(sequence, i, j)
+
+    def _deplacer_sur_machine(self, sequence, i, j):
+        sequence.insert(j, sequence.pop(i))
+        debut, fin = min(i, j), min(max(i, j) + 2, len(sequence))
+        self._indexer(sequence, self.position_machine, debut)
+
+        def annuler():
+            sequence.insert(i, sequence.pop(j))
+            self._indexer(sequence, self.position_machine, debut)
+        return sequence[debut:fin], annuler
+
+    def _eligible(self, o, k):
+        """Même seuil que Ordonnanceur._tache_eligible, sur la performance de départ"""
+        i = self.operateurs[o].index_taches.get(self.taches[k].id)
+        return i is not None and self.etats_initiaux[o][0][i] >= 0.2
+
+    def _echange_operateurs(self, rng):
+        k1, k2 = rng.sample(self.planifiees.tolist(), 2)
+        a, b = self.operateur[k1], self.operateur[k2]
+        if a == b or not (self._eligible(b, k1) and self._eligible(a, k2)):
+            return None
+        i, j = self.position_operateur[k1], self.position_operateur[k2]
+        sequence_a, sequence_b = self.sequences_operateurs[a], self.sequences_operateurs[b]
+
+        def echanger(x, y):
+            sequence_a[i], sequence_b[j] = x, y
+            self.operateur[x], self.operateur[y] = a, b
+            self.position_operateur[x], self.position_operateur[y] = i, j
+        echanger(k2, k1)
+        modifiees = [k1, k2] + sequence_a[i + 1:i + 2] + sequence_b[j + 1:j + 2]
+        return modifiees, lambda: echanger(k1, k2)
+
+    def _reaffectation_operateur(self, rng):
+        k = int(rng.choice(self.planifiees.tolist()))
+        a = self.operateur[k]
+        b = rng.randrange(len(self.operateurs))
+        if a == b or not self._eligible(b, k):
+            return None
+        sequence_a, sequence_b = self.sequences_operateurs[a], self.sequences_operateurs[b]
+        i = self.position_operateur[k]
+        sequence_a.pop(i)
+        # Nouvelle place chez b: selon l'heure de début actuelle
+        j = bisect.bisect([self.debut[x] for x in sequence_b], self.debut[k])
+        sequence_b.insert(j, k)
+        self.operateur[k] = b
+        self._indexer(sequence_a, self.position_operateur, i)
+        self._indexer(sequence_b, self.position_operateur, j)
+        modifiees = [k] + sequence_a[i:i + 1] + sequence_b[j + 1:j + 2]
+
+        def annuler():
+            sequence_b.pop(j)
+            sequence_a.insert(i, k)
+            self.operateur[k] = a
+            self._indexer(sequence_a, self.position_operateur, i)
+            self._indexer(sequence_b, self.position_operateur, j)
+        return modifiees, annuler
+
+    # Recherche
+
+    def ameliorer(self, data, budget_secondes=5.0, graine=0, mouvements=MOUVEMENTS):
+        """
+        Applique la recherche locale au planning de data (résultat de get_data).
+
+        Les mouvements sont tirés au hasard et gardés s'ils réduisent le makespan, ou
+        le coût à makespan égal, jusqu'à épuisement du budget. data['gantt'],
+        le makespan et le coût sont remplacés par ceux du planning amélioré s'il fait
+        au moins aussi bien que le glouton; data['performances']['amelioration']
+        résume les gains par rapport au glouton et au planning initial réévalué.
+        """
+        debut_recherche = time.monotonic()
+        rng = random.Random(graine)
+        self._charger()
+        glouton = {'makespan': data['performances']['makespan'], 'cout_total': data['performances']['cout_total']}
+        if len(self.planifiees) < 2:
+            data['performances']['amelioration'] = {'glouton': glouton, 'ameliore': glouton, 'applique': False}
+            return data
+        self._evaluer_tout()
+        initial = self._resume()
+        makespan, moins_cout = float(self.fin[self.planifiees].max()), -self.cout_total
+        tirages = {nom: getattr(self, '_' + nom) for nom in mouvements}
+        evalues = acceptes = 0
+        echeance = debut_recherche + budget_secondes
+        while time.monotonic() < echeance:
+            mouvement = tirages[rng.choice(list(tirages))](rng)
+            if mouvement is None:
+                continue
+            modifiees, annuler = mouvement
+            evalues += 1
+            nouveaux = self._evaluer(modifiees)
+            if nouveaux is not None:
+                candidat = self._objectif(nouveaux)
+                if candidat < (makespan, moins_cout):
+                    self._appliquer(nouveaux)
+                    self.cout_total = -candidat[1]
+                    makespan, moins_cout = candidat
+                    acceptes += 1
+                    continue
+            annuler()
+
+        # Recalcul complet pour éviter la dérive des sommes incrémentales
+        self._evaluer_tout()
+        ameliore = self._resume()
+        # Le glouton peut chevaucher des tâches sur une machine ou devancer une précédence:
+        # ses chiffres sont optimistes. Le planning amélioré ne le remplace que s'il fait au moins aussi bien.
+        applique = (ameliore['makespan'], -ameliore['cout_total']) <= (glouton['makespan'], -glouton['cout_total'])
+        if applique:
+            data['gantt'] = self._gantt()
+            data['performances']['makespan'] = ameliore['makespan']
+            data['performances']['cout_total'] = ameliore['cout_total']
+        data['performances']['amelioration'] = {
+            'glouton': glouton,
+            'initial': initial,  # Planning glouton rendu réalisable et réévalué par le modèle
+            'ameliore': ameliore,
+            'applique': applique,
+            'gain_makespan': glouton['makespan'] - ameliore['makespan'],
+            'gain_cout': ameliore['cout_total'] - glouton['cout_total'],
+            'gain_makespan_initial': initial['makespan'] - ameliore['makespan'],
+            'gain_cout_initial': ameliore['cout_total'] - initial['cout_total'],
+            'mouvements_evalues': evalues,
+            'mouvements_acceptes': acceptes,
+            'duree': time.monotonic() - debut_recherche,
+        }
+        logger.info("Recherche locale: makespan %.3f -> %.3f (glouton %.3f), %d/%d mouvements acceptés",
+                    initial['makespan'], ameliore['makespan'], glouton['makespan'], acceptes, evalues)
+        return data
+
+    def _resume(self):
+        return {'makespan': float(self.fin[self.planifiees].max()) / 480, 'cout_total': self.cout_total}
+
+    def _gantt(self):
+        machines, taches = self.contexte.machines, self.taches
+        operateurs_data, machines_data = [], []
+        for o, op in enumerate(self.operateurs):
+            for k in self.sequences_operateurs[o]:
+                operateurs_data.append({
+                    'Type': 'Opérateur',
+                    'ID': f"Op{op.id}",
+                    'Tâche': taches[k].id,
+                    'Début (heures)': self.debut[k] / 60,
+                    'Fin (heures)': self.fin[k] / 60,
+                    'Durée (heures)': (self.fin[k] - self.debut[k]) / 60,
+                    'Machine': machines[self.machine[k]].id
+                })
+        for m, machine in enumerate(machines):
+            for k in self.sequences_machines[m]:
+                machines_data.append({
+                    'Type': 'Machine',
+                    'ID': f"Mach{machine.id}",
+                    'Tâche': taches[k].id,
+                    'Début (heures)': self.debut[k] / 60,
+                    'Fin (heures)': self.fin[k] / 60,
+                    'Durée (heures)': (self.fin[k] - self.debut[k]) / 60,
+                    'Opérateur': self.operateurs[self.operateur[k]].id
+                })
+        return {'operateurs': operateurs_data, 'machines': machines_data}
@@ -0,0 +1,246 @@
+import heapq
+import logging
+import pickle
+
+from .fonctions import boucle_principale, get_data
+from .principal_prog import affecter_taches_initiales
+from .Structured_data import DEBUT_TACHE, FIN_TACHE
+
+logger = logging.getLogger(__name__)
+
+# Instantanés de simulation et replanification en cours de poste.
+#
+# simuler_jusqua() arrête la boucle d'événements à un instant t et fige tout le
+# contexte (file d'événements, tâches terminées, files des machines, performances
+# et historiques des opérateurs) dans un Instantane. reprendre() termine la
+# simulation telle quelle, avec le même résultat qu'une exécution d'un seul tenant.
+# replanifier() ne simule que la suite, après avoir appliqué des perturbations à t:
+#
+# - les tâches affectées mais pas encore commencées sont libérées et remises en jeu;
+# - les tâches en cours continuent, sauf celles d'un opérateur absent (reprises
+#   depuis le début par un autre) et celles d'une machine en panne (terminées
+#   après la réparation);
+# - chaque opérateur présent et sans tâche reçoit une nouvelle affectation à t.
+#
+# Seul le moteur 'objet' sait reprendre une simulation.
+
+DEBUT = DEBUT_TACHE
+FIN = FIN_TACHE
+
+
+class Instantane:
+    """État complet d'une simulation à l'instant temps, sérialisé par pickle"""
+
+    def __init__(self, contexte, operateurs):
+        self.temps = contexte.simulation.temps_actuel
+        self.ordre_operateurs = [op.id for op in operateurs]  # Ordre de get_data
+        simulation = contexte.simulation
+        trace, simulation.trace = simulation.trace, None  # Fichier ouvert: non sérialisable
+        try:
+            self.donnees = pickle.dumps(contexte, protocol=pickle.HIGHEST_PROTOCOL)
+        finally:
+            simulation.trace = trace
+
+    def restaurer(self):
+        """Nouveau contexte identique à celui capturé et ses opérateurs ordonnés (l'instantané reste réutilisable)"""
+        contexte = pickle.loads(self.donnees)
+        par_id = {op.id: op for op in contexte.operateurs}
+        return contexte, [par_id[op_id] for op_id in self.ordre_operateurs]
+
+
+class PanneMachine:
+    """Machine arrêtée pendant duree minutes: sa tâche en cours se termine d'autant plus tard"""
+
+    def __init__(self, machine_id, duree):
+        if duree <= 0:
+            raise ValueError(f"La durée de panne doit être positive: {duree}")
+        self.machine_id = machine_id
+        self.duree = duree
+
+    def appliquer(self, contexte):
+        machine = _trouver(contexte.machines, self.machine_id, 'Machine')
+        simulation = contexte.simulation
+        machine.indisponible_jusqua = max(machine.indisponible_jusqua, simulation.temps_actuel + self.duree)
+        taches = contexte.registre.liste
+        en_cours = {
+            tache_index for _, _, code, tache_index, _ in simulation.evenements
+            if code == FIN and taches[tache_index].machine_requise is machine
+        }
+        if en_cours:
+            simulation.evenements = [
+                (temps + self.duree, *reste) if reste[2] in en_cours else (temps, *reste)
+                for temps, *reste in simulation.evenements
+            ]
+            heapq.heapify(simulation.evenements)
+            for tache_index in en_cours:
+                _decaler_fin(taches[tache_index], self.duree)
+        _recalculer_libre_a(machine)
+
+    def __repr__(self):
+        return f"PanneMachine({self.machine_id!r}, {self.duree})"
+
+
+class AbsenceOperateur:
+    """Opérateur absent jusqu'à la fin de la simulation: sa tâche en cours est reprise par un autre"""
+
+    def __init__(self, operateur_id):
+        self.operateur_id = operateur_id
+
+    def appliquer(self, contexte):
+        operateur = _trouver(contexte.operateurs, self.operateur_id, 'Opérateur')
+        contexte.operateurs_absents.add(operateur.id)
+        taches = contexte.registre.liste
+        _liberer_taches(contexte, [
+            taches[tache_index] for _, _, code, tache_index, op_index in contexte.simulation.evenements
+            if code == FIN and op_index == operateur.index
+        ])
+
+    def __repr__(self):
+        return f"AbsenceOperateur({self.operateur_id!r})"
+
+
+class ChangementQuantite:
+    """Nouvelle quantité d'un produit, appliquée à ses tâches pas encore commencées"""
+
+    def __init__(self, produit_id, quantite):
+        if quantite <= 0:
+            raise ValueError("La quantité doit être positive.")
+        self.produit_id = produit_id
+        self.quantite = quantite
+
+    def appliquer(self, contexte):
+        produit = _trouver(contexte.produits, self.produit_id, 'Produit')
+        produit.quantity = produit.nembre_repition = self.quantite
+        for tache in contexte.registre.taches_du_produit(produit.id):
+            if tache.quantite_restante > 0:
+                tache.quantite = tache.quantite_restante = tache.nembre_repition = self.quantite
+
+    def __repr__(self):
+        return f"ChangementQuantite({self.produit_id!r}, {self.quantite})"
+
+
+def simuler_jusqua(contexte, temps, ordre_operateurs=None):
+    """
+    Exécute le contexte jusqu'à l'instant temps (minutes) et retourne son Instantane,
+    None si aucune tâche initiale n'a pu être affectée
+    """
+    operateurs = affecter_taches_initiales(contexte, ordre_operateurs)
+    if operateurs is None:
+        return None
+    boucle_principale(contexte, temps_arret=temps)
+    return Instantane(contexte, operateurs)
+
+
+def reprendre(instantane):
+    """Termine la simulation à partir de l'instantané, sans perturbation"""
+    contexte, operateurs = instantane.restaurer()
+    boucle_principale(contexte)
+    return get_data(contexte, operateurs)
+
+
+def replanifier(instantane, *perturbations):
+    """
+    Replanifie la suite de la simulation à partir de l'instantané
+
+    perturbations: PanneMachine, AbsenceOperateur, ChangementQuantite, appliquées dans
+        l'ordre donné à l'instant de l'instantané
+    Retourne les résultats comme get_data, avec data['performances']['replanification'].
+    """
+    contexte, operateurs = instantane.restaurer()
+    simulation = contexte.simulation
+    taches = contexte.registre.liste
+    liberees = [taches[tache_index] for _, _, code, tache_index, _ in simulation.evenements if code == DEBUT]
+    _liberer_taches(contexte, liberees)
+    for perturbation in perturbations:
+        perturbation.appliquer(contexte)
+    _redistribuer(contexte, operateurs)
+    logger.info("Replanification à t=%s: %d tâches libérées, perturbations %s",
+                instantane.temps, len(liberees), list(perturbations))
+    boucle_principale(contexte)
+    data = get_data(contexte, operateurs)
+    data['performances']['replanification'] = {
+        'temps': instantane.temps,
+        'perturbations': [repr(perturbation) for perturbation in perturbations],
+        'taches_non_terminees': [tache.id for tache in taches if tache not in simulation.termines],
+    }
+    return data
+
+
+def _trouver(objets, objet_id, nature):
+    for objet in objets:
+        if objet.id == objet_id:
+            return objet
+    raise ValueError(f"Identifiant inconnu ({nature}): {objet_id}")
+
+
+def _liberer_taches(contexte, taches):
+    """Annule l'affectation de tâches non terminées et les remet parmi les tâches à faire"""
+    if not taches:
+        return
+    simulation = contexte.simulation
+    ordonnanceur = contexte.ordonnanceur
+    indices = {tache.index for tache in taches}
+    simulation.evenements = [evenement for evenement in simulation.evenements if evenement[3] not in indices]
+    heapq.heapify(simulation.evenements)
+    machines = set()
+    for tache in taches:
+        operateur = tache.operateur_affecte
+        machine = tache.machine_requise
+        machines.add(machine)
+        for i in range(len(operateur.historique_travail) - 1, -1, -1):
+            tache_id, debut, fin = operateur.historique_travail[i]
+            if tache_id == tache.id:
+                del operateur.historique_travail[i]
+                ordonnanceur.ajouter_temps_travail(operateur, -(fin - debut))
+                break
+        for ordre, tache_id in list(operateur.taches_affectees.items()):
+            if tache_id == tache.id:
+                del operateur.taches_affectees[ordre]
+        machine.historique = [entree for entree in machine.historique if entree[0] != tache.id]
+        if tache in machine.tache_en_attente:
+            machine.tache_en_attente.remove(tache)
+        if machine.tache_actuelle is tache:
+            machine.tache_actuelle = None
+        tache.operateur_affecte = None
+        tache.est_en_cours = False
+        tache.quantite_restante = tache.quantite
+        tache.temps_attente = 0
+        tache.temps_debut = None
+        tache.temps_fin = 0
+        tache.temps_reel = 0
+        tache.facteur_duree = 1.0
+        ordonnanceur.remettre_en_jeu(tache, simulation)
+    for machine in machines:
+        _recalculer_libre_a(machine)
+
+
+def _decaler_fin(tache, duree):
+    """Repousse la fin d'une tâche en cours dans son état et les historiques"""
+    tache.temps_fin += duree
+    operateur = tache.operateur_affecte
+    machine = tache.machine_requise
+    for i, (tache_id, debut, fin) in enumerate(operateur.historique_travail):
+        if tache_id == tache.id:
+            operateur.historique_travail[i] = (tache_id, debut, fin + duree)
+    for i, (tache_id, op_id, debut, fin) in enumerate(machine.historique):
+        if tache_id == tache.id:
+            machine.historique[i] = (tache_id, op_id, debut, fin + duree)
+
+
+def _recalculer_libre_a(machine):
+    """libre_a d'après les tâches restant sur la machine et sa panne éventuelle"""
+    fin = max((fin for _, _, _, fin in machine.historique), default=0)
+    machine.definir_libre_a(max(fin, machine.indisponible_jusqua))
+
+
+def _redistribuer(contexte, operateurs):
+    """Affecte une tâche, à l'instant courant, à chaque opérateur présent qui n'en a plus"""
+    simulation = contexte.simulation
+    ordonnanceur = contexte.ordonnanceur
+    occupes = {op_index for _, _, code, _, op_index in simulation.evenements if code == FIN}
+    for operateur in operateurs:
+        if operateur.index in occupes or operateur.id in contexte.operateurs_absents:
+            continue
+        tache = ordonnanceur.choisir_tache(operateur=operateur, simulation=simulation, tache_finie=None)
+        if tache and not ordonnanceur.affecter_tache(operateur=operateur, tache=tache, simulation=simulation):
+            logger.warning("Échec d'affectation pour %s", operateur.id)
@@ -0,0 +1,71 @@
+import json
+import struct
+
+# Trace binaire compacte d'une simulation, pour le débogage.
+#
+# Format du fichier:
+#   - en-tête: MAGIC, version (uint16), longueur (uint32) puis un JSON
+#     {"taches": [id, ...], "operateurs": [id, ...]} qui donne les index
+#   - enregistrements de taille fixe: temps (float64), type (uint8),
+#     index de tâche (int32), index d'opérateur (int32, -1 si aucun)
+
+MAGIC = b'PLTR'
+VERSION = 1
+ENTETE = struct.Struct('<4sHI')
+ENREGISTREMENT = struct.Struct('<dBii')
+
+AFFECTATION = 0
+DEBUT_TACHE = 1
+FIN_TACHE = 2
+TYPES = {AFFECTATION: 'AFFECTATION', DEBUT_TACHE: 'DEBUT_TACHE', FIN_TACHE: 'FIN_TACHE'}
+CODES = {nom: code for code, nom in TYPES.items()}
+
+
+class TraceBinaire:
+    """Écrit les événements d'une simulation dans un fichier binaire (voir lire_trace)"""
+
+    def __init__(self, chemin, contexte):
+        self.chemin = chemin
+        self.index_taches = {tache.id: i for i, tache in enumerate(contexte.taches)}
+        self.index_operateurs = {op.id: i for i, op in enumerate(contexte.operateurs)}
+        self.nombre = 0
+        self._fichier = open(chemin, 'wb')
+        entete = json.dumps({
+            'taches': [tache.id for tache in contexte.taches],
+            'operateurs': [op.id for op in contexte.operateurs],
+        }).encode('utf-8')
+        self._fichier.write(ENTETE.pack(MAGIC, VERSION, len(entete)))
+        self._fichier.write(entete)
+
+    def enregistrer(self, type_evenement, temps, tache, operateur=None):
+        """type_evenement: AFFECTATION, DEBUT_TACHE, FIN_TACHE ou leur nom"""
+        code = CODES.get(type_evenement, type_evenement)
+        op_index = self.index_operateurs[operateur.id] if operateur is not None else -1
+        self._fichier.write(ENREGISTREMENT.pack(temps, code, self.index_taches[tache.id], op_index))
+        self.nombre += 1
+
+    def fermer(self):
+        if not self._fichier.closed:
+            self._fichier.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fermer()
+
+
+def lire_trace(chemin):
+    """Relit une trace binaire: génère des tuples (temps, type, tache_id, operateur_id)"""
+    with open(chemin, 'rb') as fichier:
+        magic, version, longueur = ENTETE.unpack(fichier.read(ENTETE.size))
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"Fichier de trace invalide: {chemin}")
+        entete = json.loads(fichier.read(longueur).decode('utf-8'))
+        taches, operateurs = entete['taches'], entete['operateurs']
+        while True:
+            bloc = fichier.read(ENREGISTREMENT.size)
+            if len(bloc) < ENREGISTREMENT.size:
+                break
+            temps, code, tache_index, op_index = ENREGISTREMENT.unpack(bloc)
+            yield temps, TYPES[code], taches[tache_index], operateurs[op_index] if op_index >= 0 else None
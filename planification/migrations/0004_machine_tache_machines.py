@@ -0,0 +1,33 @@
+# Generated by Django 5.2.4 on 2026-10-18 10:25
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('planification', '0003_alter_tache_unique_together_alter_tache_id_tache_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Machine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('id_machine', models.CharField(max_length=50)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='machines', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['id_machine'],
+                'unique_together': {('user', 'id_machine')},
+            },
+        ),
+        migrations.AddField(
+            model_name='tache',
+            name='machines',
+            field=models.ManyToManyField(blank=True, related_name='taches', to='planification.machine'),
+        ),
+    ]
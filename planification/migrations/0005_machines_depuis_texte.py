@@ -0,0 +1,42 @@
+# Generated by Django 5.2.4 on 2026-10-18 10:25
+
+from django.db import migrations
+
+
+def identifiants(texte):
+    """Copie de Machine.identifiants: une migration ne doit pas dépendre du code courant des modèles"""
+    return list(dict.fromkeys(m.strip() for m in (texte or '').split(',') if m.strip()))
+
+
+def machines_depuis_texte(apps, schema_editor):
+    """Crée les Machine de chaque utilisateur et les relations depuis les chaînes Tache.machine"""
+    Machine = apps.get_model('planification', 'Machine')
+    Tache = apps.get_model('planification', 'Tache')
+    machines = {}  # {(user_id, id_machine): Machine}
+    for tache in Tache.objects.select_related('produit').iterator():
+        user_id = tache.produit.user_id
+        liees = []
+        for identifiant in identifiants(tache.machine):
+            cle = (user_id, identifiant)
+            if cle not in machines:
+                machines[cle], _ = Machine.objects.get_or_create(user_id=user_id, id_machine=identifiant)
+            liees.append(machines[cle])
+        tache.machines.set(liees)
+
+
+def texte_depuis_machines(apps, schema_editor):
+    Tache = apps.get_model('planification', 'Tache')
+    for tache in Tache.objects.prefetch_related('machines').iterator(chunk_size=500):
+        tache.machine = ",".join(machine.id_machine for machine in tache.machines.all())
+        tache.save(update_fields=['machine'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('planification', '0004_machine_tache_machines'),
+    ]
+
+    operations = [
+        migrations.RunPython(machines_depuis_texte, texte_depuis_machines),
+    ]
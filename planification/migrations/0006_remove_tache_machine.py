@@ -0,0 +1,23 @@
+# Generated by Django 5.2.4 on 2026-10-18 10:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('planification', '0005_machines_depuis_texte'),
+    ]
+
+    operations = [
+        # Défaut vide: en sens inverse, la colonne est recréée puis remplie par 0005
+        migrations.AlterField(
+            model_name='tache',
+            name='machine',
+            field=models.TextField(default=''),
+        ),
+        migrations.RemoveField(
+            model_name='tache',
+            name='machine',
+        ),
+    ]
@@ -9,11 +9,27 @@ class Produit(models.Model):
     def __str__(self):
         return f"{self.id_produit} - CR: {self.cr}"
 
+class Machine(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='machines')
+    id_machine = models.CharField(max_length=50)
+
+    class Meta:
+        ordering = ['id_machine']
+        unique_together = ('user', 'id_machine')  # Index (user, id_machine) des recherches par utilisateur
+
+    def __str__(self):
+        return self.id_machine
+
+    @staticmethod
+    def identifiants(texte):
+        """Identifiants d'une liste séparée par des virgules ("M1, M2"), sans vides ni doublons"""
+        return list(dict.fromkeys(m.strip() for m in texte.split(',') if m.strip()))
+
 class Tache(models.Model):
     produit = models.ForeignKey(Produit, on_delete=models.CASCADE, related_name='taches') 
     id_tache = models.CharField(max_length=50, unique=True)  
     description = models.CharField(max_length=200)
-    machine = models.TextField() 
+    machines = models.ManyToManyField(Machine, related_name='taches', blank=True)
     temps_standard = models.FloatField()
     ordre = models.PositiveIntegerField(
         verbose_name="Ordre/Phase",
@@ -26,6 +42,11 @@ class Tache(models.Model):
     def __str__(self):
         return f"{self.produit.id_produit}.{self.id_tache} - {self.description}"
 
+    @property
+    def liste_machines(self):
+        """Machines compatibles au format de saisie, "M1,M2" (utiliser prefetch_related('machines'))"""
+        return ",".join(machine.id_machine for machine in self.machines.all())
+
 class Operateur(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='operateurs',default=1)
     id_operateur = models.CharField(max_length=50, unique=True)
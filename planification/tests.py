@@ -1,3 +1,769 @@
-from django.test import TestCase
+import json
+import logging
+import math
+import os
+import pstats
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
 
-# Create your tests here.
+import numpy as np
+from django.contrib.auth.models import AnonymousUser, User
+from django.db import connection
+from django.test import RequestFactory, SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+
+from . import views
+from .forms import TacheForm
+from .logique.exploration import (
+    balayer_poids, front_pareto, grille_poids, optimiser_poids, rechercher_ordre_operateurs, repliquer,
+)
+from .logique.generateur import generer_plan_synthetique
+from .logique.instrumentation import Mesures
+from .logique.metriques import METRIQUES, Metriques
+from .logique.profilage import profiler_simulation
+from .logique.principal_prog import (
+    construire_contexte, demarrer_simulation, executer_simulation, executer_simulation_tableaux, generer_structure_donnees,
+    initialiser_systeme,
+)
+from .logique.replanification import (
+    AbsenceOperateur, ChangementQuantite, PanneMachine, replanifier, reprendre, simuler_jusqua,
+)
+from .logique.Structured_data import CombinationGenerator, FiltreBloom, GroupeMachines, HistoriquePerformance, Machine
+from .logique.trace import lire_trace
+from .models import Machine as ModeleMachine, Produit, Tache
+
+POIDS_TEST = [
+    {'poids_cout': 0.2, 'poids_equite': 0.2, 'poids_makespan': 0.2, 'poids_performance': 0.2, 'poids_penalite_attente': 0.2},
+    {'poids_cout': 0.5, 'poids_equite': 0.1, 'poids_makespan': 0.1, 'poids_performance': 0.2, 'poids_penalite_attente': 0.1},
+    {'poids_cout': 0.1, 'poids_equite': 0.1, 'poids_makespan': 0.5, 'poids_performance': 0.2, 'poids_penalite_attente': 0.1},
+    {'poids_cout': 0.0, 'poids_equite': 0.6, 'poids_makespan': 0.0, 'poids_performance': 0.0, 'poids_penalite_attente': 0.4},
+]
+_NIVEAU_JOURNAL = {}
+
+
+def setUpModule():
+    # Simulations silencieuses: seuls les avertissements du moteur restent visibles
+    journal = logging.getLogger('planification.logique')
+    _NIVEAU_JOURNAL['avant'] = journal.level
+    journal.setLevel(logging.WARNING)
+
+
+def tearDownModule():
+    logging.getLogger('planification.logique').setLevel(_NIVEAU_JOURNAL['avant'])
+
+
+# Références figées de default_example (Gantt, makespan, cout_total) par vecteur de poids, et
+# de plans synthétiques qui figent des comportements précis du moteur (SCENARIOS_SYNTHETIQUES).
+# Après un changement voulu du planning, les régénérer puis relire le diff:
+#   PLANIFICATION_REGENERER_REFERENCES=1 python manage.py test planification.tests.ReferencesTests
+CHEMIN_REFERENCES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'references', 'default_example.json')
+SCENARIOS_REFERENCE = dict(zip(('equilibre', 'cout', 'makespan', 'equite'), POIDS_TEST))
+
+
+def plan_avec_egalites():
+    """
+    Plan synthétique à durées et performances uniformes: la plupart des événements tombent au même instant
+    et l'ordre de traitement des ex aequo (FIFO, par numéro de séquence) fixe le planning
+    """
+    machines, operateurs, produits, precedences = generer_plan_synthetique(
+        nombre_produits=12, taches_par_produit=3, nombre_machines=6, nombre_operateurs=5, graine=4)
+    for produit in produits:
+        produit['Temps_standard'] = dict.fromkeys(produit['Tâches'], 10)
+        produit['Quantité'] = 10
+    for operateur in operateurs.values():
+        operateur['Performance'] = dict.fromkeys(operateur['Performance'], 0.8)
+    return machines, operateurs, produits, precedences
+
+
+# Plans synthétiques figés (poids POIDS_TEST[0]), vérifiés sur les deux moteurs
+SCENARIOS_SYNTHETIQUES = {'synthetique_egalites': plan_avec_egalites}
+MOTEURS_REFERENCE = {'objet': executer_simulation, 'tableaux': executer_simulation_tableaux}
+# Variantes qui doivent toutes rendre exactement le planning de référence
+VARIANTES_REFERENCE = {
+    'objet': {},
+    'vectoriel': {'mode_score': 'vectoriel'},
+    'tableaux': {'moteur': 'tableaux'},
+}
+# Budgets de temps mural (secondes, meilleure de plusieurs exécutions), environ 10× le temps
+# mesuré; PLANIFICATION_FACTEUR_BUDGETS les multiplie sur une machine lente.
+BUDGETS_SECONDES = {
+    'default_example': 0.5,
+    'synthetique_10x': 3.0,
+}
+
+
+def resultat_reference(data):
+    return {
+        'gantt': data['gantt'],
+        'makespan': data['performances']['makespan'],
+        'cout_total': data['performances']['cout_total'],
+    }
+
+
+def meilleur_temps(fonction, repetitions=3):
+    meilleur = float('inf')
+    for _ in range(repetitions):
+        debut = time.perf_counter()
+        fonction()
+        meilleur = min(meilleur, time.perf_counter() - debut)
+    return meilleur
+
+
+class ReferencesTests(SimpleTestCase):
+    """Plannings figés de default_example et budgets de temps: garde-fou des optimisations"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        if os.environ.get('PLANIFICATION_REGENERER_REFERENCES'):
+            references = {nom: resultat_reference(demarrer_simulation(0, poids, None))
+                          for nom, poids in SCENARIOS_REFERENCE.items()}
+            for nom, plan in SCENARIOS_SYNTHETIQUES.items():
+                references[nom] = resultat_reference(executer_simulation(construire_contexte(*plan(), POIDS_TEST[0])))
+            os.makedirs(os.path.dirname(CHEMIN_REFERENCES), exist_ok=True)
+            with open(CHEMIN_REFERENCES, 'w', encoding='utf-8') as fichier:
+                json.dump(references, fichier, indent=1, ensure_ascii=False)
+                fichier.write('\n')
+        with open(CHEMIN_REFERENCES, encoding='utf-8') as fichier:
+            cls.references = json.load(fichier)
+
+    def assertProche(self, attendu, obtenu, chemin='resultat'):
+        """Égalité exacte des structures et des chaînes, à 1e-9 près (relatif) pour les nombres"""
+        if isinstance(attendu, dict):
+            self.assertEqual(sorted(attendu), sorted(obtenu), chemin)
+            for cle in attendu:
+                self.assertProche(attendu[cle], obtenu[cle], f"{chemin}[{cle!r}]")
+        elif isinstance(attendu, list):
+            self.assertEqual(len(attendu), len(obtenu), chemin)
+            for i, (a, b) in enumerate(zip(attendu, obtenu)):
+                self.assertProche(a, b, f"{chemin}[{i}]")
+        elif isinstance(attendu, float):
+            self.assertTrue(math.isclose(attendu, obtenu, rel_tol=1e-9, abs_tol=1e-12),
+                            f"{chemin}: {obtenu} au lieu de {attendu}")
+        else:
+            self.assertEqual(attendu, obtenu, chemin)
+
+    def test_scenarios_couverts(self):
+        self.assertEqual(sorted(self.references), sorted([*SCENARIOS_REFERENCE, *SCENARIOS_SYNTHETIQUES]))
+
+    def test_plannings_de_reference(self):
+        for nom, poids in SCENARIOS_REFERENCE.items():
+            for variante, options in VARIANTES_REFERENCE.items():
+                with self.subTest(scenario=nom, variante=variante):
+                    data = demarrer_simulation(0, poids, None, **options)
+                    # Aller-retour JSON: mêmes types que la référence (tuples -> listes)
+                    self.assertProche(self.references[nom], json.loads(json.dumps(resultat_reference(data))))
+
+    def test_plans_synthetiques_de_reference(self):
+        # Les événements simultanés sont traités dans l'ordre d'insertion: changer ce départage change ces plannings
+        for nom, plan in SCENARIOS_SYNTHETIQUES.items():
+            for moteur, executer in MOTEURS_REFERENCE.items():
+                with self.subTest(scenario=nom, moteur=moteur):
+                    data = executer(construire_contexte(*plan(), POIDS_TEST[0]))
+                    self.assertProche(self.references[nom], json.loads(json.dumps(resultat_reference(data))))
+
+    def test_budgets_de_temps(self):
+        facteur = float(os.environ.get('PLANIFICATION_FACTEUR_BUDGETS', 1))
+        plan = generer_plan_synthetique(nombre_produits=80, taches_par_produit=4, nombre_machines=50,
+                                        nombre_operateurs=16, graine=0)
+        scenarios = {
+            'default_example': lambda: demarrer_simulation(0, POIDS_TEST[0], None),
+            'synthetique_10x': lambda: executer_simulation(construire_contexte(*plan, POIDS_TEST[0])),
+        }
+        self.assertEqual(sorted(scenarios), sorted(BUDGETS_SECONDES))
+        for nom, scenario in scenarios.items():
+            with self.subTest(scenario=nom):
+                duree = meilleur_temps(scenario)
+                budget = BUDGETS_SECONDES[nom] * facteur
+                self.assertLess(duree, budget, f"{nom}: {duree:.3f} s pour un budget de {budget:.3f} s")
+
+
+class ScoreVectorielTests(SimpleTestCase):
+    """Le mode 'vectoriel' doit faire exactement les mêmes choix que le mode 'scalaire'"""
+
+    def test_scores_identiques_au_depart(self):
+        contexte = initialiser_systeme(0, POIDS_TEST[0], None)
+        simulation, ordonnanceur = contexte.simulation, contexte.ordonnanceur
+        for op in contexte.operateurs:
+            taches = ordonnanceur.taches_disponibles_pour_operateur(op, simulation)
+            attentes = np.zeros(len(taches))
+            scores_lot = ordonnanceur._calculer_scores_lot(op, taches, simulation, attentes)
+            scores = [ordonnanceur._calculer_score(op, tache, simulation, temps_attente=0) for tache in taches]
+            self.assertEqual(list(scores_lot), scores)
+
+    def test_memes_plannings_sur_default_example(self):
+        for poids in POIDS_TEST:
+            with self.subTest(poids=poids):
+                scalaire = demarrer_simulation(0, poids, None, mode_score='scalaire')
+                vectoriel = demarrer_simulation(0, poids, None, mode_score='vectoriel')
+                self.assertEqual(scalaire['gantt'], vectoriel['gantt'])
+                self.assertEqual(scalaire['performances']['makespan'], vectoriel['performances']['makespan'])
+                self.assertEqual(scalaire['performances']['cout_total'], vectoriel['performances']['cout_total'])
+
+    def test_mode_inconnu(self):
+        with self.assertRaises(ValueError):
+            initialiser_systeme(0, POIDS_TEST[0], None, mode_score='inconnu')
+
+
+class PerformanceVectorielleTests(SimpleTestCase):
+    """Les mises à jour vectorielles doivent reproduire les formules scalaires de Operator"""
+
+    def setUp(self):
+        contexte = initialiser_systeme(0, POIDS_TEST[0], None)
+        self.simulation = contexte.simulation
+        self.op = contexte.operateurs[0]
+        self.op.tache_actuellee = self.simulation.registre.tache('T111')
+
+    def test_oubli_identique_au_scalaire(self):
+        rng = np.random.default_rng(0)
+        t = rng.uniform(0.01, 5, 50)
+        p_last = rng.uniform(0.3, 1.15, 50)
+        vecteur = self.op.calculer_effet_oubli_vectoriel(t, p_last, 0.3, 0.45, 0.1)
+        scalaire = [self.op.calculate_forgetting_effect(a, b, 0.3, 0.45, 0.1) for a, b in zip(t, p_last)]
+        np.testing.assert_allclose(vecteur, scalaire, rtol=1e-12)
+
+    def test_interruptions_identiques_au_scalaire(self):
+        self.simulation.temps_actuel = 2000
+        self.op.mettre_a_jour_performance('T123', 500, self.simulation)
+        courante = self.op.index_taches['T111']
+        vecteur = self.op.calculer_interruptions(courante, self.simulation)
+        scalaire = [self.op.calculer_interruption(tache_id, self.simulation) for tache_id in self.op.ids_taches]
+        np.testing.assert_allclose(vecteur, scalaire)
+
+    def test_dictionnaire_synchronise(self):
+        self.simulation.temps_actuel = 3000
+        self.assertTrue(self.op.mettre_a_jour_performance('T111', 3000, self.simulation))
+        self.assertEqual(self.op.performancess['T111'], 1.15)
+        for tache_id, i in self.op.index_taches.items():
+            self.assertEqual(self.op.performancess[tache_id], self.op.vecteur_performance[i])
+
+
+class ChargeOperateursTests(SimpleTestCase):
+    """Les accumulateurs d'équité doivent suivre np.std des temps de travail"""
+
+    def test_dispersion_suit_np_std(self):
+        contexte = initialiser_systeme(0, POIDS_TEST[0], None)
+        operateurs, ordonnanceur = contexte.operateurs, contexte.ordonnanceur
+        for op, duree in zip(operateurs * 3, [120.5, 30, 75.25, 400, 10, 0, 55, 90.5, 12, 300, 7, 64]):
+            ordonnanceur.ajouter_temps_travail(op, duree)
+        temps_travail = [op.temps_travail for op in operateurs]
+        dispersion = ordonnanceur.dispersion_charge()
+        self.assertAlmostEqual(dispersion['ecart_type'], np.std(temps_travail))
+        self.assertAlmostEqual(dispersion['moyenne'], np.mean(temps_travail))
+        self.assertEqual(dispersion['max'], max(temps_travail))
+
+
+class BornesMakespanTests(SimpleTestCase):
+    """Les bornes tenues à jour par opérateur doivent valoir un recalcul complet en fin de simulation"""
+
+    def test_bornes_incrementales(self):
+        for graine in range(3):
+            plan = generer_plan_synthetique(nombre_produits=15, taches_par_produit=4, nombre_machines=6,
+                                            nombre_operateurs=5, graine=graine)
+            for moteur, executer in MOTEURS_REFERENCE.items():
+                with self.subTest(graine=graine, moteur=moteur):
+                    contexte = construire_contexte(*plan, POIDS_TEST[0])
+                    ordonnanceur = contexte.ordonnanceur
+                    depart = ordonnanceur.bornes_makespan
+                    executer(contexte)
+                    self.assertNotEqual(ordonnanceur.bornes_makespan, depart)  # Les performances ont changé
+                    self.assertEqual(ordonnanceur.bornes_makespan,
+                                     ordonnanceur._calculer_bornes_makespan(contexte.produits, contexte.operateurs))
+
+
+class MoteurTableauxTests(SimpleTestCase):
+    """Test différentiel: le moteur en tableaux doit rendre exactement les résultats du moteur objet"""
+
+    def test_meme_gantt_sur_default_example(self):
+        for poids in POIDS_TEST:
+            with self.subTest(poids=poids):
+                objet = demarrer_simulation(0, poids, None, moteur='objet')
+                tableaux = demarrer_simulation(0, poids, None, moteur='tableaux')
+                self.assertEqual(objet['gantt'], tableaux['gantt'])
+                self.assertEqual(objet['performances'], tableaux['performances'])
+
+    def test_memes_resultats_sur_plan_synthetique(self):
+        plan = generer_plan_synthetique(nombre_produits=20, taches_par_produit=5, nombre_machines=8,
+                                        nombre_operateurs=10, graine=1)
+        contexte_objet = construire_contexte(*plan, POIDS_TEST[2])
+        contexte_tableaux = construire_contexte(*plan, POIDS_TEST[2])
+        objet = executer_simulation(contexte_objet)
+        tableaux = executer_simulation_tableaux(contexte_tableaux)
+        self.assertEqual(objet, tableaux)
+        # Mêmes compteurs de travail, suivis par le banc d'essai d'échelle
+        self.assertEqual(contexte_objet.simulation.evenements_traites, contexte_tableaux.simulation.evenements_traites)
+        self.assertEqual(contexte_objet.ordonnanceur.scores_evalues, contexte_tableaux.ordonnanceur.scores_evalues)
+        self.assertGreater(contexte_objet.simulation.evenements_traites, 0)
+
+    def test_moteur_inconnu(self):
+        with self.assertRaises(ValueError):
+            demarrer_simulation(0, POIDS_TEST[0], None, moteur='inconnu')
+
+
+class RoutageMachinesTests(SimpleTestCase):
+    """Tâches à plusieurs machines compatibles: routées vers celle qui se libère le plus tôt"""
+
+    def test_machine_la_plus_tot_libre(self):
+        machines = [Machine(f"M{i}", []) for i in range(1, 4)]
+        groupe = GroupeMachines(machines)
+        self.assertIs(groupe.plus_tot_libre(), machines[0])  # Égalité: la première
+        machines[0].definir_libre_a(50)
+        machines[1].definir_libre_a(30)
+        self.assertIs(groupe.plus_tot_libre(), machines[2])
+        machines[2].definir_libre_a(80)
+        self.assertIs(groupe.plus_tot_libre(), machines[1])
+        for temps in range(100, 200):
+            machines[1].definir_libre_a(temps)
+        self.assertIs(groupe.plus_tot_libre(), machines[0])
+        self.assertLessEqual(len(groupe.tas), 4 * len(machines) + 1)
+
+    def test_routage_dans_les_deux_moteurs(self):
+        plan = generer_plan_synthetique(nombre_produits=20, taches_par_produit=5, nombre_machines=8,
+                                        nombre_operateurs=10, graine=1, taux_multi_machines=0.5)
+        contexte = construire_contexte(*plan, POIDS_TEST[2])
+        objet = executer_simulation(contexte)
+        tableaux = executer_simulation_tableaux(construire_contexte(*plan, POIDS_TEST[2]))
+        self.assertEqual(objet, tableaux)
+        deroutees = [tache for tache in contexte.taches if tache.machine_requise is not tache.machines_compatibles[0]]
+        self.assertTrue(deroutees)
+        self.assertTrue(all(tache.machine_requise in tache.machines_compatibles for tache in contexte.taches))
+
+
+class TachesBloqueesTests(SimpleTestCase):
+    """Les index des tâches non affectées, tenus à jour incrémentalement, restent exacts"""
+
+    def test_index_coherents_en_cours_de_simulation(self):
+        plan = generer_plan_synthetique(nombre_produits=20, taches_par_produit=5, nombre_machines=8,
+                                        nombre_operateurs=10, graine=3, taux_multi_machines=0.3)
+        for temps in (100, 600, 1500):
+            with self.subTest(temps=temps):
+                contexte, _ = simuler_jusqua(construire_contexte(*plan, POIDS_TEST[0]), temps).restaurer()
+                ordonnanceur, termines = contexte.ordonnanceur, contexte.simulation.termines
+                restantes = {tache for tache in contexte.taches if tache.quantite_restante > 0}
+                pretes = {tache for tache in restantes if tache.precedence is None or tache.precedence in termines}
+                attente = {tache for tache in restantes - pretes if tache.precedence.operateur_affecte is not None}
+                for index, attendu in ((ordonnanceur.taches_restantes, restantes),
+                                       (ordonnanceur.taches_pretes, pretes),
+                                       (ordonnanceur.attente_precedence, attente)):
+                    self.assertEqual(set().union(*index.values()), attendu)
+                    self.assertTrue(all(tache.groupe_machines is groupe
+                                        for groupe, taches in index.items() for tache in taches))
+                bloquees = ordonnanceur.taches_non_disponibles(contexte.simulation)
+                self.assertTrue(all(dic['temps_restant'] > 0 for dic in bloquees))
+                self.assertTrue({dic['tache'] for dic in bloquees} <= restantes)
+
+
+class ExplorationPoidsTests(SimpleTestCase):
+
+    def test_grille_sur_le_simplexe(self):
+        grille = grille_poids(0.25)
+        self.assertEqual(len(grille), 70)  # 4 parts réparties entre 5 poids
+        for poids in grille:
+            self.assertAlmostEqual(sum(poids.values()), 1)
+
+    def test_front_pareto(self):
+        resultats = [
+            {'makespan': 5, 'cout_total': -100, 'equite': 10},
+            {'makespan': 6, 'cout_total': -100, 'equite': 10},  # dominé par le premier
+            {'makespan': 7, 'cout_total': -50, 'equite': 10},
+            {'makespan': 5, 'cout_total': -100, 'equite': 3},
+        ]
+        self.assertEqual(front_pareto(resultats), [resultats[2], resultats[3]])
+
+    def test_balayage_parallele(self):
+        resultats = list(balayer_poids(POIDS_TEST, 0, None, max_workers=2))
+        attendus = [demarrer_simulation(0, poids, None) for poids in POIDS_TEST]
+        self.assertEqual(len(resultats), len(POIDS_TEST))
+        for poids, data in zip(POIDS_TEST, attendus):
+            resultat = next(r for r in resultats if r['poids'] == poids)
+            self.assertEqual(resultat['makespan'], data['performances']['makespan'])
+            self.assertEqual(resultat['cout_total'], data['performances']['cout_total'])
+
+    def test_balayage_interrompu(self):
+        # Client déconnecté: fermer le générateur annule les simulations en attente au lieu de les attendre
+        balayage = balayer_poids(grille_poids(0.125), 0, None, max_workers=2)  # 495 simulations, plusieurs secondes
+        next(balayage)
+        debut = time.perf_counter()
+        balayage.close()
+        self.assertLess(time.perf_counter() - debut, 1.0)
+
+
+class MonteCarloTests(SimpleTestCase):
+
+    def test_sans_bruit_toutes_les_replications_sont_identiques(self):
+        attendu = demarrer_simulation(0, POIDS_TEST[0], None)['performances']['makespan']
+        resultat = repliquer(POIDS_TEST[0], 0, None, bruit_durees=0.0, replications_max=4, max_workers=1)
+        self.assertEqual(resultat['replications'], 4)
+        self.assertEqual(resultat['makespan']['p5'], attendu)
+        self.assertEqual(resultat['makespan']['p95'], attendu)
+
+    def test_reproductible_quel_que_soit_le_nombre_de_workers(self):
+        seul = repliquer(POIDS_TEST[1], 0, None, bruit_durees=0.2, replications_max=6, max_workers=1, graine=3)
+        pool = repliquer(POIDS_TEST[1], 0, None, bruit_durees=0.2, replications_max=6, max_workers=3, graine=3)
+        tableaux = repliquer(POIDS_TEST[1], 0, None, bruit_durees=0.2, replications_max=6, max_workers=1, graine=3,
+                             moteur='tableaux')
+        self.assertEqual(seul, pool)
+        self.assertEqual(seul, tableaux)
+        self.assertLess(seul['makespan']['p5'], seul['makespan']['p95'])
+
+    def test_arret_anticipe(self):
+        resultat = repliquer(POIDS_TEST[0], 0, None, bruit_durees=0.05, replications_max=100, replications_min=4,
+                             largeur_cible=0.5, max_workers=2)
+        self.assertTrue(resultat['arret_anticipe'])
+        self.assertLess(resultat['replications'], 100)
+        self.assertLessEqual(resultat['makespan']['largeur_relative'], 0.5)
+
+
+class OptimisationPoidsTests(SimpleTestCase):
+
+    def test_meilleurs_poids_rejouables(self):
+        resultat = optimiser_poids(0, None, objectif='makespan', budget_secondes=60, generations_max=3,
+                                   population=6, max_workers=2)
+        rejoue = demarrer_simulation(0, resultat['poids'], None)
+        self.assertAlmostEqual(sum(resultat['poids'].values()), 1)
+        self.assertEqual(resultat['valeur'], rejoue['performances']['makespan'])
+        self.assertEqual(resultat['generations'], 3)
+        self.assertLessEqual(resultat['evaluations'], 3 * 6)
+        self.assertEqual(resultat['historique'], sorted(resultat['historique'], reverse=True))
+
+    def test_budget_de_temps(self):
+        debut = time.monotonic()
+        resultat = optimiser_poids(0, None, objectif='cout_total', budget_secondes=0.2, max_workers=1)
+        self.assertLess(time.monotonic() - debut, 2)
+        self.assertTrue(resultat['budget_epuise'])
+        self.assertIsNotNone(resultat['poids'])
+
+    def test_objectif_inconnu(self):
+        with self.assertRaises(ValueError):
+            optimiser_poids(0, None, objectif='inconnu')
+
+
+class OrdreOperateursTests(SimpleTestCase):
+
+    def test_toutes_les_permutations_une_seule_fois(self):
+        generateur = CombinationGenerator(['O1', 'O2', 'O3', 'O4'], graine=0)
+        ordres = list(generateur)
+        self.assertEqual(len(ordres), 24)
+        self.assertEqual(len(set(ordres)), 24)
+        with self.assertRaises(StopIteration):
+            generateur.get_unique_combination()
+        for rang in range(24):
+            self.assertEqual(generateur.rang_de_permutation(generateur.permutation_de_rang(rang)), rang)
+
+    def test_douze_operateurs_sans_materialiser(self):
+        generateur = CombinationGenerator(range(12), graine=0, capacite=10_000)
+        self.assertIsInstance(generateur.vus, FiltreBloom)
+        ordres = [generateur.get_unique_combination() for _ in range(2000)]
+        self.assertEqual(len(set(ordres)), 2000)
+        self.assertTrue(all(sorted(ordre) == list(range(12)) for ordre in ordres))
+
+    def test_iteration_au_dela_de_la_capacite(self):
+        # 9! = 362 880 permutations: filtre de Bloom, l'itération s'arrête à capacite au lieu de boucler
+        generateur = CombinationGenerator(range(9), graine=0, capacite=1000)
+        self.assertIsInstance(generateur.vus, FiltreBloom)
+        ordres = list(generateur)
+        self.assertEqual(len(ordres), 1000)
+        self.assertEqual(len(set(ordres)), 1000)
+        with self.assertRaises(StopIteration):
+            generateur.get_unique_combination()
+        # Filtre saturé (capacité dépassée à la main): abandon après ESSAIS_MAX rejets, sans boucle infinie
+        generateur.reset()
+        generateur.vus.bits[:] = b'\xff' * len(generateur.vus.bits)
+        self.assertEqual(list(generateur), [])
+
+    def test_recherche_multi_departs(self):
+        resultat = rechercher_ordre_operateurs(POIDS_TEST[0], 0, None, essais=24, max_workers=2)
+        rejoue = executer_simulation(initialiser_systeme(0, POIDS_TEST[0], None), resultat['ordre'])
+        self.assertEqual(resultat['essais'], 24)
+        self.assertLessEqual(resultat['valeur'], resultat['reference'])
+        self.assertEqual(resultat['valeur'], rejoue['performances']['makespan'])
+
+    def test_ordre_invalide(self):
+        with self.assertRaises(ValueError):
+            executer_simulation(initialiser_systeme(0, POIDS_TEST[0], None), ['O1', 'O2'])
+
+
+class RechercheLocaleTests(SimpleTestCase):
+
+    def test_sans_budget_resultat_inchange(self):
+        attendu = demarrer_simulation(0, POIDS_TEST[0], None)
+        self.assertNotIn('amelioration', attendu['performances'])
+
+    def test_amelioration_du_planning(self):
+        data = demarrer_simulation(0, POIDS_TEST[0], None, budget_recherche_locale=0.5)
+        rapport = data['performances']['amelioration']
+        self.assertLessEqual(rapport['ameliore']['makespan'], rapport['initial']['makespan'])
+        self.assertGreater(rapport['mouvements_evalues'], 0)
+        if rapport['applique']:
+            self.assertEqual(data['performances']['makespan'], rapport['ameliore']['makespan'])
+        else:
+            self.assertEqual(data['performances']['makespan'], rapport['glouton']['makespan'])
+
+    def test_budget_nul(self):
+        data = demarrer_simulation(0, POIDS_TEST[3], None, budget_recherche_locale=0)
+        rapport = data['performances']['amelioration']
+        self.assertEqual(rapport['mouvements_evalues'], 0)
+        self.assertEqual(rapport['initial'], rapport['ameliore'])
+
+
+class ReplanificationTests(SimpleTestCase):
+
+    def setUp(self):
+        self.complet = executer_simulation(initialiser_systeme(0, POIDS_TEST[0], None))
+        self.instantane = simuler_jusqua(initialiser_systeme(0, POIDS_TEST[0], None), 1000)
+
+    def test_reprise_identique(self):
+        for temps in (0, 300, 3000):
+            with self.subTest(temps=temps):
+                instantane = simuler_jusqua(initialiser_systeme(0, POIDS_TEST[0], None), temps)
+                self.assertEqual(reprendre(instantane), self.complet)
+        # L'instantané reste utilisable après une reprise
+        self.assertEqual(reprendre(self.instantane), reprendre(self.instantane))
+
+    def test_panne_machine(self):
+        debut = time.perf_counter()
+        data = replanifier(self.instantane, PanneMachine('M1', 240))
+        self.assertLess(time.perf_counter() - debut, 1.0)
+        debuts_m1 = [ligne['Début (heures)'] * 60 for ligne in data['gantt']['machines'] if ligne['ID'] == 'MachM1']
+        self.assertFalse([debut for debut in debuts_m1 if 1000 < debut < 1240])
+        self.assertEqual(data['performances']['replanification']['temps'], 1000)
+
+    def test_operateur_absent_et_quantite(self):
+        data = replanifier(self.instantane, AbsenceOperateur('O2'), ChangementQuantite('P8', 40))
+        fins_o2 = [ligne['Fin (heures)'] * 60 for ligne in data['gantt']['operateurs'] if ligne['ID'] == 'OpO2']
+        self.assertTrue(all(fin <= 1000 for fin in fins_o2))
+        with self.assertRaises(ValueError):
+            replanifier(self.instantane, AbsenceOperateur('O9'))
+
+
+class ContexteSimulationTests(SimpleTestCase):
+    """Chaque simulation a son propre contexte: des exécutions simultanées ne se mélangent pas"""
+
+    def test_simulations_concurrentes(self):
+        poids_liste = POIDS_TEST * 2
+        sequentiel = [demarrer_simulation(0, poids, None) for poids in poids_liste]
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            concurrent = list(pool.map(lambda poids: demarrer_simulation(0, poids, None), poids_liste))
+        for attendu, obtenu in zip(sequentiel, concurrent):
+            self.assertEqual(attendu['gantt'], obtenu['gantt'])
+            self.assertEqual(attendu['performances']['cout_total'], obtenu['performances']['cout_total'])
+
+    def test_contextes_independants(self):
+        premier = initialiser_systeme(0, POIDS_TEST[0], None)
+        second = initialiser_systeme(0, POIDS_TEST[1], None)
+        self.assertIsNot(premier.registre.tache('T111'), second.registre.tache('T111'))
+        self.assertEqual(len(premier.taches), 29)
+        self.assertEqual(len(second.taches), 29)
+
+
+class TraceBinaireTests(SimpleTestCase):
+
+    def test_relecture_de_la_trace(self):
+        with tempfile.TemporaryDirectory() as dossier:
+            chemin = os.path.join(dossier, 'simulation.trace')
+            data = demarrer_simulation(0, POIDS_TEST[0], None, chemin_trace=chemin)
+            evenements = list(lire_trace(chemin))
+        affectations = [e for e in evenements if e[1] == 'AFFECTATION']
+        self.assertEqual(len(affectations), len(data['gantt']['operateurs']))
+        self.assertEqual({e[1] for e in evenements}, {'AFFECTATION', 'DEBUT_TACHE', 'FIN_TACHE'})
+        temps_fin = [e[0] for e in evenements if e[1] == 'FIN_TACHE']
+        self.assertEqual(temps_fin, sorted(temps_fin))
+
+
+class MesuresTests(SimpleTestCase):
+
+    def test_phases_et_compteurs(self):
+        mesures = Mesures()
+        objet = demarrer_simulation(0, POIDS_TEST[0], None, mesures=mesures)['mesures']
+        tableaux = demarrer_simulation(0, POIDS_TEST[0], None, moteur='tableaux')['mesures']
+        noms = ['chargement', 'construction', 'affectation_initiale', 'boucle', 'extraction']
+        self.assertEqual([phase['nom'] for phase in objet['phases']], noms)
+        self.assertEqual([phase['nom'] for phase in tableaux['phases']], noms)
+        self.assertEqual(objet['compteurs'], tableaux['compteurs'])
+        self.assertGreater(objet['compteurs']['mises_a_jour_apprentissage'], 0)
+        self.assertGreater(objet['compteurs']['taille_file_max'], 0)
+        # La vue ajoute ses propres phases aux mesures qu'elle a passées
+        with mesures.phase('encodage_json'):
+            pass
+        self.assertEqual(mesures.rapport()['phases'][-1]['nom'], 'encodage_json')
+
+
+class MetriquesTests(SimpleTestCase):
+
+    def test_agregation_entre_processus(self):
+        with tempfile.TemporaryDirectory() as dossier:
+            # Deux workers (jetons différents), chacun avec son fichier
+            for _ in range(2):
+                worker = Metriques()
+                mesures = Mesures()
+                demarrer_simulation(0, POIDS_TEST[0], None, mesures=mesures)
+                worker.enregistrer_simulation(mesures, dossier)
+            self.assertEqual(len(os.listdir(dossier)), 2)
+            texte = Metriques().exposition(dossier)
+        lignes = dict(ligne.rsplit(' ', 1) for ligne in texte.splitlines() if not ligne.startswith('#'))
+        self.assertEqual(lignes['planification_simulations_total'], '2')
+        self.assertEqual(lignes['planification_simulation_duree_secondes_count'], '2')
+        self.assertEqual(lignes['planification_evenements_par_simulation_count'], '2')
+        decisions = 2 * len(mesures.decisions)
+        self.assertGreater(decisions, 0)
+        self.assertEqual(lignes['planification_decision_duree_secondes_bucket{le="+Inf"}'], str(decisions))
+        self.assertEqual(lignes['planification_candidats_par_decision_count'], str(decisions))
+        self.assertIn('# TYPE planification_decision_duree_secondes histogram', texte)
+
+    def test_vue_metriques(self):
+        reponse = views.metriques(RequestFactory().get('/metriques/'))
+        self.assertEqual(reponse.status_code, 200)
+        self.assertTrue(reponse['Content-Type'].startswith('text/plain; version=0.0.4'))
+        self.assertIn(b'planification_simulations_total', reponse.content)
+
+
+class ProfilageTests(SimpleTestCase):
+
+    def test_profil_et_allocations(self):
+        profil = profiler_simulation(0, POIDS_TEST[0], None, avec_tracemalloc=True, top=200)
+        self.assertTrue(any('choisir_tache' in ligne['fonction'] for ligne in profil.fonctions))
+        temps = [ligne['temps_cumule'] for ligne in profil.fonctions]
+        self.assertEqual(temps, sorted(temps, reverse=True))
+        self.assertTrue(profil.allocations)
+        self.assertGreater(profil.memoire_pic, 0)
+        with tempfile.TemporaryDirectory() as dossier:
+            chemin = os.path.join(dossier, 'simulation.pstats')
+            with open(chemin, 'wb') as fichier:
+                fichier.write(profil.pstats)
+            self.assertTrue(pstats.Stats(chemin).total_calls > 0)
+
+    def test_profil_hors_metriques(self):
+        # Une simulation ralentie par cProfile fausserait les histogrammes de durée
+        avant = METRIQUES.simulations.valeur
+        profiler_simulation(0, POIDS_TEST[0], None)
+        self.assertEqual(METRIQUES.simulations.valeur, avant)
+        demarrer_simulation(0, POIDS_TEST[0], None)
+        self.assertEqual(METRIQUES.simulations.valeur, avant + 1)
+
+    def test_retention_des_profils(self):
+        with tempfile.TemporaryDirectory() as dossier:
+            maintenant = time.time()
+            jetons = [f"{i:032x}" for i in range(5)]
+            for age, jeton in enumerate(jetons):  # jetons[0] le plus récent
+                chemin = os.path.join(dossier, f"{jeton}.pstats")
+                open(chemin, 'wb').close()
+                os.utime(chemin, (maintenant - age * 3600, maintenant - age * 3600))
+            ancien = os.path.join(dossier, f"{'f' * 32}.pstats")
+            open(ancien, 'wb').close()
+            os.utime(ancien, (maintenant - 30 * 86400, maintenant - 30 * 86400))
+            autre = os.path.join(dossier, 'notes.txt')
+            open(autre, 'w').close()
+            with self.settings(PLANIFICATION_PROFILS_MAX=4, PLANIFICATION_PROFILS_DUREE_JOURS=7):
+                views._nettoyer_profils(dossier)
+            # Place libre pour le profil qui va être écrit; les autres fichiers ne sont pas touchés
+            self.assertEqual(sorted(os.listdir(dossier)), sorted([f"{j}.pstats" for j in jetons[:3]] + ['notes.txt']))
+
+    def test_reserve_au_personnel(self):
+        requete = RequestFactory().get('/profilage/')
+        requete.user = AnonymousUser()
+        self.assertEqual(views.profilage(requete).status_code, 302)
+
+
+class MachinesNormaliseesTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('atelier')
+        autre = User.objects.create_user('autre')
+        produit = Produit.objects.create(user=cls.user, id_produit='P1', cr='2', quantite=3)
+        for ordre, (tache_id, machines) in enumerate([('T1', 'M1'), ('T2', 'M10, M1'), ('T3', 'M2')], start=1):
+            form = TacheForm({'produit': produit.pk, 'id_tache': tache_id, 'description': 'd', 'machine': machines,
+                              'temps_standard': 10, 'ordre': ordre})
+            assert form.is_valid(), form.errors
+            tache = form.save(commit=False)
+            tache.produit = produit
+            tache.save()
+            form.save_m2m()
+        # Machine homonyme d'un autre utilisateur: ne doit pas apparaître
+        Produit.objects.create(user=autre, id_produit='P9', cr='1', quantite=1).taches.create(
+            id_tache='T9', description='d', temps_standard=5, ordre=1
+        ).machines.add(ModeleMachine.objects.create(user=autre, id_machine='M1'))
+
+    def test_structure_machines(self):
+        machines, _, produits, _ = generer_structure_donnees(self.user)
+        # "M1" ne capture plus "M10"
+        self.assertEqual(machines, {'M1': ['T1', 'T2'], 'M10': ['T2'], 'M2': ['T3']})
+        self.assertEqual(produits[0]['Machines'], {'T1': 'M1', 'T2': 'M1,M10', 'T3': 'M2'})
+
+    def test_nombre_de_requetes_independant_des_machines(self):
+        with CaptureQueriesContext(connection) as avant:
+            generer_structure_donnees(self.user)
+        produit = Produit.objects.get(id_produit='P1')
+        for i in range(20):
+            produit.taches.get(id_tache='T3').machines.add(ModeleMachine.objects.create(user=self.user, id_machine=f'X{i}'))
+        with self.assertNumQueries(len(avant)):
+            machines, _, _, _ = generer_structure_donnees(self.user)
+        self.assertEqual(len(machines), 23)
+
+    def test_formulaire_modification(self):
+        tache = Tache.objects.get(id_tache='T2')
+        form = TacheForm(instance=tache)
+        self.assertEqual(form.initial['machine'], 'M1, M10')
+        form = TacheForm({'produit': tache.produit.pk, 'id_tache': 'T2', 'description': 'd', 'machine': 'M3,M3, ',
+                          'temps_standard': 10, 'ordre': 2}, instance=tache)
+        self.assertTrue(form.is_valid(), form.errors)
+        form.save()
+        self.assertEqual(tache.liste_machines, 'M3')
+        self.assertFalse(TacheForm({'produit': tache.produit.pk, 'id_tache': 'T2', 'description': 'd',
+                                    'machine': ' , ', 'temps_standard': 10, 'ordre': 2}, instance=tache).is_valid())
+
+    def test_machines_lues_en_une_requete(self):
+        tache = Tache.objects.get(id_tache='T2')
+        identifiants = ', '.join(['M1', 'M10'] + [f'N{i}' for i in range(10)])
+        form = TacheForm({'produit': tache.produit.pk, 'id_tache': 'T2', 'description': 'd', 'machine': identifiants,
+                          'temps_standard': 10, 'ordre': 2}, instance=tache)
+        self.assertTrue(form.is_valid(), form.errors)
+        with CaptureQueriesContext(connection) as requetes:
+            form.save()
+        # Pas de requête par identifiant: une lecture des machines existantes (hors lecture des liens par set()),
+        # un seul INSERT des nouvelles
+        self.assertEqual(sum(r['sql'].startswith('SELECT "planification_machine"') and 'tache_machines' not in r['sql']
+                             for r in requetes.captured_queries), 1)
+        self.assertEqual(sum(r['sql'].startswith('INSERT INTO "planification_machine"')
+                             for r in requetes.captured_queries), 1)
+        self.assertEqual(tache.liste_machines, 'M1,M10,' + ','.join(f'N{i}' for i in range(10)))
+        self.assertEqual(ModeleMachine.objects.filter(user=self.user).count(), 13)
+
+
+class HistoriquePerformanceTests(SimpleTestCase):
+
+    def test_moyenne_sur_toutes_les_mises_a_jour(self):
+        historique = HistoriquePerformance(['T1', 'T2'])
+        valeurs = [[0.5, 0.3], [0.5, 0.6], [1.15, 0.6]]
+        for temps, vecteur in enumerate(valeurs):
+            historique.enregistrer(np.array(vecteur), float(temps))
+        self.assertAlmostEqual(historique.moyenne('T1'), (0.5 + 0.5 + 1.15) / 3)
+        self.assertAlmostEqual(historique.moyenne('T2'), (0.3 + 0.6 + 0.6) / 3)
+        self.assertIsNone(historique.moyenne('T3'))
+        # Seuls les changements sont stockés
+        self.assertEqual(len(historique), 4)
+        self.assertEqual(historique.par_tache()['T1'], {'temps': [0.0, 2.0], 'perf': [0.5, 1.15]})
+
+    def test_capacite_maximale(self):
+        historique = HistoriquePerformance(['T1'], capacite_max=10, politique='fenetre')
+        for temps in range(25):
+            historique.enregistrer(np.array([0.3 + temps / 100]), float(temps))
+        self.assertLessEqual(len(historique), 10)
+        self.assertEqual(list(historique)[-1][2], 24.0)
+        self.assertAlmostEqual(historique.moyenne('T1'), np.mean([0.3 + t / 100 for t in range(25)]))
+
+    def test_simulation_avec_capacite(self):
+        # La moyenne couvre tout l'historique: borner les points gardés ne change pas le planning
+        reference = resultat_reference(demarrer_simulation(0, POIDS_TEST[0], None))
+        for moteur, executer in MOTEURS_REFERENCE.items():
+            with self.subTest(moteur=moteur):
+                contexte = initialiser_systeme(0, POIDS_TEST[0], None, capacite_historique=5,
+                                               politique_historique='fenetre')
+                data = executer(contexte)
+                self.assertEqual(resultat_reference(data), reference)
+                for op in contexte.operateurs:
+                    historique = op.historique_performance
+                    self.assertEqual(historique.politique, 'fenetre')
+                    self.assertLessEqual(len(historique), 5)
+                    self.assertGreater(historique.nombre, 5)  # Sans borne, plus de 60 points par opérateur
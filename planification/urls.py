@@ -8,6 +8,10 @@ urlpatterns = [
     path('produits/<int:produit_id>/', views.saisie_produits, name='saisie_produits'),
     path('operateurs/', views.saisie_operateurs, name='saisie_operateurs'),
     path('config-poids/', views.config_poids, name='config_poids'),
+    path('balayage-poids/', views.balayage_poids, name='balayage_poids'),
+    path('metriques/', views.metriques, name='metriques'),
+    path('profilage/', views.profilage, name='profilage'),
+    path('profilage/<str:jeton>/pstats/', views.telecharger_profil, name='telecharger_profil'),
     path('simulation/exemple/', views.exemple_simulation, name='exemple_simulation'),
     path('', views.home, name='home'),
     path('exemple-detaille/', views.exemple_detaille, name='exemple_detaille'),
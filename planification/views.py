@@ -1,11 +1,23 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from .models import Produit, Tache, Operateur, PerformanceOperateur
-from .forms import ProduitForm, TacheForm, OperateurForm, CustomUserCreationForm
+from .forms import ProduitForm, TacheForm, OperateurForm, CustomUserCreationForm, ProfilageForm
 from .logique.principal_prog import demarrer_simulation
+from .logique.exploration import balayer_poids, echantillon_poids, front_pareto, grille_poids
+from .logique.instrumentation import Mesures
+from .logique.metriques import METRIQUES
+from .logique.profilage import profiler_simulation
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse, StreamingHttpResponse
 from django.middleware.csrf import get_token
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib import messages
 import json
+import os
+import re
+import tempfile
+import time
+import uuid
 
 def register(request):
     if request.method == 'POST':
@@ -43,11 +55,12 @@ def saisie_taches(request, produit_id):
             tache = form.save(commit=False)
             tache.produit = produit
             tache.save()
+            form.save_m2m()
             return redirect('saisie_taches', produit_id=produit.id)
     else:
         form = TacheForm()
     
-    taches = Tache.objects.filter(produit=produit)
+    taches = Tache.objects.filter(produit=produit).prefetch_related('machines')
     return render(request, 'saisie_taches.html', {
         'form': form, 'produit': produit, 'taches': taches
     })
@@ -105,13 +118,22 @@ def config_poids(request):
         if abs(sum(poids.values()) - 1) < 0.01:
             mode = request.session.get('mode', 'exemple')
             validation = 1 if mode == 'manuel' else 0
-            data = demarrer_simulation(validation, poids, request.user)
+            mesures = Mesures()
+            data = demarrer_simulation(validation, poids, request.user,
+                                       moteur=getattr(settings, 'PLANIFICATION_MOTEUR', 'objet'),
+                                       mesures=mesures)
+            with mesures.phase('encodage_json'):
+                gantt_data_json = json.dumps(data['gantt'])
+                performance_data_json = json.dumps(data['performances'])
+            mesures.journaliser()
             return render(request, 'simulation/resultats.html', {
-                'gantt_data_json': json.dumps(data['gantt']),
-                'performance_data_json': json.dumps(data['performances']),
+                'gantt_data_json': gantt_data_json,
+                'performance_data_json': performance_data_json,
                 'makespan': data['performances']['makespan'],
                 'evolution_taches': data['performances']['evolution_taches'],
                 'cout_total': data['performances']['cout_total'],
+                'bornes_makespan': data['performances'].get('bornes_makespan'),
+                'mesures': mesures.rapport(),
                 'mode': mode
             })
         else:
@@ -124,6 +146,110 @@ def config_poids(request):
 
     return render(request, 'poids.html', {'champs': champs, 'message': message})
 
+BALAYAGE_MAX_SIMULATIONS = 200
+BALAYAGE_MAX_WORKERS = 4  # Processus par requête de balayage, quel que soit le nombre de cœurs
+
+@login_required
+def balayage_poids(request):
+    """
+    Balayage des poids en parallèle, résultats en NDJSON au fil de l'eau.
+
+    Paramètres GET: mode=grille (pas=0.25) ou mode=aleatoire (nombre=20, graine=0).
+    Une ligne {"type": "resultat", ...} par simulation terminée, puis une ligne
+    {"type": "front", "resultats": [...]} avec les résultats non dominés.
+    """
+    try:
+        if request.GET.get('mode', 'grille') == 'aleatoire':
+            poids_liste = echantillon_poids(int(request.GET.get('nombre', 20)), int(request.GET.get('graine', 0)))
+        else:
+            poids_liste = grille_poids(float(request.GET.get('pas', 0.25)))
+    except ValueError as erreur:
+        return JsonResponse({'erreur': str(erreur)}, status=400)
+    if not 0 < len(poids_liste) <= BALAYAGE_MAX_SIMULATIONS:
+        return JsonResponse({'erreur': f"Entre 1 et {BALAYAGE_MAX_SIMULATIONS} simulations par balayage."}, status=400)
+    validation = 1 if request.session.get('mode', 'exemple') == 'manuel' else 0
+
+    def lignes():
+        resultats = []
+        for resultat in balayer_poids(poids_liste, validation, request.user,
+                                      max_workers=min(BALAYAGE_MAX_WORKERS, os.cpu_count() or 1),
+                                      moteur=getattr(settings, 'PLANIFICATION_MOTEUR', 'objet')):
+            resultats.append(resultat)
+            yield json.dumps({'type': 'resultat', **resultat}) + '\n'
+        yield json.dumps({'type': 'front', 'resultats': front_pareto(resultats)}) + '\n'
+
+    return StreamingHttpResponse(lignes(), content_type='application/x-ndjson')
+
+def metriques(request):
+    """
+    Métriques des simulations au format texte de Prometheus, agrégées sur les workers (voir logique/metriques.py).
+
+    Sans authentification, pour le collecteur: à réserver au réseau interne côté proxy.
+    """
+    texte = METRIQUES.exposition(getattr(settings, 'PLANIFICATION_METRIQUES_DIR', None))
+    return HttpResponse(texte, content_type='text/plain; version=0.0.4; charset=utf-8')
+
+def _dossier_profils():
+    return getattr(settings, 'PLANIFICATION_PROFILS_DIR', None) or os.path.join(tempfile.gettempdir(),
+                                                                                'planification_profils')
+
+def _nettoyer_profils(dossier):
+    """
+    Rétention des fichiers pstats avant d'en écrire un nouveau: supprime ceux de plus de
+    PLANIFICATION_PROFILS_DUREE_JOURS jours, puis les plus anciens au-delà de PLANIFICATION_PROFILS_MAX - 1
+    """
+    duree_max = getattr(settings, 'PLANIFICATION_PROFILS_DUREE_JOURS', 7) * 86400
+    nombre_max = getattr(settings, 'PLANIFICATION_PROFILS_MAX', 20)
+    profils = []
+    for entree in os.scandir(dossier):
+        if re.fullmatch(r'[0-9a-f]{32}\.pstats', entree.name):
+            try:
+                profils.append((entree.stat().st_mtime, entree.path))
+            except FileNotFoundError:
+                continue  # Supprimé entre-temps par un autre worker
+    profils.sort(reverse=True)
+    limite = time.time() - duree_max
+    for rang, (modification, chemin) in enumerate(profils):
+        if rang >= nombre_max - 1 or modification < limite:
+            try:
+                os.remove(chemin)
+            except FileNotFoundError:
+                pass
+
+@staff_member_required
+def profilage(request):
+    """
+    Relance une simulation sous cProfile (et tracemalloc en option) avec les données d'un utilisateur.
+
+    Affiche les fonctions de plus grand temps cumulé et les lignes qui retiennent le plus de mémoire;
+    le fichier pstats complet reste téléchargeable (telecharger_profil).
+    """
+    profil = None
+    jeton = None
+    form = ProfilageForm(request.POST or None)
+    if request.method == 'POST' and form.is_valid():
+        utilisateur = form.cleaned_data['utilisateur']
+        profil = profiler_simulation(1 if utilisateur else 0, form.poids(), utilisateur,
+                                     moteur=form.cleaned_data['moteur'],
+                                     avec_tracemalloc=form.cleaned_data['avec_tracemalloc'],
+                                     top=form.cleaned_data['top'])
+        jeton = uuid.uuid4().hex
+        dossier = _dossier_profils()
+        os.makedirs(dossier, exist_ok=True)
+        _nettoyer_profils(dossier)
+        with open(os.path.join(dossier, f"{jeton}.pstats"), 'wb') as fichier:
+            fichier.write(profil.pstats)
+    return render(request, 'simulation/profilage.html', {'form': form, 'profil': profil, 'jeton': jeton})
+
+@staff_member_required
+def telecharger_profil(request, jeton):
+    if not re.fullmatch(r'[0-9a-f]{32}', jeton):
+        raise Http404
+    chemin = os.path.join(_dossier_profils(), f"{jeton}.pstats")
+    if not os.path.exists(chemin):
+        raise Http404
+    return FileResponse(open(chemin, 'rb'), as_attachment=True, filename=f"simulation_{jeton[:8]}.pstats")
+
 def exemple_simulation(request):
     if request.method == 'POST' and 'exemple' in request.POST:
         request.session['mode'] = 'exemple'
@@ -153,7 +279,7 @@ def supprimer_tache(request, tache_id):
 
 @login_required
 def apercu_donnees(request):
-    produits = Produit.objects.filter(user=request.user).prefetch_related('taches')
+    produits = Produit.objects.filter(user=request.user).prefetch_related('taches__machines')
     operateurs = Operateur.objects.all()
     performances = PerformanceOperateur.objects.select_related('operateur', 'tache', 'tache__produit')
     return render(request, 'apercu_donnees.html', {